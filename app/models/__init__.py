@@ -1,5 +1,5 @@
 from app import db
-from app.models.build_task import BuildTask, BuildTaskStep
+from app.models.build_task import BuildTask, BuildTaskStep, BuildTaskStepLog, BuildTaskTombstone, BuildTaskArchive
 
 class Project(db.Model):
     """项目配置模型"""
@@ -56,6 +56,13 @@ class GlobalConfig(db.Model):
     crp_topic_type = db.Column(db.String(50), default='test', comment='CRP主题类型')
     https_proxy = db.Column(db.String(200), comment='HTTPS代理配置')
     local_repos_dir = db.Column(db.String(500), default='/tmp/deepin-autopack-repos', comment='本地仓库存储目录')
+    task_retention_days = db.Column(db.Integer, comment='已完成任务保留天数（为空不自动清理）')
+    task_retention_keep = db.Column(db.Integer, comment='每个项目至少保留最近的任务数')
+    task_archive_enabled = db.Column(db.Boolean, default=False, comment='清理任务前是否归档')
+    max_running_tasks = db.Column(db.Integer, default=40, comment='同时执行的任务数上限')
+    git_concurrency = db.Column(db.Integer, default=4, comment='同时执行git克隆/拉取/推送的步骤数上限')
+    api_concurrency = db.Column(db.Integer, default=6, comment='同时调用外部接口的步骤数上限')
+    wait_concurrency = db.Column(db.Integer, default=30, comment='同时等待（PR合并/同步/打包）的步骤数上限')
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     
     @classmethod
@@ -85,3 +92,61 @@ class GlobalConfig(db.Model):
     
     def __repr__(self):
         return f'<GlobalConfig {self.id}>'
+
+
+class CRPProjectMapping(db.Model):
+    """CRP项目ID映射（缓存 项目名+分支+分支ID → CRP ProjectID，避免每次提交都查询）"""
+    __tablename__ = 'crp_project_mappings'
+    __table_args__ = (
+        db.UniqueConstraint('crp_project_name', 'branch', 'branch_id', name='uk_crp_project_mapping'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    crp_project_name = db.Column(db.String(100), nullable=False, comment='CRP项目名称')
+    branch = db.Column(db.String(100), nullable=False, comment='分支名称')
+    branch_id = db.Column(db.Integer, nullable=False, comment='CRP分支ID')
+    project_id = db.Column(db.Integer, nullable=False, comment='CRP ProjectID')
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+    
+    @classmethod
+    def lookup(cls, crp_project_name, branch, branch_id):
+        """查询缓存的ProjectID，不存在返回None"""
+        mapping = cls.query.filter_by(
+            crp_project_name=crp_project_name, branch=branch, branch_id=branch_id
+        ).first()
+        return mapping.project_id if mapping else None
+    
+    @classmethod
+    def save(cls, crp_project_name, branch, branch_id, project_id):
+        """
+        保存（或更新）ProjectID映射
+        
+        在保存点中写入，失败只回滚保存点，不影响调用方会话中的其他修改；由调用方提交
+        """
+        from sqlalchemy.exc import IntegrityError
+        try:
+            with db.session.begin_nested():
+                mapping = cls.query.filter_by(
+                    crp_project_name=crp_project_name, branch=branch, branch_id=branch_id
+                ).first()
+                if mapping:
+                    mapping.project_id = project_id
+                else:
+                    db.session.add(cls(
+                        crp_project_name=crp_project_name, branch=branch,
+                        branch_id=branch_id, project_id=project_id
+                    ))
+        except IntegrityError:
+            # 其他任务同时插入了相同的映射（ProjectID相同），保留对方的记录
+            pass
+    
+    @classmethod
+    def invalidate(cls, crp_project_name, branch, branch_id):
+        """删除映射（ProjectID失效时调用，在保存点中执行，由调用方提交）"""
+        with db.session.begin_nested():
+            cls.query.filter_by(
+                crp_project_name=crp_project_name, branch=branch, branch_id=branch_id
+            ).delete()
+    
+    def __repr__(self):
+        return f'<CRPProjectMapping {self.crp_project_name}@{self.branch} -> {self.project_id}>'
@@ -1,11 +1,21 @@
 """打包任务模型"""
+import json
+import zlib
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from app import db
 
 
 class BuildTask(db.Model):
     """打包任务模型"""
     __tablename__ = 'build_tasks'
+    __table_args__ = (
+        # 任务列表按状态筛选、按创建时间排序；任务恢复和清理按状态查询
+        db.Index('ix_build_tasks_status_created_at', 'status', 'created_at'),
+        # 按项目查询任务
+        db.Index('ix_build_tasks_project_created_at', 'project_id', 'created_at'),
+    )
     
     # 基础信息
     id = db.Column(db.Integer, primary_key=True)
@@ -19,6 +29,8 @@ class BuildTask(db.Model):
     crp_topic_id = db.Column(db.String(50))  # CRP主题ID（可选）
     crp_topic_name = db.Column(db.String(255))  # CRP主题名称（可选）
     start_commit_hash = db.Column(db.String(40), nullable=False)  # 起始commit
+    batch_id = db.Column(db.String(32), index=True)  # 批量创建的批次ID（单个创建为空）
+    priority = db.Column(db.Integer, default=0, nullable=False)  # 优先级（越大越优先，紧急任务插队）
     
     # 任务状态
     status = db.Column(db.String(20), default='pending')  
@@ -43,9 +55,10 @@ class BuildTask(db.Model):
     
     # 时间戳
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # 增量查询游标
     started_at = db.Column(db.DateTime)  # 任务开始时间
     completed_at = db.Column(db.DateTime)  # 任务完成时间
+    heartbeat_at = db.Column(db.DateTime)  # 执行进程的心跳时间（超时未更新说明执行进程已退出）
     
     # 关联关系
     steps = db.relationship('BuildTaskStep', backref='task', cascade='all, delete-orphan', 
@@ -62,6 +75,8 @@ class BuildTask(db.Model):
             'version': self.version,
             'architectures': self.architectures or [],
             'crp_topic_id': self.crp_topic_id,
+            'batch_id': self.batch_id,
+            'priority': self.priority,
             'status': self.status,
             'current_step': self.current_step,
             'error_message': self.error_message,
@@ -77,6 +92,7 @@ class BuildTask(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
             'steps': [step.to_dict() for step in self.steps]
         }
 
@@ -84,6 +100,10 @@ class BuildTask(db.Model):
 class BuildTaskStep(db.Model):
     """打包任务步骤模型"""
     __tablename__ = 'build_task_steps'
+    __table_args__ = (
+        # 步骤总是按任务读取、按顺序排序
+        db.Index('ix_build_task_steps_task_order', 'task_id', 'step_order'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('build_tasks.id'), nullable=False)
@@ -96,6 +116,10 @@ class BuildTaskStep(db.Model):
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     retry_count = db.Column(db.Integer, default=0)  # 重试次数
+    log_lines = db.Column(db.Integer, default=0)  # 进度日志行数（最后一行的 seq）
+    
+    # 列表视图使用的日志截断预览（查询时通过 with_expression 填充）
+    log_preview = db.query_expression()
     
     def to_dict(self):
         """转换为字典"""
@@ -110,5 +134,88 @@ class BuildTaskStep(db.Model):
             'error_message': self.error_message,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'retry_count': self.retry_count
+            'retry_count': self.retry_count,
+            'log_lines': self.log_lines or 0
+        }
+
+
+class BuildTaskStepLog(db.Model):
+    """步骤进度日志（只追加，前端按 seq 增量读取）"""
+    __tablename__ = 'build_task_step_logs'
+    __table_args__ = (
+        db.UniqueConstraint('step_id', 'seq', name='uk_build_task_step_log_seq'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False, index=True)  # 冗余字段，方便按任务删除
+    step_id = db.Column(db.Integer, db.ForeignKey('build_task_steps.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # 步骤内的行号（从1开始）
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'seq': self.seq,
+            'content': self.content,
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+class BuildTaskTombstone(db.Model):
+    """已删除任务的记录（供任务列表增量查询通知前端移除）"""
+    __tablename__ = 'build_task_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class BuildTaskArchive(db.Model):
+    """已清理任务的归档（完整任务数据压缩后保存）"""
+    __tablename__ = 'build_tasks_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 原任务ID
+    project_id = db.Column(db.Integer, nullable=False, index=True)
+    project_name = db.Column(db.String(255), nullable=False)
+    version = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    data = db.Column(db.LargeBinary(length=16 * 1024 * 1024), nullable=False)  # zlib 压缩的任务 JSON（含步骤和进度日志）
+    
+    @staticmethod
+    def compress(task_dict):
+        """压缩任务数据"""
+        return zlib.compress(json.dumps(task_dict, ensure_ascii=False).encode('utf-8'))
+    
+    def to_dict(self):
+        """转换为字典（解压完整任务数据）"""
+        return json.loads(zlib.decompress(self.data).decode('utf-8'))
+
+
+@event.listens_for(BuildTask, 'after_delete')
+def _record_task_tombstone(mapper, connection, target):
+    """删除任务时写入删除记录"""
+    connection.execute(
+        BuildTaskTombstone.__table__.insert().values(task_id=target.id, deleted_at=datetime.utcnow())
+    )
+
+
+@event.listens_for(Session, 'before_flush')
+def _touch_task_on_step_change(session, flush_context, instances):
+    """步骤变更时同步更新所属任务的 updated_at（任务列表增量查询只需比较任务时间戳）"""
+    task_ids = set()
+    for obj in session.new:
+        if isinstance(obj, BuildTaskStep) and obj.task_id:
+            task_ids.add(obj.task_id)
+    for obj in session.dirty:
+        if isinstance(obj, BuildTaskStep) and session.is_modified(obj, include_collections=False):
+            task_ids.add(obj.task_id)
+    
+    now = datetime.utcnow()
+    for task_id in task_ids:
+        task = session.get(BuildTask, task_id)
+        if task is not None and task not in session.deleted:
+            task.updated_at = now
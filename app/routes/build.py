@@ -2,13 +2,31 @@
 打包任务路由
 """
 
-from flask import Blueprint, render_template, jsonify, request
-from app.services.build_task_service import BuildTaskService
+from flask import Blueprint, render_template, jsonify, request, Response, current_app
+from app.services.build_task_service import BuildTaskService, FINISHED_STATUSES, MAX_BATCH_TASKS
+from app.services.task_events import TaskEventBus
 from app.models.build_task import BuildTask
+import json
 import logging
+import queue
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # requirements.txt 已包含；未安装时退回标准库
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+
+def _fast_jsonify(payload, status=200):
+    """序列化高频轮询接口的响应（优先使用orjson）"""
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return Response(body, status=status, mimetype='application/json')
+
 build_bp = Blueprint('build', __name__)
 
 
@@ -22,53 +40,37 @@ def tasks():
 def api_get_tasks():
     """获取任务列表API"""
     try:
-        # 从数据库读取任务列表
-        tasks = BuildTaskService.get_all_tasks(limit=100)
-        
-        # 如果没有数据，返回空列表
-        if not tasks:
-            return jsonify({
+        # 带 since 游标时只返回变化的任务和已删除的任务ID
+        since = request.args.get('since')
+        if since is not None:
+            try:
+                since = datetime.fromisoformat(since)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': f'无效的游标: {since}'
+                }), 400
+            
+            changes = BuildTaskService.get_task_changes(since, limit=100)
+            return _fast_jsonify({
                 'success': True,
-                'data': []
+                'full': changes['full'],
+                'data': changes['tasks'],
+                'deleted': changes['deleted'],
+                'queue': changes['queue'],
+                'cursor': changes['cursor']
             })
         
-        # 格式化任务数据以匹配前端需求
-        formatted_tasks = []
-        for task in tasks:
-            # 格式化步骤数据
-            steps = []
-            for step in task.get('steps', []):
-                steps.append({
-                    'name': step['step_name'],
-                    'status': step['status'],
-                    'time': step['completed_at'] or step['started_at'],
-                    'log_message': step['log_message'],
-                    'error_message': step.get('error_message')
-                })
-            
-            formatted_task = {
-                'id': task['id'],
-                'project_name': task['project_name'],
-                'version': task['version'],
-                'mode': task['package_mode'],
-                'status': task['status'],
-                'current_step': task['current_step'],
-                'architectures': task['architectures'] or [],
-                'steps': steps,
-                'created_at': task['created_at'],
-                'started_at': task['started_at'],
-                'updated_at': task['updated_at'],
-                'completed_at': task['completed_at'],
-                'github_pr_url': task['github_pr_url'],
-                'github_pr_number': task['github_pr_number'],
-                'crp_build_url': task['crp_build_url'],
-                'error': task['error_message']
-            }
-            formatted_tasks.append(formatted_task)
+        # 从数据库读取任务列表（精简字段，步骤日志截断）
+        changes = BuildTaskService.get_task_changes(None, limit=100)
         
-        return jsonify({
+        return _fast_jsonify({
             'success': True,
-            'data': formatted_tasks
+            'full': True,
+            'data': changes['tasks'],
+            'deleted': [],
+            'queue': changes['queue'],
+            'cursor': changes['cursor']
         })
         
     except Exception as e:
@@ -78,6 +80,134 @@ def api_get_tasks():
             'message': f'获取任务列表失败: {str(e)}'
         }), 500
 
+def _sse(message):
+    """格式化一条SSE消息"""
+    if orjson is not None:
+        data = orjson.dumps(message).decode()
+    else:
+        data = json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+    return f"data: {data}\n\n"
+
+
+@build_bp.route('/api/tasks/stream', methods=['GET'])
+def api_task_stream():
+    """
+    任务状态推送（SSE）：连接时推送完整列表，之后推送变化的任务和已删除的任务ID
+    
+    ?batch_id= 只推送该批次的任务，并附带批次状态统计，全部任务结束后推送 complete 并关闭
+    """
+    app = current_app._get_current_object()
+    batch_id = request.args.get('batch_id')
+    bus = TaskEventBus()
+    # 先订阅再查询完整列表，保证之间的变更不会遗漏
+    q = bus.subscribe(app)
+    statuses = {}  # 批次内任务ID -> 状态
+    
+    def batch_message(message):
+        """过滤出批次内的任务并附带统计"""
+        tasks = [task for task in message.get('data', []) if task.get('batch_id') == batch_id]
+        deleted = [task_id for task_id in message.get('deleted', []) if task_id in statuses]
+        if message['type'] != 'snapshot' and not tasks and not deleted:
+            return None
+        for task in tasks:
+            statuses[task['id']] = task['status']
+        for task_id in deleted:
+            statuses.pop(task_id, None)
+        summary = {}
+        for status in statuses.values():
+            summary[status] = summary.get(status, 0) + 1
+        return dict(message, data=tasks, deleted=deleted, batch_id=batch_id, summary=summary)
+    
+    def snapshot():
+        with app.app_context():
+            if batch_id:
+                tasks = BuildTaskService.get_task_list(limit=MAX_BATCH_TASKS, batch_id=batch_id)
+                statuses.clear()
+                return batch_message({'type': 'snapshot', 'data': tasks})
+            changes = BuildTaskService.get_task_changes(None, limit=100)
+        return {'type': 'snapshot', 'data': changes['tasks'], 'queue': changes['queue'], 'cursor': changes['cursor']}
+    
+    def batch_finished():
+        return bool(statuses) and all(status in FINISHED_STATUSES for status in statuses.values())
+    
+    def generate():
+        try:
+            message = snapshot()
+            while True:
+                if message is not None:
+                    yield _sse(message)
+                    if batch_id and batch_finished():
+                        yield _sse({'type': 'complete', 'batch_id': batch_id, 'summary': message['summary']})
+                        return
+                try:
+                    message = q.get(timeout=15)
+                except queue.Empty:
+                    # 心跳，用于检测断开的连接
+                    yield ": ping\n\n"
+                    message = None
+                    continue
+                if message['type'] == 'resync':
+                    message = snapshot()
+                elif batch_id:
+                    message = batch_message(message)
+        except Exception as e:
+            logger.error(f"任务状态推送失败: {str(e)}", exc_info=True)
+            yield _sse({'type': 'error', 'message': str(e)})
+        finally:
+            bus.unsubscribe(q)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@build_bp.route('/api/tasks/batch', methods=['POST'])
+def api_create_tasks_batch():
+    """
+    批量创建并启动打包任务
+    
+    请求体: {"tasks": [{"project_id", "mode", "version", "architectures", "crp_topic_id",
+                      "crp_topic_name", "start_commit_hash", "priority"}, ...], "start": true}
+    返回任务ID列表和批次进度推送地址
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        tasks = data.get('tasks')
+        if not isinstance(tasks, list) or not tasks:
+            return jsonify({
+                'success': False,
+                'message': '缺少必填参数: tasks'
+            }), 400
+        if len(tasks) > MAX_BATCH_TASKS:
+            return jsonify({
+                'success': False,
+                'message': f'一次最多创建 {MAX_BATCH_TASKS} 个任务'
+            }), 400
+        
+        result = BuildTaskService.create_tasks_batch(tasks, start=data.get('start', True))
+        
+        return jsonify({
+            'success': True,
+            'batch_id': result['batch_id'],
+            'task_ids': result['task_ids'],
+            'stream_url': f"/api/tasks/stream?batch_id={result['batch_id']}",
+            'message': f"已创建 {len(result['task_ids'])} 个任务"
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.exception(f"批量创建任务失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'批量创建任务失败: {str(e)}'
+        }), 500
+
+
 # ==================== 新增任务控制API ====================
 
 @build_bp.route('/api/tasks/create', methods=['POST'])
@@ -103,7 +233,8 @@ def api_create_task():
                 'version': data['version'],
                 'architectures': data.get('architectures', []),
                 'crp_topic_id': data.get('crp_topic_id'),
-                'start_commit_hash': data.get('start_commit_hash', '')
+                'start_commit_hash': data.get('start_commit_hash', ''),
+                'priority': data.get('priority', 0)
             }
         )
         
@@ -170,6 +301,29 @@ def api_get_task(task_id):
         }), 500
 
 
+@build_bp.route('/api/tasks/<int:task_id>/steps/<int:step_order>/logs', methods=['GET'])
+def api_get_step_logs(task_id, step_order):
+    """读取步骤进度日志（?offset=前端已有的最后一行seq，只返回之后的新行）"""
+    try:
+        offset = request.args.get('offset', 0, type=int)
+        data = BuildTaskService.get_step_logs(task_id, step_order, offset=max(offset, 0))
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 404
+    except Exception as e:
+        logger.exception(f"获取步骤日志失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'获取步骤日志失败: {str(e)}'
+        }), 500
+
+
 @build_bp.route('/api/tasks/<int:task_id>/pause', methods=['POST'])
 def api_pause_task(task_id):
     """暂停任务"""
@@ -310,9 +464,10 @@ def api_delete_task(task_id):
 
 @build_bp.route('/api/tasks/cleanup-completed', methods=['POST'])
 def api_cleanup_completed_tasks():
-    """清理所有已完成的任务"""
+    """清理所有已完成的任务（请求体可选 {"archive": true/false}，默认使用全局配置）"""
     try:
-        deleted_count = BuildTaskService.cleanup_completed_tasks()
+        data = request.get_json(silent=True) or {}
+        deleted_count = BuildTaskService.cleanup_completed_tasks(archive=data.get('archive'))
         return jsonify({
             'success': True,
             'message': f'已清理 {deleted_count} 个已完成的任务',
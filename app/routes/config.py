@@ -1,13 +1,14 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from app import db
 from app.models import GlobalConfig
+from app.services.config_service import ConfigService
 
 config_bp = Blueprint('config', __name__, url_prefix='/config')
 
 @config_bp.route('/api/config', methods=['GET'])
 def get_config_api():
     """获取配置信息的API端点"""
-    config = GlobalConfig.get_config()
+    config = ConfigService.get()
     return jsonify({
         'success': True,
         'data': {
@@ -35,6 +36,19 @@ def global_config():
             config.local_repos_dir = request.form.get('local_repos_dir') or '/tmp/deepin-autopack-repos'
             config.https_proxy = request.form.get('https_proxy') or None
             
+            # 任务清理配置
+            retention_days = request.form.get('task_retention_days')
+            config.task_retention_days = int(retention_days) if retention_days else None
+            retention_keep = request.form.get('task_retention_keep')
+            config.task_retention_keep = int(retention_keep) if retention_keep else None
+            config.task_archive_enabled = request.form.get('task_archive_enabled') == 'on'
+            
+            # 任务并发配置
+            for field in ('max_running_tasks', 'git_concurrency', 'api_concurrency', 'wait_concurrency'):
+                value = request.form.get(field)
+                if value:
+                    setattr(config, field, max(1, int(value)))
+            
             # CRP配置
             crp_branch_id = request.form.get('crp_branch_id')
             if crp_branch_id:
@@ -57,6 +71,7 @@ def global_config():
                 config.crp_token = crp_token
             
             db.session.commit()
+            ConfigService.invalidate()
             flash('全局配置已保存！', 'success')
             return redirect(url_for('config.global_config'))
         except Exception as e:
@@ -165,6 +180,7 @@ def refresh_crp_token():
             if new_token:
                 config.crp_token = new_token
                 db.session.commit()
+                ConfigService.invalidate()
                 return jsonify({'success': True, 'message': 'Token 刷新成功'})
             else:
                 return jsonify({'success': False, 'message': 'CRP登录失败，请检查账号密码'})
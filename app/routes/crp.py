@@ -2,9 +2,12 @@
 CRP主题管理路由
 """
 
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, jsonify, request, Response, current_app
+from app import db
 from app.services.crp_service import CRPService
-from app.models import GlobalConfig
+from app.models import Project
+from app.services.config_service import ConfigService
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,28 +40,10 @@ def api_topic_detail(topic_id):
                 'message': 'CRP登录失败，请检查LDAP账号密码'
             }), 401
         
-        # 获取配置
-        config = GlobalConfig.get_config()
-        username = CRPService.fetch_user(token)
-        
-        # 获取主题信息
+        # 获取主题信息（优先使用缓存，未命中时直接获取单个主题）
+        config = ConfigService.get()
         topic_type = config.crp_topic_type or 'test'
-        topics = CRPService.list_topics(token, username, config.crp_branch_id, topic_type)
-        
-        # 找到当前主题（API返回的字段名可能是大写ID或小写id）
-        topic = None
-        for t in topics:
-            t_id = t.get('ID') or t.get('id')
-            if t_id == topic_id:
-                # 标准化字段名
-                topic = {
-                    'id': t.get('ID') or t.get('id'),
-                    'name': t.get('Name') or t.get('name', ''),
-                    'description': t.get('Description') or t.get('description', ''),
-                    'create_time': t.get('CreateTime') or t.get('create_time', ''),
-                    'creator_name': t.get('CreatorName') or t.get('creator_name', '')
-                }
-                break
+        topic = CRPService.get_topic(token, topic_id, config.crp_branch_id, topic_type)
         
         if not topic:
             return jsonify({
@@ -67,7 +52,7 @@ def api_topic_detail(topic_id):
             }), 404
         
         # 获取包列表
-        releases = CRPService.list_topic_releases(token, topic_id)
+        releases = CRPService.list_topic_releases(token, topic_id) or []
         
         return jsonify({
             'success': True,
@@ -90,7 +75,7 @@ def api_get_topics():
     """获取主题列表API"""
     try:
         # 获取配置
-        config = GlobalConfig.get_config()
+        config = ConfigService.get()
         
         if not config.crp_branch_id:
             return jsonify({
@@ -107,7 +92,7 @@ def api_get_topics():
             }), 401
         
         # 获取用户名
-        username = CRPService.fetch_user(token)
+        username = CRPService.get_username(token)
         if not username:
             return jsonify({
                 'success': False,
@@ -116,7 +101,8 @@ def api_get_topics():
         
         # 获取主题列表
         topic_type = config.crp_topic_type or 'test'
-        topics = CRPService.list_topics(token, username, config.crp_branch_id, topic_type)
+        refresh = request.args.get('refresh') == '1'
+        topics = CRPService.get_topics(token, username, config.crp_branch_id, topic_type, refresh=refresh)
         
         return jsonify({
             'success': True,
@@ -144,7 +130,7 @@ def api_get_topic_releases(topic_id):
             }), 401
         
         # 获取包列表
-        releases = CRPService.list_topic_releases(token, topic_id)
+        releases = CRPService.list_topic_releases(token, topic_id) or []
         
         # 添加状态显示信息
         for release in releases:
@@ -165,6 +151,67 @@ def api_get_topic_releases(topic_id):
         }), 500
 
 
+@crp_bp.route('/api/topics/<int:topic_id>/repo-urls', methods=['GET'])
+def api_get_topic_repo_urls(topic_id):
+    """获取主题仓库地址API（服务端代理CRP topic_urls，按主题缓存）"""
+    try:
+        config = ConfigService.get()
+        if not config.crp_branch_id:
+            return jsonify({
+                'success': False,
+                'message': '未配置CRP分支ID，请先在配置页面设置'
+            }), 400
+        
+        refresh = request.args.get('refresh') == '1'
+        urls = CRPService.get_topic_urls(topic_id, config.crp_branch_id, refresh=refresh)
+        if urls is None:
+            return jsonify({
+                'success': False,
+                'message': '获取仓库地址失败'
+            }), 502
+        
+        return jsonify({
+            'success': True,
+            'data': urls
+        })
+        
+    except Exception as e:
+        logger.error(f"获取仓库地址失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'获取仓库地址失败: {str(e)}'
+        }), 500
+
+
+@crp_bp.route('/api/topics/<int:topic_id>/arch-status', methods=['GET'])
+def api_get_topic_arch_status(topic_id):
+    """获取主题下各包的架构构建状态API（服务端代理Shuttle task/list，按主题缓存）
+    
+    参数: build_ids=1,2,3（逗号分隔），refresh=1 跳过缓存
+    """
+    try:
+        build_ids = []
+        for value in (request.args.get('build_ids') or '').split(','):
+            value = value.strip()
+            if value.isdigit():
+                build_ids.append(int(value))
+        
+        refresh = request.args.get('refresh') == '1'
+        status = CRPService.get_topic_arch_status(topic_id, build_ids, refresh=refresh)
+        
+        return jsonify({
+            'success': True,
+            'data': {str(build_id): jobs for build_id, jobs in status.items()}
+        })
+        
+    except Exception as e:
+        logger.error(f"获取架构状态失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'获取架构状态失败: {str(e)}'
+        }), 500
+
+
 @crp_bp.route('/api/releases/<int:release_id>', methods=['DELETE'])
 def api_delete_release(release_id):
     """放弃包API"""
@@ -231,3 +278,112 @@ def api_retry_build(release_id):
             'success': False,
             'message': f'重试构建失败: {str(e)}'
         }), 500
+
+
+@crp_bp.route('/api/topics/<int:topic_id>/batch-submit', methods=['POST'])
+def api_batch_submit(topic_id):
+    """
+    批量提交打包到同一主题API
+    
+    请求体: {"items": [{"project_id": 1, "version": "1.0.0", "commit": "abc...",
+                       "arches": ["amd64", "arm64"], "changelog": "..."}],
+             "max_workers": 8}
+    带 ?stream=1 或 Accept: text/event-stream 时以SSE流式返回进度，否则返回逐项结果
+    """
+    try:
+        data = request.get_json() or {}
+        raw_items = data.get('items') or []
+        if not raw_items:
+            return jsonify({
+                'success': False,
+                'message': '提交列表不能为空'
+            }), 400
+        
+        try:
+            max_workers = max(1, min(int(data.get('max_workers', 8)), 16))
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'max_workers 必须是整数'
+            }), 400
+        
+        config = ConfigService.get()
+        if not config.crp_branch_id:
+            return jsonify({
+                'success': False,
+                'message': 'CRP分支ID未配置，请先在全局配置中设置'
+            }), 400
+        
+        # 一次查询所有项目
+        project_ids = {item.get('project_id') for item in raw_items}
+        projects = {p.id: p for p in Project.query.filter(Project.id.in_(project_ids)).all()}
+        
+        items = []
+        for index, item in enumerate(raw_items):
+            project = projects.get(item.get('project_id'))
+            if not project:
+                return jsonify({
+                    'success': False,
+                    'message': f"第{index + 1}项: 项目不存在 (project_id={item.get('project_id')})"
+                }), 400
+            branch = project.gerrit_branch or project.github_branch
+            commit = item.get('commit') or project.last_commit_hash
+            if not item.get('version') or not commit or not branch:
+                return jsonify({
+                    'success': False,
+                    'message': f"第{index + 1}项: {project.name} 缺少版本号、commit或分支配置"
+                }), 400
+            arches = item.get('arches') or 'amd64;arm64;loong64;sw64;mips64el'
+            if isinstance(arches, list):
+                arches = ';'.join(arches)
+            items.append({
+                'project_name': project.crp_project_name or f"{project.name}-v25",
+                'branch': branch,
+                'commit': commit,
+                'tag': item['version'],
+                'arches': arches,
+                'changelog': (item.get('changelog') or f"Release {item['version']}").split('\n')[0].strip()[:100]
+            })
+        
+        # 获取token（整批只登录一次）
+        token = CRPService.get_token()
+        if not token:
+            return jsonify({
+                'success': False,
+                'message': 'CRP登录失败，请检查LDAP账号密码'
+            }), 401
+        
+        stream = request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
+        if not stream:
+            results = CRPService.submit_batch(token, topic_id, items, config.crp_branch_id, max_workers)
+            # 提交解析到的ProjectID映射
+            db.session.commit()
+            success_count = sum(1 for r in results if r['success'])
+            return jsonify({
+                'success': success_count == len(results),
+                'message': f'批量提交完成！成功: {success_count}, 失败: {len(results) - success_count}',
+                'data': results
+            })
+        
+        app = current_app._get_current_object()
+        branch_id = config.crp_branch_id
+        
+        def generate():
+            # 在生成器中手动推送应用上下文（ProjectID映射需要访问数据库）
+            with app.app_context():
+                try:
+                    for event in CRPService.iter_submit_batch(token, topic_id, items, branch_id, max_workers):
+                        yield f"data: {json.dumps(event)}\n\n"
+                    db.session.commit()
+                except Exception as e:
+                    logger.error(f"批量提交失败: {str(e)}", exc_info=True)
+                    yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+        
+        return Response(generate(), mimetype='text/event-stream')
+        
+    except Exception as e:
+        logger.error(f"批量提交失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'批量提交失败: {str(e)}'
+        }), 500
@@ -0,0 +1,37 @@
+"""
+运行指标路由
+"""
+
+from flask import Blueprint, jsonify
+from app.services.github_rate_limiter import GitHubRateLimiter
+from app.services.ssh_service import SSHConnectionPool
+from app.services.build_task_service import TaskQueue
+from app.services.process_watchdog import ProcessWatchdog
+from app.services.background_jobs import BackgroundJobs
+import logging
+
+logger = logging.getLogger(__name__)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """获取运行指标API"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                'github_rate_limit': GitHubRateLimiter().get_metrics(),
+                'ssh_connections': SSHConnectionPool().get_stats(),
+                'task_queue': TaskQueue().get_queue_stats(),
+                'external_commands': ProcessWatchdog().get_stats(),
+                'background_jobs': BackgroundJobs().get_stats()
+            }
+        })
+    except Exception as e:
+        logger.error(f"获取运行指标失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'message': f'获取运行指标失败: {str(e)}'
+        }), 500
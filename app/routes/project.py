@@ -3,6 +3,7 @@ from app import db
 from app.models import Project, GlobalConfig
 from app.services.gerrit_service import create_gerrit_service, get_commit_message_from_git
 from app.services.repo_service import RepoService
+from app.services.background_jobs import BackgroundJobs
 import logging
 import os
 
@@ -126,7 +127,8 @@ def project_clone_repo(id):
             return jsonify({'success': False, 'message': '仓库正在克隆中，请稍候'}), 400
         
         # 允许重新克隆（会自动删除旧仓库）
-        RepoService.clone_project_repo(project.id)
+        if not RepoService.clone_project_repo(project.id):
+            return jsonify({'success': False, 'message': '仓库克隆已在队列中，请稍候'}), 400
         
         return jsonify({'success': True, 'message': '已开始克隆仓库'})
     except Exception as e:
@@ -142,7 +144,8 @@ def project_repo_status(id):
             'success': True,
             'status': project.repo_status,
             'error': project.repo_error,
-            'path': project.local_repo_path
+            'path': project.local_repo_path,
+            'job': BackgroundJobs().get_job('clone', project.id)
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -0,0 +1,118 @@
+"""
+后台作业服务
+仓库克隆等后台作业在有界线程池中执行，复用启动时捕获的 Flask 应用（以及它的数据库连接池），
+不再为每个作业创建新的应用；同一对象的作业排队或执行中时不会重复提交。
+"""
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundJobs:
+    """后台作业执行器（单例）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    MAX_WORKERS = 4  # 同时执行的后台作业数（批量导入项目时同时克隆的仓库数）
+    HISTORY_SIZE = 50  # 保留的已结束作业数
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix='background-job')
+        self._jobs = {}  # (kind, key) -> 排队或执行中的作业
+        self._history = deque(maxlen=self.HISTORY_SIZE)
+        self._jobs_lock = threading.Lock()
+
+        # 保存Flask应用实例用于在线程中创建上下文
+        from flask import current_app
+        self.app = current_app._get_current_object()
+
+        self._initialized = True
+        logger.info("后台作业执行器初始化完成")
+
+    def submit(self, kind: str, key, func, *args, **kwargs) -> bool:
+        """
+        提交后台作业（在应用上下文中执行 func(*args, **kwargs)）
+
+        Args:
+            kind: 作业类型（如 clone）
+            key: 作业对象（如项目ID），同类型同对象的作业排队或执行中时不重复提交
+
+        Returns:
+            是否已提交（False 表示已有相同作业在排队或执行）
+        """
+        with self._jobs_lock:
+            if (kind, key) in self._jobs:
+                logger.info(f"后台作业已在队列中: {kind} {key}")
+                return False
+            job = {
+                'kind': kind,
+                'key': key,
+                'status': 'queued',
+                'submitted_at': datetime.utcnow().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+            }
+            self._jobs[(kind, key)] = job
+
+        self.executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"后台作业已提交: {kind} {key}")
+        return True
+
+    def _run(self, job: Dict, func, args, kwargs):
+        """执行作业（作业结束后应用上下文释放数据库会话）"""
+        with self._jobs_lock:
+            job.update(status='running', started_at=datetime.utcnow().isoformat())
+        status, error = 'success', None
+        try:
+            with self.app.app_context():
+                func(*args, **kwargs)
+        except Exception as e:
+            logger.exception(f"后台作业失败: {job['kind']} {job['key']}, error={e}")
+            status, error = 'failed', str(e)
+        finally:
+            with self._jobs_lock:
+                job.update(status=status, error=error, finished_at=datetime.utcnow().isoformat())
+                self._jobs.pop((job['kind'], job['key']), None)
+                self._history.append(job)
+
+    def get_job(self, kind: str, key) -> Optional[Dict]:
+        """获取排队或执行中的作业（没有时返回 None）"""
+        with self._jobs_lock:
+            job = self._jobs.get((kind, key))
+            if job is None:
+                return None
+            result = dict(job)
+            if job['status'] == 'queued':
+                queued = [j['key'] for j in self._jobs.values() if j['kind'] == kind and j['status'] == 'queued']
+                result['position'] = queued.index(key) + 1
+            return result
+
+    def get_stats(self) -> Dict:
+        """获取后台作业状态（监控接口使用）"""
+        with self._jobs_lock:
+            jobs = [dict(job) for job in self._jobs.values()]
+            return {
+                'max_workers': self.MAX_WORKERS,
+                'queued': sum(1 for job in jobs if job['status'] == 'queued'),
+                'running': sum(1 for job in jobs if job['status'] == 'running'),
+                'jobs': jobs,
+                'recent': list(self._history),
+            }
@@ -1,7 +1,8 @@
 """打包任务服务层"""
 import logging
+import heapq
+import itertools
 import threading
-import queue
 import time
 import os
 import shutil
@@ -10,12 +11,61 @@ from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from app import db
 from app.models import Project
-from app.models.build_task import BuildTask, BuildTaskStep
-from git import Repo
+from app.models.build_task import BuildTask, BuildTaskStep, BuildTaskStepLog, BuildTaskTombstone, BuildTaskArchive
+from app.services.project_lock import ProjectLock
+from app.services.process_watchdog import ProcessWatchdog, WatchedRepo
 
 logger = logging.getLogger(__name__)
 
 
+# 任务列表中步骤日志的最大长度（字符），完整日志通过任务详情获取
+LOG_PREVIEW_CHARS = 500
+
+# 任务列表增量查询：游标回退时间和删除记录保留期（秒）
+DELTA_CURSOR_OVERLAP = 3
+TOMBSTONE_RETENTION = 24 * 60 * 60
+
+# 单次读取步骤进度日志的最大行数
+STEP_LOG_PAGE_SIZE = 500
+
+# 步骤使用的资源类型（步骤执行期间占用对应资源池的一个槽位）
+STEP_RESOURCES = {
+    'pull_code': 'git',
+    'push': 'git',
+    'create_pr': 'api',
+    'crp_build': 'api',
+    'monitor_pr': 'wait',
+    'wait_sync': 'wait',
+    'monitor_build': 'wait',
+}
+
+# 各类步骤中单条外部命令（git / dch）的最长执行时间（秒），超时后看门狗终止整个进程组
+STEP_COMMAND_TIMEOUTS = {
+    'check_env': 60,
+    'pull_code': 600,
+    'generate_changelog': 300,
+    'commit': 300,
+    'push': 600,
+    'wait_sync': 300,
+    'crp_build': 300,
+}
+DEFAULT_COMMAND_TIMEOUT = 300
+
+# 任务清理：已完成的状态、每批删除的任务数、自动清理的最小间隔（秒）
+FINISHED_STATUSES = ('success', 'failed', 'cancelled')
+CLEANUP_BATCH_SIZE = 500
+RETENTION_CHECK_INTERVAL = 60 * 60
+
+# 批量创建任务的最大数量
+MAX_BATCH_TASKS = 200
+
+# CRP打包监控：连续多少次查询成功但找不到打包记录才判定失败
+MISSING_RELEASE_POLLS = 3
+
+# 运行中任务的心跳间隔、判定执行进程已退出的心跳超时（秒）
+HEARTBEAT_INTERVAL = 30
+HEARTBEAT_STALE = 120
+
 # 步骤定义
 NORMAL_MODE_STEPS = [
     {'order': 0, 'name': '检查环境', 'description': '检查仓库状态和工具'},
@@ -50,6 +100,10 @@ CRP_ONLY_STEPS = [
 class BuildTaskService:
     """打包任务管理服务"""
     
+    # 自动清理（保留策略）上次执行的时间
+    _retention_checked_at = 0.0
+    _retention_lock = threading.Lock()
+    
     @staticmethod
     def create_task(project_id, package_config):
         """创建打包任务
@@ -62,7 +116,8 @@ class BuildTaskService:
                 'architectures': ['amd64', 'arm64'],
                 'crp_topic_id': 'xxx',
                 'crp_topic_name': 'topic_name',
-                'start_commit_hash': 'abc123'
+                'start_commit_hash': 'abc123',
+                'priority': 0  # 可选，越大越优先（紧急任务插队）
             }
             
         Returns:
@@ -84,6 +139,7 @@ class BuildTaskService:
                 crp_topic_id=package_config.get('crp_topic_id'),
                 crp_topic_name=package_config.get('crp_topic_name'),
                 start_commit_hash=package_config.get('start_commit_hash', ''),
+                priority=int(package_config.get('priority') or 0),
                 status='pending'
             )
             
@@ -112,6 +168,110 @@ class BuildTaskService:
             logger.exception(f"创建打包任务失败: {e}")
             raise
     
+    @staticmethod
+    def create_tasks_batch(package_configs, start=True):
+        """批量创建打包任务（一个事务）
+        
+        所有配置先统一校验（项目通过一次查询校验），任意一个不合法则全部不创建；
+        任务和步骤分别通过 executemany 批量插入，提交后一次性加入任务队列
+        
+        Args:
+            package_configs: [{'project_id': 1, 'mode': 'normal', 'version': '6.0.52', ...}, ...]
+                （字段同 create_task 的 package_config，另加 project_id）
+            start: 创建后是否立即启动
+            
+        Returns:
+            {'batch_id': str, 'task_ids': [int, ...]}（任务ID与配置顺序一致）
+        """
+        import uuid
+        from sqlalchemy import insert, select
+        
+        if not package_configs:
+            raise ValueError("任务列表不能为空")
+        
+        # 校验参数
+        errors = []
+        for index, config in enumerate(package_configs):
+            missing = [field for field in ('project_id', 'mode', 'version') if field not in config]
+            if missing:
+                errors.append(f"第{index + 1}个任务缺少必填参数: {', '.join(missing)}")
+                continue
+            try:
+                BuildTaskService._get_steps_for_mode(config['mode'])
+            except ValueError as e:
+                errors.append(f"第{index + 1}个任务: {e}")
+        if errors:
+            raise ValueError('; '.join(errors))
+        
+        # 一次查询校验所有项目
+        project_ids = {int(config['project_id']) for config in package_configs}
+        projects = {
+            row.id: row.name for row in
+            db.session.query(Project.id, Project.name).filter(Project.id.in_(project_ids)).all()
+        }
+        missing_projects = sorted(project_ids - projects.keys())
+        if missing_projects:
+            raise ValueError(f"项目不存在: {', '.join(str(pid) for pid in missing_projects)}")
+        
+        batch_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        try:
+            db.session.execute(insert(BuildTask), [
+                {
+                    'project_id': int(config['project_id']),
+                    'project_name': projects[int(config['project_id'])],
+                    'package_mode': config['mode'],
+                    'version': config['version'],
+                    'architectures': config.get('architectures', []),
+                    'crp_topic_id': config.get('crp_topic_id'),
+                    'crp_topic_name': config.get('crp_topic_name'),
+                    'start_commit_hash': config.get('start_commit_hash', ''),
+                    'batch_id': batch_id,
+                    'priority': int(config.get('priority') or 0),
+                    'status': 'pending',
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for config in package_configs
+            ])
+            
+            # 同一条批量 INSERT 分配的自增ID按插入顺序递增
+            task_ids = db.session.execute(
+                select(BuildTask.id).where(BuildTask.batch_id == batch_id).order_by(BuildTask.id)
+            ).scalars().all()
+            
+            db.session.execute(insert(BuildTaskStep), [
+                {
+                    'task_id': task_id,
+                    'step_order': step_def['order'],
+                    'step_name': step_def['name'],
+                    'step_description': step_def['description'],
+                    'status': 'pending'
+                }
+                for task_id, config in zip(task_ids, package_configs)
+                for step_def in BuildTaskService._get_steps_for_mode(config['mode'])
+            ])
+            
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"批量创建打包任务失败: {e}")
+            raise
+        
+        logger.info(f"批量创建打包任务成功: batch_id={batch_id}, {len(task_ids)}个任务")
+        
+        # 批量插入不经过 flush，主动通知任务状态推送
+        from app.services.task_events import TaskEventBus
+        TaskEventBus().publish()
+        
+        if start:
+            TaskQueue().submit_tasks([
+                (task_id, int(config.get('priority') or 0), int(config['project_id']))
+                for task_id, config in zip(task_ids, package_configs)
+            ])
+        
+        return {'batch_id': batch_id, 'task_ids': task_ids}
+    
     @staticmethod
     def _get_steps_for_mode(mode):
         """根据模式获取步骤列表"""
@@ -135,7 +295,7 @@ class BuildTaskService:
             raise ValueError(f"任务状态不允许启动: {task.status}")
         
         # 提交到任务队列
-        TaskQueue().submit_task(task_id)
+        TaskQueue().submit_task(task_id, task.priority, task.project_id)
         logger.info(f"任务已提交到队列: task_id={task_id}")
         
         return task
@@ -170,7 +330,7 @@ class BuildTaskService:
             raise ValueError(f"只能恢复暂停的任务，当前状态: {task.status}")
         
         # 重新提交到队列
-        TaskQueue().submit_task(task_id)
+        TaskQueue().submit_task(task_id, task.priority, task.project_id)
         logger.info(f"任务已恢复: task_id={task_id}")
         
         return task
@@ -228,9 +388,11 @@ class BuildTaskService:
             task.completed_at = None
             
             # 重置所有步骤
+            BuildTaskStepLog.query.filter_by(task_id=task_id).delete()
             for step in task.steps:
                 step.status = 'pending'
                 step.log_message = None
+                step.log_lines = 0
                 step.error_message = None
                 step.started_at = None
                 step.completed_at = None
@@ -244,8 +406,10 @@ class BuildTaskService:
             # 重置指定步骤及之后的步骤
             for step in task.steps:
                 if step.step_order >= from_step:
+                    BuildTaskStepLog.query.filter_by(step_id=step.id).delete()
                     step.status = 'pending'
                     step.log_message = None
+                    step.log_lines = 0
                     step.error_message = None
                     step.started_at = None
                     step.completed_at = None
@@ -254,7 +418,7 @@ class BuildTaskService:
         db.session.commit()
         
         # 提交到队列
-        TaskQueue().submit_task(task_id)
+        TaskQueue().submit_task(task_id, task.priority, task.project_id)
         logger.info(f"任务重试（从第{'一' if not from_step else from_step}步开始）: task_id={task_id}")
         
         return task
@@ -266,7 +430,9 @@ class BuildTaskService:
         if not task:
             raise ValueError(f"任务不存在: {task_id}")
         
-        return task.to_dict()
+        result = task.to_dict()
+        result.update(BuildTaskService._queue_fields(task.id, TaskQueue().get_queue_positions()))
+        return result
     
     @staticmethod
     def get_all_tasks(status=None, limit=100, offset=0):
@@ -282,6 +448,252 @@ class BuildTaskService:
         tasks = query.all()
         return [task.to_dict() for task in tasks]
     
+    @staticmethod
+    def _task_list_query(log_preview_chars=LOG_PREVIEW_CHARS):
+        """
+        构建任务列表查询
+        
+        只查询列表展示需要的列，步骤通过一次 selectinload 批量加载，
+        步骤日志在数据库端截断
+        """
+        from sqlalchemy import func
+        from sqlalchemy.orm import load_only, selectinload, with_expression
+        
+        return BuildTask.query.options(
+            load_only(
+                BuildTask.id, BuildTask.project_name, BuildTask.version, BuildTask.package_mode,
+                BuildTask.status, BuildTask.current_step, BuildTask.architectures,
+                BuildTask.error_message, BuildTask.github_pr_url, BuildTask.github_pr_number,
+                BuildTask.crp_build_url, BuildTask.created_at, BuildTask.started_at,
+                BuildTask.updated_at, BuildTask.completed_at, BuildTask.batch_id, BuildTask.priority
+            ),
+            selectinload(BuildTask.steps).options(
+                load_only(
+                    BuildTaskStep.task_id, BuildTaskStep.step_order, BuildTaskStep.step_name,
+                    BuildTaskStep.status, BuildTaskStep.error_message,
+                    BuildTaskStep.started_at, BuildTaskStep.completed_at, BuildTaskStep.log_lines
+                ),
+                # 多取一个字符用于判断是否被截断
+                with_expression(
+                    BuildTaskStep.log_preview,
+                    func.substr(BuildTaskStep.log_message, 1, log_preview_chars + 1)
+                )
+            )
+        )
+    
+    @staticmethod
+    def _queue_fields(task_id, positions):
+        """任务的排队信息（不在本进程队列中时为空）"""
+        info = positions.get(task_id)
+        return {
+            'queue_position': info['position'] if info else None,
+            'waiting_for_project': info['waiting_for_project'] if info else False
+        }
+    
+    @staticmethod
+    def get_queue_list():
+        """排队中任务的位置列表（推送和增量接口使用，前端据此刷新所有任务的排队位置）"""
+        positions = TaskQueue().get_queue_positions()
+        return [{'id': task_id, **BuildTaskService._queue_fields(task_id, positions)} for task_id in positions]
+    
+    @staticmethod
+    def _serialize_task_item(task, log_preview_chars=LOG_PREVIEW_CHARS, positions=None):
+        """将任务转换为列表页使用的字典"""
+        def iso(value):
+            return value.isoformat() if value else None
+        
+        steps = []
+        for step in task.steps:
+            log = step.log_preview
+            truncated = log is not None and len(log) > log_preview_chars
+            steps.append({
+                'name': step.step_name,
+                'status': step.status,
+                'time': iso(step.completed_at or step.started_at),
+                'log_message': log[:log_preview_chars] if truncated else log,
+                'log_truncated': truncated,
+                'log_lines': step.log_lines or 0,
+                'error_message': step.error_message
+            })
+        
+        return {
+            'id': task.id,
+            'project_name': task.project_name,
+            'version': task.version,
+            'mode': task.package_mode,
+            'status': task.status,
+            'current_step': task.current_step,
+            'architectures': task.architectures or [],
+            'steps': steps,
+            'created_at': iso(task.created_at),
+            'started_at': iso(task.started_at),
+            'updated_at': iso(task.updated_at),
+            'completed_at': iso(task.completed_at),
+            'github_pr_url': task.github_pr_url,
+            'github_pr_number': task.github_pr_number,
+            'crp_build_url': task.crp_build_url,
+            'batch_id': task.batch_id,
+            'priority': task.priority,
+            **BuildTaskService._queue_fields(task.id, positions or {}),
+            'error': task.error_message
+        }
+    
+    @staticmethod
+    def get_task_list(status=None, limit=100, offset=0, log_preview_chars=LOG_PREVIEW_CHARS, batch_id=None):
+        """
+        获取任务列表（列表页使用的精简数据，完整日志通过任务详情接口获取）
+        
+        Returns:
+            任务字典列表（字段与打包任务页面一致）
+        """
+        query = BuildTaskService._task_list_query(log_preview_chars)
+        
+        if status:
+            query = query.filter_by(status=status)
+        if batch_id:
+            query = query.filter_by(batch_id=batch_id)
+        
+        query = query.order_by(BuildTask.created_at.desc())
+        query = query.limit(limit).offset(offset)
+        
+        positions = TaskQueue().get_queue_positions()
+        return [BuildTaskService._serialize_task_item(task, log_preview_chars, positions) for task in query.all()]
+    
+    @staticmethod
+    def get_task_changes(since=None, limit=100):
+        """
+        获取任务列表的增量变化
+        
+        步骤变更会同步更新任务的 updated_at，因此只需比较任务时间戳；
+        返回的游标向前回退 DELTA_CURSOR_OVERLAP 秒，避免漏掉提交较慢的事务（前端按ID合并，重复无影响）
+        
+        Args:
+            since: 上次返回的游标（datetime），为None时返回完整列表
+            limit: 完整列表的最大任务数
+            
+        Returns:
+            {'full': bool, 'tasks': [...], 'deleted': [task_id, ...], 'queue': [...], 'cursor': str}
+        """
+        from datetime import timedelta
+        from app.models.build_task import BuildTaskTombstone
+        
+        now = datetime.utcnow()
+        cursor = (now - timedelta(seconds=DELTA_CURSOR_OVERLAP)).isoformat()
+        
+        # 游标早于删除记录的保留期时，无法保证删除记录完整，退回完整列表
+        if since is None or since < now - timedelta(seconds=TOMBSTONE_RETENTION):
+            return {
+                'full': True,
+                'tasks': BuildTaskService.get_task_list(limit=limit),
+                'deleted': [],
+                'queue': BuildTaskService.get_queue_list(),
+                'cursor': cursor
+            }
+        
+        query = BuildTaskService._task_list_query().filter(BuildTask.updated_at >= since)
+        positions = TaskQueue().get_queue_positions()
+        tasks = [BuildTaskService._serialize_task_item(task, positions=positions) for task in query.all()]
+        deleted = [
+            row.task_id for row in
+            db.session.query(BuildTaskTombstone.task_id).filter(BuildTaskTombstone.deleted_at >= since).all()
+        ]
+        return {
+            'full': False,
+            'tasks': tasks,
+            'deleted': deleted,
+            'queue': BuildTaskService.get_queue_list(),
+            'cursor': cursor
+        }
+    
+    @staticmethod
+    def recover_stale_tasks():
+        """
+        接管执行进程已退出的运行中任务（心跳超过 HEARTBEAT_STALE 秒未更新）
+        
+        通过条件更新抢占任务，多个进程同时恢复时每个任务只会被一个进程接管；
+        重新执行时跳过已完成的步骤，从中断的步骤继续
+        
+        Returns:
+            接管的任务ID列表
+        """
+        from datetime import timedelta
+        from sqlalchemy import or_
+        
+        stale = or_(
+            BuildTask.heartbeat_at.is_(None),
+            BuildTask.heartbeat_at < datetime.utcnow() - timedelta(seconds=HEARTBEAT_STALE)
+        )
+        candidates = db.session.query(
+            BuildTask.id, BuildTask.priority, BuildTask.project_id, BuildTask.project_name
+        ).filter(BuildTask.status == 'running', stale).all()
+        
+        task_queue = TaskQueue()
+        recovered = []
+        for task in candidates:
+            if task_queue.is_running(task.id):
+                continue
+            
+            # 心跳写入不改变 updated_at，避免触发任务列表推送
+            claimed = BuildTask.query.filter(
+                BuildTask.id == task.id, BuildTask.status == 'running', stale
+            ).update(
+                {'heartbeat_at': datetime.utcnow(), 'updated_at': BuildTask.updated_at},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if not claimed:
+                continue
+            
+            task_queue.submit_task(task.id, task.priority, task.project_id)
+            recovered.append(task.id)
+            logger.info(f"任务已恢复: task_id={task.id}, project={task.project_name}")
+        
+        if recovered:
+            logger.info(f"接管了 {len(recovered)} 个失去执行进程的任务")
+        return recovered
+    
+    @staticmethod
+    def prune_tombstones():
+        """清理超过保留期的删除记录"""
+        from datetime import timedelta
+        from app.models.build_task import BuildTaskTombstone
+        
+        expire_before = datetime.utcnow() - timedelta(seconds=TOMBSTONE_RETENTION)
+        count = BuildTaskTombstone.query.filter(BuildTaskTombstone.deleted_at < expire_before).delete()
+        db.session.commit()
+        return count
+    
+    @staticmethod
+    def get_step_logs(task_id, step_order, offset=0, limit=STEP_LOG_PAGE_SIZE):
+        """
+        读取步骤进度日志（从 offset 之后的行开始）
+        
+        Args:
+            task_id: 任务ID
+            step_order: 步骤顺序
+            offset: 前端已有的最后一行 seq（0 表示从头读取）
+            limit: 最多返回的行数
+        
+        Returns:
+            {'lines': [...], 'offset': 最后一行seq, 'total': 步骤日志总行数}
+        """
+        step = db.session.query(BuildTaskStep.id, BuildTaskStep.log_lines).filter_by(
+            task_id=task_id, step_order=step_order
+        ).first()
+        if not step:
+            raise ValueError(f"步骤不存在: task_id={task_id}, step={step_order}")
+        
+        lines = BuildTaskStepLog.query.filter(
+            BuildTaskStepLog.step_id == step.id,
+            BuildTaskStepLog.seq > offset
+        ).order_by(BuildTaskStepLog.seq).limit(limit).all()
+        
+        return {
+            'lines': [line.to_dict() for line in lines],
+            'offset': lines[-1].seq if lines else offset,
+            'total': step.log_lines or 0
+        }
+    
     @staticmethod
     def delete_task(task_id):
         """删除任务"""
@@ -296,6 +708,7 @@ class BuildTaskService:
             raise ValueError("运行中的任务不能删除")
         
         # 删除任务相关的步骤记录
+        BuildTaskStepLog.query.filter_by(task_id=task_id).delete()
         BuildTaskStep.query.filter_by(task_id=task_id).delete()
         
         # 删除任务
@@ -305,68 +718,259 @@ class BuildTaskService:
         logger.info(f"任务已删除: {task_id}")
     
     @staticmethod
-    def cleanup_completed_tasks():
-        """清理所有已完成的任务（成功和失败的）"""
-        from app import db
+    def cleanup_completed_tasks(archive=None):
+        """
+        清理所有已完成的任务（成功、失败和取消的）
+        
+        Args:
+            archive: 删除前是否归档（None 则使用全局配置）
+        
+        Returns:
+            删除的任务数量
+        """
+        from sqlalchemy import select
+        
+        ids_query = select(BuildTask.id).where(BuildTask.status.in_(FINISHED_STATUSES))
+        deleted_count = BuildTaskService._purge_tasks(ids_query, archive=archive)
+        BuildTaskService.prune_tombstones()
+        logger.info(f"已清理 {deleted_count} 个已完成的任务")
+        
+        return deleted_count
+    
+    @staticmethod
+    def apply_retention_policy(days=None, keep=None, archive=None):
+        """
+        按保留策略清理已完成的任务
+        
+        超过保留天数、且不属于所在项目最近 keep 个任务的已完成任务会被删除
+        
+        Args:
+            days: 保留天数（None 则使用全局配置，配置为空时不清理）
+            keep: 每个项目至少保留的最近任务数（None 则使用全局配置）
+            archive: 删除前是否归档（None 则使用全局配置）
+        
+        Returns:
+            删除的任务数量
+        """
+        from datetime import timedelta
+        from sqlalchemy import func, select
+        from app.services.config_service import ConfigService
+        
+        config = ConfigService.get()
+        if days is None:
+            days = config.task_retention_days
+        if keep is None:
+            keep = config.task_retention_keep or 0
+        if not days:
+            return 0
+        
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        ranked = select(
+            BuildTask.id, BuildTask.status, BuildTask.created_at,
+            func.row_number().over(
+                partition_by=BuildTask.project_id, order_by=BuildTask.created_at.desc()
+            ).label('rank')
+        ).subquery()
+        ids_query = select(ranked.c.id).where(
+            ranked.c.status.in_(FINISHED_STATUSES),
+            ranked.c.created_at < cutoff,
+            ranked.c.rank > keep
+        )
+        
+        deleted_count = BuildTaskService._purge_tasks(ids_query, archive=archive)
+        BuildTaskService.prune_tombstones()
+        logger.info(f"按保留策略清理任务: 保留{days}天, 每个项目至少保留{keep}个, 删除 {deleted_count} 个")
+        
+        return deleted_count
+    
+    @staticmethod
+    def maybe_apply_retention():
+        """距离上次执行超过 RETENTION_CHECK_INTERVAL 时执行一次保留策略（任务结束时调用）"""
+        if not BuildTaskService._retention_lock.acquire(blocking=False):
+            return
+        try:
+            if time.time() - BuildTaskService._retention_checked_at < RETENTION_CHECK_INTERVAL:
+                return
+            BuildTaskService._retention_checked_at = time.time()
+            BuildTaskService.apply_retention_policy()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"自动清理任务失败: {e}")
+        finally:
+            BuildTaskService._retention_lock.release()
+    
+    @staticmethod
+    def _purge_tasks(ids_query, archive=None, batch_size=CLEANUP_BATCH_SIZE):
+        """
+        分批删除任务（集合操作，每批一个事务）
+        
+        每批依次：归档（可选）→ 删除进度日志 → 删除步骤 → 删除任务 → 写入删除记录
+        
+        Args:
+            ids_query: 查询待删除任务ID的 select 语句
+            archive: 删除前是否归档（None 则使用全局配置）
+            batch_size: 每批删除的任务数
+        
+        Returns:
+            删除的任务数量
+        """
+        from sqlalchemy import delete, insert
         
-        # 查找所有已完成的任务
-        completed_tasks = BuildTask.query.filter(
-            BuildTask.status.in_(['success', 'failed', 'cancelled'])
-        ).all()
+        if archive is None:
+            from app.services.config_service import ConfigService
+            archive = bool(ConfigService.get().task_archive_enabled)
         
         deleted_count = 0
-        for task in completed_tasks:
+        while True:
+            task_ids = db.session.execute(ids_query.limit(batch_size)).scalars().all()
+            if not task_ids:
+                break
+            
             try:
-                # 删除任务相关的步骤记录
-                BuildTaskStep.query.filter_by(task_id=task.id).delete()
+                if archive:
+                    BuildTaskService._archive_tasks(task_ids)
                 
-                # 删除任务
-                db.session.delete(task)
-                deleted_count += 1
-            except Exception as e:
-                logger.error(f"删除任务 {task.id} 失败: {e}")
+                db.session.execute(
+                    delete(BuildTaskStepLog).where(BuildTaskStepLog.task_id.in_(task_ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.execute(
+                    delete(BuildTaskStep).where(BuildTaskStep.task_id.in_(task_ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.execute(
+                    delete(BuildTask).where(BuildTask.id.in_(task_ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                # 批量删除不会触发 after_delete，手动写入删除记录供任务列表增量查询使用
+                now = datetime.utcnow()
+                db.session.execute(
+                    insert(BuildTaskTombstone),
+                    [{'task_id': task_id, 'deleted_at': now} for task_id in task_ids]
+                )
+                db.session.commit()
+            except Exception:
                 db.session.rollback()
-                continue
-        
-        db.session.commit()
-        logger.info(f"已清理 {deleted_count} 个已完成的任务")
+                raise
+            
+            db.session.expunge_all()
+            deleted_count += len(task_ids)
+            logger.info(f"已删除一批任务: {len(task_ids)} 个（累计 {deleted_count} 个）")
+            
+            if len(task_ids) < batch_size:
+                break
         
         return deleted_count
+    
+    @staticmethod
+    def _archive_tasks(task_ids):
+        """将任务（含步骤和进度日志）压缩后写入归档表，与删除在同一事务中"""
+        from sqlalchemy import insert
+        from sqlalchemy.orm import selectinload
+        
+        tasks = BuildTask.query.options(selectinload(BuildTask.steps)).filter(BuildTask.id.in_(task_ids)).all()
+        
+        progress = {}
+        for line in BuildTaskStepLog.query.filter(
+            BuildTaskStepLog.task_id.in_(task_ids)
+        ).order_by(BuildTaskStepLog.step_id, BuildTaskStepLog.seq):
+            progress.setdefault(line.step_id, []).append(line.content)
+        
+        rows = []
+        for task in tasks:
+            data = task.to_dict()
+            for step in data['steps']:
+                step['progress'] = progress.get(step['id'], [])
+            rows.append({
+                'id': task.id,
+                'project_id': task.project_id,
+                'project_name': task.project_name,
+                'version': task.version,
+                'status': task.status,
+                'created_at': task.created_at,
+                'completed_at': task.completed_at,
+                'archived_at': datetime.utcnow(),
+                'data': BuildTaskArchive.compress(data)
+            })
+        
+        if rows:
+            db.session.execute(insert(BuildTaskArchive), rows)
 
 
 class BuildExecutor:
     """打包任务执行器（核心逻辑框架）"""
     
+    # 只有进度变化（进度日志等）时，两次提交之间的最小间隔（秒）
+    PROGRESS_COMMIT_INTERVAL = 10
+    
     def __init__(self, task_id):
         self.task_id = task_id
         self.task = None
         self.project = None
         self.stopped = False  # 停止标志
         self._stop_event = threading.Event()
+        self._last_commit = 0.0
+        self._commit_pending = False  # 是否有尚未提交的进度变化
     
-    def _setup_github_proxy(self, repo):
+    def _commit(self, force=False):
         """
-        为GitHub仓库设置代理（仅GitHub需要）
+        提交任务和步骤的变更（写缓冲）
+        
+        状态变化（force=True）立即提交，连同之前缓冲的进度一起写入；
+        只有进度变化时最多每 PROGRESS_COMMIT_INTERVAL 秒提交一次，其间的修改留在会话中合并
         
         Args:
-            repo: GitPython的Repo对象
+            force: 是否立即提交
         """
-        # 检查是否是GitHub仓库
-        if not self.project.github_url:
+        now = time.time()
+        if not force and now - self._last_commit < self.PROGRESS_COMMIT_INTERVAL:
+            self._commit_pending = True
             return
+        db.session.commit()
+        self._last_commit = now
+        self._commit_pending = False
+    
+    def _commit_final(self, apply):
+        """
+        写入终态并立即提交
+        
+        提交失败（例如缓冲的进度写入出错导致会话失效）时回滚会话，丢弃缓冲的进度，
+        重新写入终态后再提交一次，保证终态不会丢失
         
+        Args:
+            apply: 设置终态的函数（回滚后需要重新调用）
+        """
+        apply()
+        try:
+            self._commit(force=True)
+        except Exception as e:
+            logger.warning(f"提交终态失败，回滚后重试: task_id={self.task_id}, error={e}")
+            db.session.rollback()
+            apply()
+            self._commit(force=True)
+    
+    def _flush_pending(self):
+        """提交到期的缓冲进度（长时间等待期间调用，避免最后一次进度迟迟不写入）"""
+        if self._commit_pending:
+            self._commit()
+    
+    def _git_env(self, repo, remote='origin'):
+        """
+        获取访问远程仓库时git命令需要的环境变量
+        
+        由网络策略按远程主机决定走代理还是直连（GitHub走代理，Gerrit直连并复用SSH连接），
+        只作用于本次git调用，不修改.git/config
+        
+        Args:
+            repo: GitPython的Repo对象
+            remote: remote名称
+        """
         try:
-            from app.models import GlobalConfig
-            config = GlobalConfig.query.first()
-            
-            if config and config.https_proxy:
-                # 设置Git的HTTP/HTTPS代理
-                with repo.config_writer() as git_config:
-                    git_config.set_value('http', 'proxy', config.https_proxy)
-                    git_config.set_value('https', 'proxy', config.https_proxy)
-                logger.info(f"已为GitHub仓库设置代理: {config.https_proxy}")
+            from app.services.network_policy import NetworkPolicy
+            return NetworkPolicy.git_env(repo.remotes[remote].url)
         except Exception as e:
-            logger.warning(f"设置代理失败: {e}，将尝试直接连接")
+            logger.warning(f"获取网络策略失败: {e}，将使用默认连接")
+            return {}
     
     def _clear_github_proxy(self, repo):
         """
@@ -390,6 +994,7 @@ class BuildExecutor:
     
     def execute(self):
         """执行任务主流程"""
+        project_lock = None
         try:
             # 重新获取任务对象（新线程需要新session）
             self.task = BuildTask.query.get(self.task_id)
@@ -400,11 +1005,18 @@ class BuildExecutor:
             if not self.project:
                 raise Exception(f"项目不存在: {self.task.project_id}")
             
-            # 更新任务状态
+            # 同一项目的任务串行执行（多进程部署时跨进程互斥）
+            project_lock = ProjectLock(self.task.project_id)
+            if not project_lock.acquire(self._stop_event):
+                logger.info(f"等待项目锁时任务被停止: task_id={self.task_id}")
+                return
+            
+            # 更新任务状态（之后由任务队列定期写入心跳）
             self.task.status = 'running'
+            self.task.heartbeat_at = datetime.utcnow()
             if not self.task.started_at:
                 self.task.started_at = datetime.utcnow()
-            db.session.commit()
+            self._commit(force=True)
             
             logger.info(f"开始执行任务: task_id={self.task_id}, project={self.project.name}")
             
@@ -426,32 +1038,54 @@ class BuildExecutor:
                 self.task.completed_at = datetime.utcnow()
                 logger.info(f"任务执行成功: task_id={self.task_id}")
             
-            db.session.commit()
+            self._commit(force=True)
             
         except Exception as e:
             logger.exception(f"任务执行失败: task_id={self.task_id}, error={e}")
             if self.task:
-                self.task.status = 'failed'
-                self.task.error_message = str(e)
-                self.task.completed_at = datetime.utcnow()
-                db.session.commit()
+                def mark_failed():
+                    self.task.status = 'failed'
+                    self.task.error_message = str(e)
+                    self.task.completed_at = datetime.utcnow()
+                
+                self._commit_final(mark_failed)
+        finally:
+            if project_lock is not None:
+                project_lock.release()
     
     def _execute_step(self, step):
         """执行单个步骤"""
+        from app.services.resource_pool import ResourcePools
+        
+        # 按步骤使用的资源申请资源池槽位（高优先级任务优先获得）
+        resource = STEP_RESOURCES.get(self._normalize_step_name(step.step_name))
+        pool = ResourcePools().get(resource) if resource else None
+        if pool is not None:
+            if not pool.acquire(self.task.priority or 0, self._stop_event):
+                logger.info(f"等待资源时任务被停止: task_id={self.task_id}, step={step.step_name}")
+                return
+        
         try:
             logger.info(f"执行步骤: task_id={self.task_id}, step={step.step_name}")
             
             step.status = 'running'
             step.started_at = datetime.utcnow()
             self.task.current_step = step.step_order
-            db.session.commit()
+            self._commit(force=True)
             
             # 调用对应的步骤处理方法
-            handler_name = f'_step_{step.step_order}_{self._normalize_step_name(step.step_name)}'
+            step_key = self._normalize_step_name(step.step_name)
+            handler_name = f'_step_{step.step_order}_{step_key}'
             handler = getattr(self, handler_name, None)
             
             if handler:
-                handler(step)
+                # 步骤中启动的外部命令受看门狗监控，超时后整组终止，步骤以超时原因失败。
+                # 步骤中的查询（配置、CRP映射等）不自动 flush 缓冲的进度，否则任务/步骤行锁
+                # 会从 flush 起一直持有到下次提交，写缓冲失去意义；进度只在 _commit 提交时写入
+                timeout = STEP_COMMAND_TIMEOUTS.get(step_key, DEFAULT_COMMAND_TIMEOUT)
+                with ProcessWatchdog().guard(step_key, timeout, context=f"task_id={self.task_id}"):
+                    with db.session.no_autoflush:
+                        handler(step)
             else:
                 # 默认处理：标记为待实现
                 step.log_message = f"步骤 {step.step_name} 待实现"
@@ -459,17 +1093,33 @@ class BuildExecutor:
             
             step.status = 'completed'
             step.completed_at = datetime.utcnow()
-            db.session.commit()
+            self._commit(force=True)
             
             logger.info(f"步骤执行成功: task_id={self.task_id}, step={step.step_name}")
             
         except Exception as e:
             logger.exception(f"步骤执行失败: task_id={self.task_id}, step={step.step_name}, error={e}")
-            step.status = 'failed'
-            step.error_message = str(e)
-            step.completed_at = datetime.utcnow()
-            db.session.commit()
+            
+            def mark_failed():
+                step.status = 'failed'
+                step.error_message = str(e)
+                step.completed_at = datetime.utcnow()
+            
+            self._commit_final(mark_failed)
             raise
+        finally:
+            if pool is not None:
+                pool.release()
+    
+    def _append_log(self, step, content):
+        """追加一行步骤进度日志（只插入新行，不重写 log_message，由调用方提交）"""
+        step.log_lines = (step.log_lines or 0) + 1
+        db.session.add(BuildTaskStepLog(
+            task_id=step.task_id,
+            step_id=step.id,
+            seq=step.log_lines,
+            content=f"[{datetime.now().strftime('%H:%M:%S')}] {content}"
+        ))
     
     def _normalize_step_name(self, step_name):
         """标准化步骤名称为方法名"""
@@ -641,17 +1291,18 @@ class BuildExecutor:
             raise Exception("未安装dch工具，请安装: sudo apt install devscripts")
         check_results.append("✓ dch工具已安装")
         
-        # 检查gh命令（GitHub项目）
-        if self.project.github_url:
-            if not shutil.which('gh'):
-                raise Exception("未安装gh工具，请安装: sudo apt install gh")
-            check_results.append("✓ gh工具已安装")
-        
-        # 检查git-review工具（Gerrit项目）
-        if self.project.gerrit_url:
-            if not shutil.which('git-review'):
-                raise Exception("未安装git-review工具，请安装: sudo apt install git-review")
-            check_results.append("✓ git-review工具已安装")
+        # 确保Gerrit项目已安装commit-msg hook（提交时生成Change-Id，每个克隆只需下载一次）
+        if self.project.gerrit_url and not self.project.github_url:
+            from app.services.config_service import ConfigService
+            from app.services.git_service import GitService
+            config = ConfigService.get()
+            try:
+                installed = GitService(self.project.local_repo_path).ensure_change_id_hook(
+                    gerrit_url=config.gerrit_url if config else None
+                )
+            except Exception as e:
+                raise Exception(f"安装Gerrit commit-msg hook失败: {e}")
+            check_results.append("✓ Gerrit commit-msg hook已安装" if installed else "✓ Gerrit commit-msg hook已存在")
         
         # 检查debian/changelog文件是否存在
         changelog_path = os.path.join(self.project.local_repo_path, 'debian', 'changelog')
@@ -665,10 +1316,7 @@ class BuildExecutor:
     def _step_1_pull_code(self, step):
         """步骤1: 拉取最新代码"""
         try:
-            repo = Repo(self.project.local_repo_path)
-            
-            # 为GitHub仓库设置代理
-            self._setup_github_proxy(repo)
+            repo = WatchedRepo(self.project.local_repo_path)
             
             # 确定要拉取的分支
             target_branch = self.project.github_branch if self.project.github_url else self.project.gerrit_branch
@@ -678,7 +1326,8 @@ class BuildExecutor:
             # Fetch最新代码
             logger.info(f"Fetching from origin: task_id={self.task_id}")
             origin = repo.remotes.origin
-            origin.fetch()
+            with repo.git.custom_environment(**self._git_env(repo)):
+                origin.fetch()
             
             # Checkout到目标分支
             logger.info(f"Checking out branch: {target_branch}")
@@ -686,7 +1335,8 @@ class BuildExecutor:
             
             # Pull最新代码
             logger.info(f"Pulling latest changes: task_id={self.task_id}")
-            origin.pull(target_branch)
+            with repo.git.custom_environment(**self._git_env(repo)):
+                origin.pull(target_branch)
             
             # 获取最新commit信息
             latest_commit = repo.head.commit
@@ -702,7 +1352,7 @@ class BuildExecutor:
             
             # 保存当前commit hash
             self.task.start_commit_hash = latest_commit.hexsha
-            db.session.commit()
+            self._commit(force=True)
             
             logger.info(f"代码拉取成功: task_id={self.task_id}, commit={commit_hash}")
             
@@ -713,7 +1363,7 @@ class BuildExecutor:
     def _step_2_generate_changelog(self, step):
         """步骤2: 生成Changelog"""
         try:
-            repo = Repo(self.project.local_repo_path)
+            repo = WatchedRepo(self.project.local_repo_path)
             
             # 创建打包分支（GitHub项目需要）
             if self.project.github_url:
@@ -721,20 +1371,18 @@ class BuildExecutor:
                 safe_version = self.task.version.replace(':', '-').replace(' ', '-').replace('/', '-')
                 branch_name = f"dev-changelog-{safe_version}"
                 self.task.github_branch = branch_name
-                db.session.commit()
+                self._commit(force=True)
                 
                 # 获取基础分支
                 base_branch = self.project.github_branch
                 
                 logger.info(f"创建打包分支: {branch_name} from origin/{base_branch}")
                 try:
-                    # 为GitHub仓库设置代理
-                    self._setup_github_proxy(repo)
-                    
                     # 获取最新的远程分支状态
                     origin = repo.remotes.origin
                     logger.info(f"拉取最新的远程分支: {base_branch}")
-                    origin.fetch()
+                    with repo.git.custom_environment(**self._git_env(repo)):
+                        origin.fetch()
                     
                     # 先删除本地分支（如果存在）
                     try:
@@ -755,8 +1403,8 @@ class BuildExecutor:
                     raise Exception(f"创建分支失败: {str(e)}")
             
             # 设置DEBEMAIL环境变量（从全局配置读取）
-            from app.models import GlobalConfig
-            config = GlobalConfig.query.first()
+            from app.services.config_service import ConfigService
+            config = ConfigService.get()
             if config and config.maintainer_name and config.maintainer_email:
                 # DEBEMAIL格式: "维护者名字 <维护者邮箱>"
                 debemail = f"{config.maintainer_name} <{config.maintainer_email}>"
@@ -801,8 +1449,9 @@ class BuildExecutor:
                         # 第一条使用 -v 创建新版本，后续使用 -a 追加到当前版本
                         if idx == 0:
                             # 创建新版本
-                            subprocess.run(
+                            ProcessWatchdog().run(
                                 ['dch', '-v', self.task.version, '-D', 'unstable', commit_msg.strip()],
+                                cwd=self.project.local_repo_path,
                                 check=True,
                                 capture_output=True,
                                 text=True
@@ -810,8 +1459,9 @@ class BuildExecutor:
                             logger.info(f"创建新版本并添加: {commit_msg.strip()}")
                         else:
                             # 追加到当前版本
-                            subprocess.run(
+                            ProcessWatchdog().run(
                                 ['dch', '-a', commit_msg.strip()],
+                                cwd=self.project.local_repo_path,
                                 check=True,
                                 capture_output=True,
                                 text=True
@@ -839,10 +1489,7 @@ class BuildExecutor:
     def _step_3_commit(self, step):
         """步骤3: 提交Commit"""
         try:
-            repo = Repo(self.project.local_repo_path)
-            
-            # 为GitHub仓库设置代理
-            self._setup_github_proxy(repo)
+            repo = WatchedRepo(self.project.local_repo_path)
             
             # 获取当前分支
             current_branch = repo.active_branch.name
@@ -861,7 +1508,8 @@ class BuildExecutor:
                 
                 # 从远程获取最新代码
                 origin = repo.remotes.origin
-                origin.fetch()
+                with repo.git.custom_environment(**self._git_env(repo)):
+                    origin.fetch()
                 
                 # 重置到远程分支最新状态
                 try:
@@ -923,7 +1571,7 @@ class BuildExecutor:
             
             # 保存commit hash
             self.task.gerrit_commit_hash = commit.hexsha
-            db.session.commit()
+            self._commit(force=True)
             
             logger.info(f"提交成功: task_id={self.task_id}, commit={commit.hexsha[:8]}")
             
@@ -934,17 +1582,14 @@ class BuildExecutor:
     def _step_4_push(self, step):
         """步骤4: 推送到远程"""
         try:
-            repo = Repo(self.project.local_repo_path)
+            repo = WatchedRepo(self.project.local_repo_path)
             current_branch = repo.active_branch.name
             
             # 获取全局配置
-            from app.models import GlobalConfig
-            config = GlobalConfig.query.first()
+            from app.services.config_service import ConfigService
+            config = ConfigService.get()
             
             if self.project.github_url:
-                # 为GitHub仓库设置代理
-                self._setup_github_proxy(repo)
-                
                 # GitHub项目：推送到用户自己的fork仓库
                 if not config or not config.github_username:
                     raise Exception("未配置GitHub用户名，请在全局配置中设置github_username")
@@ -978,7 +1623,8 @@ class BuildExecutor:
                 # 推送到fork仓库
                 logger.info(f"推送分支 {current_branch} 到 fork/{current_branch}")
                 try:
-                    push_info = fork_remote.push(f"{current_branch}:{current_branch}", force=True)
+                    with repo.git.custom_environment(**self._git_env(repo, 'fork')):
+                        push_info = fork_remote.push(f"{current_branch}:{current_branch}", force=True)
                     logger.info(f"推送结果: {push_info}")
                 except Exception as e:
                     raise Exception(f"推送到fork仓库失败: {str(e)}")
@@ -991,35 +1637,33 @@ class BuildExecutor:
                 )
                 
             elif self.project.gerrit_url:
-                # Gerrit项目：使用git-review推送
+                # Gerrit项目：直接推送到 refs/for/<branch>（无需git-review）
+                from app.services.git_service import GitService
                 target_branch = self.project.gerrit_branch
+                safe_version = self.task.version.replace(':', '-').replace(' ', '-').replace('/', '-')
+                topic = f"changelog-{safe_version}"
                 
-                logger.info(f"使用git-review推送到Gerrit: {target_branch}")
+                logger.info(f"推送到Gerrit: refs/for/{target_branch}, topic={topic}")
                 
-                # 切换到仓库目录
-                os.chdir(self.project.local_repo_path)
+                result = GitService(self.project.local_repo_path).push_for_review(
+                    target_branch,
+                    remote='origin',
+                    topic=topic,
+                    gerrit_url=config.gerrit_url if config else None,
+                    env={**os.environ, **self._git_env(repo)}
+                )
+                logger.info(f"Gerrit推送输出: {result['output']}")
                 
-                # 使用git-review推送
-                try:
-                    result = subprocess.run(
-                        ['git', 'review', '-R', target_branch, '-r', 'origin'],
-                        check=True,
-                        capture_output=True,
-                        text=True
-                    )
-                    
-                    logger.info(f"git-review输出: {result.stdout}")
-                    
-                    step.log_message = (
-                        f"推送成功\n"
-                        f"目标: Gerrit\n"
-                        f"分支: {target_branch}\n"
-                        f"方式: git-review"
-                    )
-                    
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"git-review失败: {e.stderr}")
-                    raise Exception(f"git-review推送失败: {e.stderr}")
+                if not result['success']:
+                    raise Exception(f"推送到Gerrit失败: {result['message']}")
+                
+                step.log_message = (
+                    f"推送成功\n"
+                    f"目标: Gerrit\n"
+                    f"分支: {target_branch}\n"
+                    f"Topic: {topic}\n"
+                    f"变更: {result['change_url'] or result['message']}"
+                )
             else:
                 raise Exception("项目未配置GitHub或Gerrit URL")
             
@@ -1037,12 +1681,12 @@ class BuildExecutor:
             return
         
         try:
-            repo = Repo(self.project.local_repo_path)
+            repo = WatchedRepo(self.project.local_repo_path)
             current_branch = repo.active_branch.name
             
             # 获取全局配置
-            from app.models import GlobalConfig
-            config = GlobalConfig.query.first()
+            from app.services.config_service import ConfigService
+            config = ConfigService.get()
             
             if not config or not config.github_username:
                 raise Exception("未配置GitHub用户名")
@@ -1078,86 +1722,53 @@ class BuildExecutor:
 - 目标分支: {base_branch}
 """
             
-            # 切换到仓库目录
-            os.chdir(self.project.local_repo_path)
+            if not config.github_token:
+                raise Exception("未配置GitHub Token，无法创建PR")
             
-            # 使用gh命令创建PR
+            # 通过GitHub REST API创建PR（共用连接池和限流调度器，无需gh命令和切换目录）
             logger.info(f"创建PR: {config.github_username}:{current_branch} -> {upstream_owner}:{base_branch}")
             
-            try:
-                # gh pr create --repo OWNER/REPO --head USER:BRANCH --base BASE --title TITLE --body BODY
-                cmd = [
-                    'gh', 'pr', 'create',
-                    '--repo', f'{upstream_owner}/{repo_name}',
-                    '--head', f'{config.github_username}:{current_branch}',
-                    '--base', base_branch,
-                    '--title', pr_title,
-                    '--body', pr_body
-                ]
-                
-                result = subprocess.run(
-                    cmd,
-                    check=True,
-                    capture_output=True,
-                    text=True
-                )
-                
-                # 从输出中提取PR URL
-                pr_url = result.stdout.strip()
-                logger.info(f"PR创建成功: {pr_url}")
-                
-                # 提取PR编号
-                # URL格式: https://github.com/owner/repo/pull/123
-                pr_number = pr_url.split('/')[-1]
-                
-                # 保存PR信息到任务
-                self.task.github_pr_url = pr_url
-                self.task.github_pr_number = int(pr_number) if pr_number.isdigit() else None
-                db.session.commit()
-                
+            from app.services.github_service import GitHubService
+            github = GitHubService(upstream_owner, repo_name, config.github_token)
+            result = github.create_pull_request(
+                title=pr_title,
+                head=f'{config.github_username}:{current_branch}',
+                base=base_branch,
+                body=pr_body
+            )
+            
+            if not result['success']:
+                logger.error(f"创建PR失败: {result['message']}")
+                raise Exception(result['message'])
+            
+            pr_url = result['url']
+            pr_number = result['number']
+            
+            # 保存PR信息到任务
+            self.task.github_pr_url = pr_url
+            self.task.github_pr_number = pr_number
+            self._commit(force=True)
+            
+            if result['existed']:
                 step.log_message = (
-                    f"PR创建成功\n"
+                    f"⚠️ PR已存在，使用现有PR\n"
                     f"PR链接: {pr_url}\n"
-                    f"标题: {pr_title}\n"
+                    f"PR编号: #{pr_number}\n"
                     f"源分支: {config.github_username}:{current_branch}\n"
-                    f"目标分支: {upstream_owner}:{base_branch}"
+                    f"目标分支: {upstream_owner}:{base_branch}\n"
+                    f"\n提示: 该PR在之前的任务中已创建，将继续使用此PR"
                 )
                 
-            except subprocess.CalledProcessError as e:
-                error_msg = e.stderr if e.stderr else str(e)
-                logger.warning(f"gh命令执行失败: {error_msg}")
-                
-                # 检查是否是PR已存在的错误
-                if "already exists" in error_msg:
-                    # 从错误信息中提取PR URL
-                    # 错误格式: a pull request for branch "..." into branch "..." already exists:\nhttps://github.com/...
-                    import re
-                    pr_url_match = re.search(r'(https://github\.com/[^\s]+)', error_msg)
-                    
-                    if pr_url_match:
-                        pr_url = pr_url_match.group(1).strip()
-                        pr_number = pr_url.split('/')[-1]
-                        
-                        # 保存已存在的PR信息
-                        self.task.github_pr_url = pr_url
-                        self.task.github_pr_number = int(pr_number) if pr_number.isdigit() else None
-                        db.session.commit()
-                        
-                        step.log_message = (
-                            f"⚠️ PR已存在，使用现有PR\n"
-                            f"PR链接: {pr_url}\n"
-                            f"PR编号: #{pr_number}\n"
-                            f"源分支: {config.github_username}:{current_branch}\n"
-                            f"目标分支: {upstream_owner}:{base_branch}\n"
-                            f"\n提示: 该PR在之前的任务中已创建，将继续使用此PR"
-                        )
-                        
-                        logger.info(f"PR已存在，使用现有PR: {pr_url}, task_id={self.task_id}")
-                        return  # 不抛出异常，继续执行
-                
-                # 其他错误则抛出异常
-                logger.error(f"创建PR失败: {error_msg}")
-                raise Exception(f"创建PR失败: {error_msg}")
+                logger.info(f"PR已存在，使用现有PR: {pr_url}, task_id={self.task_id}")
+                return
+            
+            step.log_message = (
+                f"PR创建成功\n"
+                f"PR链接: {pr_url}\n"
+                f"标题: {pr_title}\n"
+                f"源分支: {config.github_username}:{current_branch}\n"
+                f"目标分支: {upstream_owner}:{base_branch}"
+            )
             
             logger.info(f"PR创建成功: task_id={self.task_id}")
             
@@ -1174,8 +1785,8 @@ class BuildExecutor:
         
         try:
             # 获取全局配置
-            from app.models import GlobalConfig
-            config = GlobalConfig.query.first()
+            from app.services.config_service import ConfigService
+            config = ConfigService.get()
             
             if not config or not config.github_token:
                 raise Exception("未配置GitHub Token，无法监控PR状态")
@@ -1196,155 +1807,129 @@ class BuildExecutor:
             pr_number = self.task.github_pr_number
             logger.info(f"解析GitHub URL: {self.project.github_url} -> {owner}/{repo}")
             
-            # GitHub API URL
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}"
-            
-            # 设置请求头
-            headers = {
-                'Authorization': f'token {config.github_token}',
-                'Accept': 'application/vnd.github.v3+json',
-                'User-Agent': 'deepin-autopack'
-            }
+            # 登记到PR状态聚合器，所有等待中的PR由同一个GraphQL请求批量查询
+            from app.services.pr_status_service import PRStatusAggregator
+            aggregator = PRStatusAggregator()
+            pr_key = aggregator.register(owner, repo, pr_number, config.github_token)
             
             logger.info(f"开始监控PR状态: {owner}/{repo}#{pr_number}")
             
-            # 轮询检查PR状态（最多30分钟，每30秒检查一次）
-            max_attempts = 60  # 30分钟 / 30秒
-            check_interval = 30  # 30秒
+            # 等待PR合并（最多30分钟，每个聚合周期检查一次）
+            max_wait = 30 * 60  # 30分钟
+            check_interval = PRStatusAggregator.POLL_INTERVAL
+            max_attempts = max_wait // check_interval
+            start_time = time.time()
+            last_cycle = aggregator.get_cycle()
+            attempt = 0
             
-            for attempt in range(max_attempts):
-                # 检查是否被停止
-                if self._stop_event.is_set():
-                    step.log_message = "监控被中断"
-                    logger.info(f"PR监控被停止: task_id={self.task_id}")
-                    return
-                
-                # 调用GitHub API
-                import requests
-                try:
-                    response = requests.get(api_url, headers=headers, timeout=10)
+            # 进度通过追加日志行记录，log_message 只保存摘要
+            step.log_message = f"等待PR合并中...\nPR编号: #{pr_number}"
+            self._commit()
+            
+            try:
+                while time.time() - start_time < max_wait:
+                    # 等待下一个聚合周期（可中断，额度不足时聚合周期会被拉长）
+                    previous_cycle = last_cycle
+                    pr_data, last_cycle = aggregator.wait_for_status(
+                        pr_key, last_cycle, timeout=check_interval * 2, stop_event=self._stop_event
+                    )
                     
-                    if response.status_code == 200:
-                        pr_data = response.json()
-                        
-                        state = pr_data.get('state')  # open, closed
-                        merged = pr_data.get('merged', False)
-                        mergeable_state = pr_data.get('mergeable_state', 'unknown')
-                        
-                        # 获取PR的review状态
-                        reviews_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
-                        try:
-                            reviews_response = requests.get(reviews_url, headers=headers, timeout=10)
-                            reviews_data = reviews_response.json() if reviews_response.status_code == 200 else []
-                            
-                            # 统计review状态
-                            approved_count = 0
-                            changes_requested_count = 0
-                            commented_count = 0
-                            reviewers = set()
-                            
-                            for review in reviews_data:
-                                reviewer = review.get('user', {}).get('login', 'unknown')
-                                reviewers.add(reviewer)
-                                review_state = review.get('state', '')
-                                
-                                if review_state == 'APPROVED':
-                                    approved_count += 1
-                                elif review_state == 'CHANGES_REQUESTED':
-                                    changes_requested_count += 1
-                                elif review_state == 'COMMENTED':
-                                    commented_count += 1
-                            
-                            review_summary = f"✓ {approved_count}个批准"
-                            if changes_requested_count > 0:
-                                review_summary += f" / ✗ {changes_requested_count}个请求修改"
-                            if commented_count > 0:
-                                review_summary += f" / 💬 {commented_count}个评论"
-                            
-                            reviewer_list = ", ".join(list(reviewers)[:5])  # 最多显示5个
-                            if len(reviewers) > 5:
-                                reviewer_list += "..."
-                                
-                        except Exception as e:
-                            logger.warning(f"获取review状态失败: {e}")
-                            review_summary = "review状态未知"
-                            reviewer_list = ""
-                        
-                        logger.info(f"PR状态: state={state}, merged={merged}, mergeable_state={mergeable_state}, reviews={review_summary}")
-                        
-                        if merged:
-                            # PR已合并
-                            merged_at = pr_data.get('merged_at', '')
-                            merged_by = pr_data.get('merged_by', {}).get('login', 'unknown')
-                            merge_commit_sha = pr_data.get('merge_commit_sha', '')
-                            
-                            # 保存PR合并后的commit hash，用于后续Gerrit同步检查
-                            if merge_commit_sha:
-                                self.task.gerrit_commit_hash = merge_commit_sha
-                                db.session.commit()
-                                logger.info(f"保存PR合并后的commit hash: {merge_commit_sha[:8]}")
-                            
-                            step.log_message = (
-                                f"PR已合并\n"
-                                f"PR编号: #{pr_number}\n"
-                                f"合并者: {merged_by}\n"
-                                f"合并时间: {merged_at}\n"
-                                f"合并Commit: {merge_commit_sha[:8] if merge_commit_sha else 'N/A'}\n"
-                                f"检查次数: {attempt + 1}"
-                            )
-                            
-                            logger.info(f"PR已合并: task_id={self.task_id}, pr={pr_number}, merge_commit={merge_commit_sha[:8] if merge_commit_sha else 'N/A'}")
-                            return
+                    # 检查是否被停止
+                    if self._stop_event.is_set():
+                        step.log_message = "监控被中断"
+                        logger.info(f"PR监控被停止: task_id={self.task_id}")
+                        return
+                    
+                    if pr_data is None or last_cycle == previous_cycle:
+                        logger.info(f"暂未获取到新的PR状态，继续等待: {owner}/{repo}#{pr_number}")
+                        continue
+                    
+                    attempt += 1
+                    
+                    if pr_data.get('error') == 'not_found':
+                        raise Exception(f"PR不存在: {owner}/{repo}#{pr_number}")
+                    elif pr_data.get('error') == 'unauthorized':
+                        raise Exception("GitHub Token无效或已过期")
+                    
+                    state = pr_data['state']  # open/closed/merged
+                    merged = pr_data['merged']
+                    mergeable = pr_data['mergeable']
+                    
+                    # 统计review状态
+                    approved_count = 0
+                    changes_requested_count = 0
+                    commented_count = 0
+                    reviewers = set()
+                    
+                    for review in pr_data['reviews']:
+                        reviewers.add(review['user'])
+                        review_state = review['state']
                         
-                        elif state == 'closed' and not merged:
-                            # PR被关闭但未合并
-                            raise Exception(f"PR#{pr_number}已关闭但未合并，请检查PR状态")
+                        if review_state == 'APPROVED':
+                            approved_count += 1
+                        elif review_state == 'CHANGES_REQUESTED':
+                            changes_requested_count += 1
+                        elif review_state == 'COMMENTED':
+                            commented_count += 1
+                    
+                    review_summary = f"✓ {approved_count}个批准"
+                    if changes_requested_count > 0:
+                        review_summary += f" / ✗ {changes_requested_count}个请求修改"
+                    if commented_count > 0:
+                        review_summary += f" / 💬 {commented_count}个评论"
+                    if pr_data['review_decision']:
+                        review_summary += f" ({pr_data['review_decision']})"
+                    
+                    reviewer_list = ", ".join(list(reviewers)[:5])  # 最多显示5个
+                    if len(reviewers) > 5:
+                        reviewer_list += "..."
+                    
+                    logger.info(f"PR状态: state={state}, merged={merged}, mergeable={mergeable}, reviews={review_summary}")
+                    
+                    if merged:
+                        # PR已合并
+                        merged_at = pr_data['merged_at']
+                        merged_by = pr_data['merged_by']
+                        merge_commit_sha = pr_data['merge_commit_sha']
                         
-                        # PR仍在打开状态，继续等待
-                        logger.info(f"PR#{pr_number}仍在等待合并 (attempt {attempt + 1}/{max_attempts})")
+                        # 保存PR合并后的commit hash，用于后续Gerrit同步检查
+                        if merge_commit_sha:
+                            self.task.gerrit_commit_hash = merge_commit_sha
+                            self._commit(force=True)
+                            logger.info(f"保存PR合并后的commit hash: {merge_commit_sha[:8]}")
                         
-                        # 更新步骤日志显示进度
-                        elapsed_time = (attempt + 1) * check_interval
                         step.log_message = (
-                            f"等待PR合并中...\n"
+                            f"PR已合并\n"
                             f"PR编号: #{pr_number}\n"
-                            f"状态: {state}\n"
-                            f"Review状态: {review_summary}\n"
+                            f"合并者: {merged_by}\n"
+                            f"合并时间: {merged_at}\n"
+                            f"合并Commit: {merge_commit_sha[:8] if merge_commit_sha else 'N/A'}\n"
+                            f"检查次数: {attempt}"
                         )
                         
-                        if reviewer_list:
-                            step.log_message += f"评审者: {reviewer_list}\n"
-                        
-                        step.log_message += (
-                            f"已等待: {elapsed_time}秒\n"
-                            f"检查次数: {attempt + 1}/{max_attempts}"
-                        )
-                        db.session.commit()
-                        
-                    elif response.status_code == 404:
-                        raise Exception(f"PR不存在: {owner}/{repo}#{pr_number}")
-                    elif response.status_code == 401:
-                        raise Exception("GitHub Token无效或已过期")
-                    elif response.status_code == 403:
-                        # 可能是API速率限制
-                        rate_limit_remaining = response.headers.get('X-RateLimit-Remaining', 'unknown')
-                        raise Exception(f"GitHub API访问受限 (剩余: {rate_limit_remaining})")
-                    else:
-                        raise Exception(f"GitHub API请求失败: HTTP {response.status_code}")
-                    
-                except requests.exceptions.Timeout:
-                    logger.warning(f"GitHub API请求超时，继续重试")
-                except requests.exceptions.RequestException as e:
-                    logger.warning(f"GitHub API请求异常: {e}，继续重试")
-                
-                # 等待下一次检查（使用可中断的sleep）
-                for _ in range(check_interval):
-                    if self._stop_event.is_set():
+                        logger.info(f"PR已合并: task_id={self.task_id}, pr={pr_number}, merge_commit={merge_commit_sha[:8] if merge_commit_sha else 'N/A'}")
                         return
-                    time.sleep(1)
+                    
+                    elif state == 'closed':
+                        # PR被关闭但未合并
+                        raise Exception(f"PR#{pr_number}已关闭但未合并，请检查PR状态")
+                    
+                    # PR仍在打开状态，继续等待
+                    logger.info(f"PR#{pr_number}仍在等待合并 (attempt {attempt}/{max_attempts})")
+                    
+                    # 追加一行进度日志
+                    elapsed_time = int(time.time() - start_time)
+                    progress = f"状态: {state}, 可合并: {mergeable}, Review: {review_summary}"
+                    if reviewer_list:
+                        progress += f", 评审者: {reviewer_list}"
+                    progress += f", 已等待: {elapsed_time}秒 ({attempt}/{max_attempts})"
+                    self._append_log(step, progress)
+                    self._commit()
+            finally:
+                aggregator.unregister(pr_key)
             
             # 超时未合并
-            raise Exception(f"PR监控超时（{max_attempts * check_interval / 60}分钟），PR仍未合并")
+            raise Exception(f"PR监控超时（{max_wait / 60}分钟），PR仍未合并")
             
         except Exception as e:
             logger.exception(f"PR监控失败: task_id={self.task_id}, error={e}")
@@ -1363,10 +1948,10 @@ class BuildExecutor:
         
         try:
             # 获取全局配置
-            from app.models import GlobalConfig
+            from app.services.config_service import ConfigService
             from app.services.gerrit_service import create_gerrit_service
             
-            config = GlobalConfig.query.first()
+            config = ConfigService.get()
             if not config or not config.ldap_username or not config.ldap_password:
                 raise Exception("未配置LDAP账号密码，无法访问Gerrit")
             
@@ -1397,42 +1982,38 @@ class BuildExecutor:
             # 注意：这个commit是PR合并后GitHub上的commit，本地仓库可能还没有
             expected_commit_msg = None
             try:
-                # 尝试通过GitHub API获取commit message
-                if self.project.github_url and expected_commit:
-                    from app.models import GlobalConfig
-                    config = GlobalConfig.query.first()
-                    if config and config.github_token:
-                        import requests
-                        # 解析GitHub仓库信息
-                        github_url = self.project.github_url
-                        if github_url.endswith('.git'):
-                            github_url = github_url[:-4]
-                        parts = github_url.replace('https://github.com/', '').split('/')
-                        owner = parts[0]
-                        repo = parts[1]
-                        
-                        # 获取commit信息
-                        api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{expected_commit}"
-                        headers = {
-                            'Authorization': f'token {config.github_token}',
-                            'Accept': 'application/vnd.github.v3+json'
-                        }
-                        response = requests.get(api_url, headers=headers, timeout=10)
-                        if response.status_code == 200:
-                            commit_data = response.json()
-                            expected_commit_msg = commit_data['commit']['message'].strip().split('\n')[0]
-                            logger.info(f"从GitHub API获取到commit message: {expected_commit_msg}")
+                # 优先使用PR状态聚合器中的合并信息（PR监控阶段已经查询过，无需额外请求）
+                if self.project.github_url and expected_commit and self.task.github_pr_number:
+                    from app.services.pr_status_service import PRStatusAggregator
+                    # 解析GitHub仓库信息
+                    github_url = self.project.github_url.rstrip('/')
+                    if github_url.endswith('.git'):
+                        github_url = github_url[:-4]
+                    parts = github_url.replace('https://github.com/', '').split('/')
+                    owner = parts[0]
+                    repo = parts[1]
+                    
+                    aggregator = PRStatusAggregator()
+                    pr_key = aggregator.make_key(owner, repo, self.task.github_pr_number)
+                    pr_data = aggregator.get_status(pr_key)
+                    if not pr_data and config.github_token:
+                        # 缓存中没有（例如服务重启后重试），单独查询一次
+                        pr_data = aggregator.fetch_statuses([pr_key], config.github_token).get(pr_key)
+                    
+                    if pr_data and pr_data.get('merge_commit_sha') == expected_commit:
+                        expected_commit_msg = pr_data.get('merge_commit_subject') or None
+                        logger.info(f"从PR合并信息获取到commit message: {expected_commit_msg}")
             except Exception as e:
-                logger.warning(f"无法从GitHub API获取commit message: {e}")
+                logger.warning(f"无法从GitHub获取commit message: {e}")
             
             # 如果GitHub API失败，尝试从本地仓库获取（可能获取不到最新的）
             if not expected_commit_msg and self.project.local_repo_path:
                 try:
-                    repo = Repo(self.project.local_repo_path)
+                    repo = WatchedRepo(self.project.local_repo_path)
                     # 先fetch最新的
-                    self._setup_github_proxy(repo)
                     origin = repo.remotes.origin
-                    origin.fetch()
+                    with repo.git.custom_environment(**self._git_env(repo)):
+                        origin.fetch()
                     # 尝试获取commit message
                     expected_commit_msg = repo.commit(expected_commit).message.strip().split('\n')[0]
                     logger.info(f"从本地仓库获取到commit message: {expected_commit_msg}")
@@ -1458,6 +2039,15 @@ class BuildExecutor:
             # 如果是重试，先立即检查一次（不等待）
             initial_check = (step.retry_count > 0)
             
+            # 进度通过追加日志行记录，log_message 只保存摘要
+            step.log_message = (
+                f"等待GitHub→Gerrit同步中...\n"
+                f"Gerrit项目: {gerrit_project_name}\n"
+                f"分支: {gerrit_branch}\n"
+                f"期望Commit: {expected_commit[:8]}"
+            )
+            self._commit()
+            
             for attempt in range(max_attempts):
                 # 检查是否被停止
                 if self._stop_event.is_set():
@@ -1472,6 +2062,7 @@ class BuildExecutor:
                         if self._stop_event.is_set():
                             return
                         time.sleep(1)
+                        self._flush_pending()
                 
                 # 获取Gerrit最新commit
                 logger.info(f"检查Gerrit同步状态 (attempt {attempt + 1}/{max_attempts}, retry_count={step.retry_count})")
@@ -1522,31 +2113,23 @@ class BuildExecutor:
                     
                     # 尚未同步，继续等待
                     elapsed_time = (attempt + 1) * check_interval
-                    step.log_message = (
-                        f"等待GitHub→Gerrit同步中...\n"
-                        f"Gerrit项目: {gerrit_project_name}\n"
-                        f"分支: {gerrit_branch}\n"
-                        f"期望Commit: {expected_commit[:8]}\n"
-                        f"当前Commit: {gerrit_commit[:8]}\n"
-                        f"已等待: {elapsed_time}秒\n"
-                        f"检查次数: {attempt + 1}/{max_attempts}"
+                    self._append_log(
+                        step,
+                        f"当前Commit: {gerrit_commit[:8]}, 已等待: {elapsed_time}秒 ({attempt + 1}/{max_attempts})"
                     )
-                    db.session.commit()
+                    self._commit()
                     
                 else:
                     # API调用失败，记录警告并继续重试
                     logger.warning(f"获取Gerrit commit失败: {result['message']}")
                     
                     elapsed_time = (attempt + 1) * check_interval
-                    step.log_message = (
-                        f"等待GitHub→Gerrit同步中...\n"
-                        f"Gerrit项目: {gerrit_project_name}\n"
-                        f"分支: {gerrit_branch}\n"
-                        f"状态: 正在重试获取Gerrit状态...\n"
-                        f"已等待: {elapsed_time}秒\n"
-                        f"检查次数: {attempt + 1}/{max_attempts}"
+                    self._append_log(
+                        step,
+                        f"获取Gerrit状态失败，正在重试: {result['message']}, "
+                        f"已等待: {elapsed_time}秒 ({attempt + 1}/{max_attempts})"
                     )
-                    db.session.commit()
+                    self._commit()
             
             # 超时未同步
             raise Exception(f"同步监控超时（{max_attempts * check_interval / 60}分钟），GitHub代码尚未同步到Gerrit")
@@ -1558,10 +2141,10 @@ class BuildExecutor:
     def _step_8_crp_build(self, step):
         """步骤8: CRP打包"""
         try:
-            from app.models import GlobalConfig
+            from app.services.config_service import ConfigService
             from app.services.crp_service import CRPService
             
-            config = GlobalConfig.query.first()
+            config = ConfigService.get()
             if not config:
                 raise Exception("未找到全局配置")
             
@@ -1578,14 +2161,15 @@ class BuildExecutor:
                 raise Exception("获取CRP Token失败，请检查LDAP账号密码配置")
             
             # 获取用于CRP打包的commit hash
-            repo = Repo(self.project.local_repo_path)
+            repo = WatchedRepo(self.project.local_repo_path)
             commit_hash = None
             
             # 更新本地仓库到最新状态并获取commit hash
             try:
                 # Fetch最新代码
                 origin = repo.remotes.origin
-                origin.fetch()
+                with repo.git.custom_environment(**self._git_env(repo)):
+                    origin.fetch()
                 logger.info(f"已fetch最新代码")
                 
                 # 根据项目类型选择分支
@@ -1690,7 +2274,7 @@ class BuildExecutor:
             self.task.crp_build_id = str(result.get('build_id', 0))
             self.task.crp_build_url = result.get('url', '')
             self.task.crp_build_status = 'building'
-            db.session.commit()
+            self._commit(force=True)
             
             step.log_message = (
                 f"CRP打包任务已提交\n"
@@ -1712,14 +2296,115 @@ class BuildExecutor:
     
     def _step_9_monitor_build(self, step):
         """步骤9: 监控打包状态"""
-        # 目前不监控打包状态，直接标记为待实现
-        step.log_message = (
-            "CRP打包监控功能待实现\n"
-            "打包任务已提交到CRP平台，请前往CRP平台查看打包状态\n"
-            f"URL: {self.task.crp_build_url if self.task.crp_build_url else 'N/A'}"
-        )
-        logger.info(f"跳过CRP打包监控: task_id={self.task_id}")
-        time.sleep(1)
+        if not self.task.crp_topic_id or not self.task.crp_build_id:
+            step.status = 'skipped'
+            step.log_message = "未提交CRP打包，跳过打包监控"
+            return
+        
+        try:
+            from app.services.crp_service import CRPService
+            from app.services.crp_build_watcher import CRPBuildWatcher
+            
+            token = CRPService.get_token()
+            if not token:
+                raise Exception("CRP登录失败，请检查LDAP账号密码")
+            
+            topic_id = int(self.task.crp_topic_id)
+            crp_project_name = self.project.crp_project_name or f"{self.project.name}-v25"
+            branch = self.project.gerrit_branch or self.project.github_branch
+            
+            # 登记到主题监控器，同一主题的所有任务共用一次releases查询
+            watcher = CRPBuildWatcher()
+            watcher.register(topic_id, token)
+            logger.info(f"开始监控CRP打包状态: task_id={self.task_id}, topic_id={topic_id}, "
+                       f"release_id={self.task.crp_build_id}")
+            
+            # 等待打包完成（最多6小时，每个监控周期检查一次）
+            max_wait = 6 * 60 * 60
+            token_refresh_interval = 30 * 60  # CRP Token刷新间隔
+            start_time = time.time()
+            token_time = start_time
+            last_cycle = watcher.get_cycle(topic_id)
+            last_state = None
+            missing_polls = 0  # 连续查询成功但未找到打包记录的次数
+            
+            try:
+                while time.time() - start_time < max_wait:
+                    previous_cycle = last_cycle
+                    releases, last_cycle = watcher.wait_for_update(
+                        topic_id, last_cycle, timeout=CRPBuildWatcher.MAX_INTERVAL * 2,
+                        stop_event=self._stop_event
+                    )
+                    
+                    # 检查是否被停止
+                    if self._stop_event.is_set():
+                        step.log_message = "监控被中断"
+                        logger.info(f"CRP打包监控被停止: task_id={self.task_id}")
+                        return
+                    
+                    # 查询失败时（如Token失效返回401后缓存已清除）立即刷新Token
+                    if releases is None or time.time() - token_time > token_refresh_interval:
+                        watcher.set_token(CRPService.get_token())
+                        token_time = time.time()
+                    
+                    if releases is None or last_cycle == previous_cycle:
+                        continue
+                    
+                    release = CRPBuildWatcher.find_release(
+                        releases, release_id=self.task.crp_build_id,
+                        project_name=crp_project_name, branch=branch, tag=self.task.version
+                    )
+                    if release is None:
+                        # 刚提交的包可能尚未出现在列表中，连续多次找不到才判定失败
+                        missing_polls += 1
+                        if missing_polls < MISSING_RELEASE_POLLS:
+                            logger.warning(f"主题{topic_id}中暂未找到打包记录（第{missing_polls}次）: task_id={self.task_id}")
+                            continue
+                        raise Exception(
+                            f"主题{topic_id}中连续{missing_polls}次未找到打包记录（可能已被放弃）: "
+                            f"release_id={self.task.crp_build_id}"
+                        )
+                    missing_polls = 0
+                    
+                    build_state = release.get('build_state', 'UNKNOWN')
+                    status = CRPBuildWatcher.classify(build_state)
+                    state_label = CRPService.get_build_state_info(build_state)['label']
+                    elapsed = int(time.time() - start_time)
+                    
+                    step.log_message = (
+                        f"CRP打包状态: {state_label} ({build_state})\n"
+                        f"主题ID: {topic_id}\n"
+                        f"包: {release.get('project_name')} {release.get('tag')}\n"
+                        f"架构: {release.get('arches')}\n"
+                        f"URL: {self.task.crp_build_url or 'N/A'}"
+                    )
+                    
+                    # 只在状态变化时追加进度日志并提交
+                    if build_state != last_state or status != 'building':
+                        last_state = build_state
+                        self.task.crp_build_status = status
+                        self._append_log(
+                            step, f"{state_label} ({build_state}), 已等待: {elapsed // 60}分{elapsed % 60}秒"
+                        )
+                        self._commit(force=True)
+                        logger.info(f"CRP打包状态更新: task_id={self.task_id}, state={build_state}")
+                    
+                    if status == 'success':
+                        logger.info(f"CRP打包成功: task_id={self.task_id}")
+                        return
+                    if status == 'failed':
+                        raise Exception(f"CRP打包失败: {state_label} ({build_state})")
+                
+                raise Exception(f"等待CRP打包超时（{max_wait // 3600}小时），最后状态: {last_state or '未知'}")
+            finally:
+                watcher.unregister(topic_id)
+            
+        except Exception as e:
+            if self.task.crp_build_status == 'building':
+                self.task.crp_build_status = 'failed'
+                self._commit(force=True)
+            logger.exception(f"CRP打包监控失败: task_id={self.task_id}, error={e}")
+            raise
     
     def _step_1_crp_build(self, step):
         """步骤1: CRP打包（仅CRP模式）"""
@@ -1731,10 +2416,18 @@ class BuildExecutor:
 
 
 class TaskQueue:
-    """任务队列管理器（单例）"""
+    """任务队列管理器（单例）
+    
+    提交的任务先进入优先级队列，调度线程在运行中的任务数低于上限时按优先级取出执行
+    （优先级相同先提交先执行）；步骤执行时再按资源类型申请资源池槽位。
+    同一项目同时只执行一个任务，其余任务保持排队，不同项目之间完全并行
+    """
     _instance = None
     _lock = threading.Lock()
     
+    MAX_WORKERS = 64  # 执行线程数（实际并发由全局配置 max_running_tasks 控制）
+    DEFAULT_MAX_RUNNING = 40
+    
     def __new__(cls):
         if cls._instance is None:
             with cls._lock:
@@ -1747,29 +2440,172 @@ class TaskQueue:
         if self._initialized:
             return
         
-        self.queue = queue.Queue()
-        self.executor = ThreadPoolExecutor(max_workers=12)  # 最多12个并发任务
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
         self.running_tasks = {}  # task_id -> (Future, BuildExecutor)
+        self.pending = []  # 等待执行的任务（堆）: (-priority, seq, task_id)
+        self._pending_ids = set()
+        self._task_projects = {}  # 排队中和运行中的任务 task_id -> project_id
+        self._running_projects = {}  # 正在执行任务的项目 project_id -> task_id
+        self._seq = itertools.count()
+        self._submit_lock = threading.RLock()
+        self._cond = threading.Condition(self._submit_lock)
         
         # 保存Flask应用实例用于在线程中创建上下文
         from flask import current_app
         self.app = current_app._get_current_object()
         
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='task-dispatcher')
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+        
+        self._recovery_enabled = False
+        self._heartbeat_wakeup = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name='task-heartbeat')
+        self._heartbeat.daemon = True
+        self._heartbeat.start()
+        
         self._initialized = True
         logger.info("任务队列管理器初始化完成")
     
-    def submit_task(self, task_id):
-        """提交任务到队列"""
-        if task_id in self.running_tasks:
-            logger.warning(f"任务已在运行中: task_id={task_id}")
-            return
+    def submit_task(self, task_id, priority=0, project_id=None):
+        """
+        提交任务到队列
+        
+        Args:
+            task_id: 任务ID
+            priority: 优先级（越大越优先）
+            project_id: 任务所属项目（不传则查询数据库）
+        """
+        if project_id is None:
+            project_id = db.session.query(BuildTask.project_id).filter_by(id=task_id).scalar()
+        
+        with self._cond:
+            if task_id in self.running_tasks or task_id in self._pending_ids:
+                logger.warning(f"任务已在队列或运行中: task_id={task_id}")
+                return
+            
+            heapq.heappush(self.pending, (-(priority or 0), next(self._seq), task_id))
+            self._pending_ids.add(task_id)
+            self._task_projects[task_id] = project_id
+            self._cond.notify_all()
+        
+        logger.info(f"任务已加入队列: task_id={task_id}, priority={priority}")
+    
+    def submit_tasks(self, tasks):
+        """
+        批量提交任务到队列（整批一起加入）
+        
+        Args:
+            tasks: [(task_id, priority, project_id), ...]
+        """
+        with self._cond:
+            for task_id, priority, project_id in tasks:
+                self.submit_task(task_id, priority, project_id)
+        logger.info(f"批量提交任务到队列: {len(tasks)}个")
+    
+    def _get_max_running(self):
+        """读取同时执行的任务数上限"""
+        try:
+            from app.services.config_service import ConfigService
+            with self.app.app_context():
+                limit = ConfigService.get().max_running_tasks or self.DEFAULT_MAX_RUNNING
+        except Exception as e:
+            logger.debug(f"读取任务并发配置失败，使用默认值: {e}")
+            limit = self.DEFAULT_MAX_RUNNING
+        return max(1, min(limit, self.MAX_WORKERS))
+    
+    def _next_runnable(self):
+        """按优先级找到第一个所属项目空闲的排队任务（调用方持有锁）"""
+        for item in sorted(self.pending):
+            if self._task_projects.get(item[2]) not in self._running_projects:
+                return item
+        return None
+    
+    def _dispatch_loop(self):
+        """调度线程：有空闲名额时按优先级启动任务，跳过所属项目正在执行任务的排队任务"""
+        logger.info("任务调度线程启动")
+        while True:
+            max_running = self._get_max_running()
+            with self._cond:
+                item = self._next_runnable() if len(self.running_tasks) < max_running else None
+                if item is None:
+                    # 任务提交或结束时被唤醒；定期醒来以应用配置变更
+                    self._cond.wait(5)
+                    continue
+                
+                self.pending.remove(item)
+                heapq.heapify(self.pending)
+                task_id = item[2]
+                self._pending_ids.discard(task_id)
+                self._running_projects[self._task_projects.get(task_id)] = task_id
+                executor_instance = BuildExecutor(task_id)
+                future = self.executor.submit(self._run_task, task_id, executor_instance)
+                self.running_tasks[task_id] = (future, executor_instance)
+            
+            logger.info(f"任务已提交到执行器: task_id={task_id}")
+    
+    def enable_recovery(self):
+        """
+        启用任务恢复：立即并定期接管心跳过期的运行中任务
         
-        executor_instance = BuildExecutor(task_id)
-        future = self.executor.submit(self._run_task, task_id, executor_instance)
-        self.running_tasks[task_id] = (future, executor_instance)
+        只在处理请求的服务进程启动时调用一次（见 run.py），脚本和后台线程中创建的应用不会恢复任务
+        """
+        self._recovery_enabled = True
+        self._heartbeat_wakeup.set()
+    
+    def _heartbeat_loop(self):
+        """心跳线程：为本进程排队和执行中的任务写入心跳，启用恢复时接管过期任务"""
+        logger.info("任务心跳线程启动")
+        while True:
+            self._heartbeat_wakeup.wait(HEARTBEAT_INTERVAL)
+            self._heartbeat_wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self._write_heartbeats()
+                    if self._recovery_enabled:
+                        BuildTaskService.recover_stale_tasks()
+            except Exception as e:
+                logger.warning(f"写入任务心跳失败: {e}")
+    
+    def _write_heartbeats(self):
+        """一条语句更新本进程所有运行中任务的心跳（不改变 updated_at）"""
+        with self._cond:
+            task_ids = list(self.running_tasks) + list(self._pending_ids)
+        if not task_ids:
+            return
+        BuildTask.query.filter(
+            BuildTask.id.in_(task_ids), BuildTask.status == 'running'
+        ).update(
+            {'heartbeat_at': datetime.utcnow(), 'updated_at': BuildTask.updated_at},
+            synchronize_session=False
+        )
+        db.session.commit()
+    
+    def get_queue_positions(self):
+        """
+        获取排队中任务的位置
         
-        logger.info(f"任务已提交到执行器: task_id={task_id}")
-        return future
+        Returns:
+            {task_id: {'position': 排队位置（从1开始）, 'waiting_for_project': 是否在等待同项目的任务}}
+        """
+        with self._cond:
+            return {
+                item[2]: {
+                    'position': index + 1,
+                    'waiting_for_project': self._task_projects.get(item[2]) in self._running_projects
+                }
+                for index, item in enumerate(sorted(self.pending))
+            }
+    
+    def get_queue_stats(self):
+        """获取队列状态"""
+        from app.services.resource_pool import ResourcePools
+        with self._cond:
+            return {
+                'running': len(self.running_tasks),
+                'pending': len(self.pending),
+                'resources': ResourcePools().get_stats()
+            }
     
     def _run_task(self, task_id, executor_instance):
         """执行任务"""
@@ -1777,23 +2613,40 @@ class TaskQueue:
             # 在新线程中需要创建应用上下文
             with self.app.app_context():
                 executor_instance.execute()
+                # 任务结束后按保留策略清理历史任务（按间隔节流）
+                BuildTaskService.maybe_apply_retention()
         except Exception as e:
             logger.exception(f"任务执行异常: task_id={task_id}, error={e}")
         finally:
-            if task_id in self.running_tasks:
-                del self.running_tasks[task_id]
-                logger.info(f"任务已从队列移除: task_id={task_id}")
+            with self._cond:
+                if task_id in self.running_tasks:
+                    del self.running_tasks[task_id]
+                    logger.info(f"任务已从队列移除: task_id={task_id}")
+                project_id = self._task_projects.pop(task_id, None)
+                if self._running_projects.get(project_id) == task_id:
+                    del self._running_projects[project_id]
+                # 空出名额，唤醒调度线程
+                self._cond.notify_all()
     
     def stop_task(self, task_id):
-        """停止任务"""
+        """停止任务（尚未开始执行的任务直接移出队列）"""
+        with self._cond:
+            if task_id in self._pending_ids:
+                self.pending = [item for item in self.pending if item[2] != task_id]
+                heapq.heapify(self.pending)
+                self._pending_ids.discard(task_id)
+                self._task_projects.pop(task_id, None)
+                logger.info(f"任务已移出队列: task_id={task_id}")
+                return
+        
         if task_id in self.running_tasks:
             future, executor_instance = self.running_tasks[task_id]
             executor_instance.stop()
             logger.info(f"已发送停止信号: task_id={task_id}")
     
     def is_running(self, task_id):
-        """检查任务是否在运行"""
-        return task_id in self.running_tasks
+        """检查任务是否在运行（包括排队中）"""
+        return task_id in self.running_tasks or task_id in self._pending_ids
     
     def get_running_tasks(self):
         """获取正在运行的任务列表"""
@@ -0,0 +1,97 @@
+"""
+全局配置缓存服务
+进程内缓存全局配置的只读快照，按 updated_at 判断是否需要重新加载，
+保存配置时主动失效，避免每个步骤/请求都查询数据库
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigSnapshot:
+    """全局配置的只读快照（可在工作线程中安全读取，不绑定数据库会话）"""
+    __slots__ = ('_data',)
+
+    def __init__(self, data: Dict[str, Any]):
+        object.__setattr__(self, '_data', dict(data))
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('全局配置快照是只读的，请通过配置页面修改')
+
+    def __repr__(self):
+        return f"<ConfigSnapshot updated_at={self._data.get('updated_at')}>"
+
+
+class ConfigService:
+    """全局配置缓存"""
+
+    CHECK_INTERVAL = 10  # 多进程部署时检查 updated_at 的最小间隔（秒）
+
+    _snapshot: Optional[ConfigSnapshot] = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get() -> ConfigSnapshot:
+        """
+        获取全局配置快照
+
+        本进程保存配置时立即失效；其他进程修改的配置最多 CHECK_INTERVAL 秒后生效
+        （通过只查询 updated_at 一列判断）
+
+        Returns:
+            ConfigSnapshot
+        """
+        with ConfigService._lock:
+            snapshot = ConfigService._snapshot
+            if snapshot is not None and time.time() - ConfigService._checked_at < ConfigService.CHECK_INTERVAL:
+                return snapshot
+
+            if snapshot is not None:
+                try:
+                    unchanged = ConfigService._load_updated_at() == snapshot.updated_at
+                except Exception as e:
+                    # 没有应用上下文的后台线程无法查询数据库，继续使用已有快照
+                    logger.debug(f"检查全局配置更新失败，使用缓存: {e}")
+                    unchanged = True
+                if unchanged:
+                    ConfigService._checked_at = time.time()
+                    return snapshot
+
+            snapshot = ConfigService._load()
+            ConfigService._snapshot = snapshot
+            ConfigService._checked_at = time.time()
+            return snapshot
+
+    @staticmethod
+    def invalidate():
+        """使缓存失效（保存配置后调用）"""
+        with ConfigService._lock:
+            ConfigService._snapshot = None
+        logger.info("全局配置缓存已失效")
+
+    @staticmethod
+    def _load() -> ConfigSnapshot:
+        from app.models import GlobalConfig
+        config = GlobalConfig.get_config()
+        data = {column.name: getattr(config, column.name) for column in GlobalConfig.__table__.columns}
+        logger.debug(f"加载全局配置: updated_at={data.get('updated_at')}")
+        return ConfigSnapshot(data)
+
+    @staticmethod
+    def _load_updated_at():
+        from app import db
+        from app.models import GlobalConfig
+        # 不触发自动 flush：执行器会话中可能有尚未提交的缓冲进度
+        with db.session.no_autoflush:
+            return db.session.query(GlobalConfig.updated_at).order_by(GlobalConfig.id).limit(1).scalar()
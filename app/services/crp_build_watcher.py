@@ -0,0 +1,230 @@
+"""
+CRP打包状态监控服务
+每个主题每个周期只查询一次 releases，再把 BuildState 分发给该主题下所有等待中的任务
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.services.crp_service import CRPService
+
+logger = logging.getLogger(__name__)
+
+
+class CRPBuildWatcher:
+    """CRP打包状态监控器（单例）
+
+    等待中的任务通过 register() 登记所在主题，后台线程按主题轮询 list_topic_releases，
+    任务通过 wait_for_update() 获取最新的 releases。开销随主题数增长，而不是随任务数增长。
+    主题下的包状态连续没有变化时（长时间打包中），该主题的轮询间隔逐步拉长，有变化时恢复。
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    POLL_INTERVAL = 30  # 基础轮询间隔（秒）
+    MAX_INTERVAL = 300  # 退避后的最大轮询间隔（秒）
+    REGISTER_DELAY = 2  # 新登记主题后延迟多久触发查询（合并同时登记的任务）
+
+    SUCCESS_STATES = ('UPLOAD_OK', 'SUCCESS', 'OK')
+    FAILED_STATES = ('UPLOAD_GIVEUP', 'APPLY_FAILED')
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._cond = threading.Condition()
+        self._watchers = {}  # topic_id -> 登记次数
+        self._topics = {}  # topic_id -> {'releases': list, 'cycle': int, 'interval': float, 'next_poll': float}
+        self._token = None
+        self._thread = None
+        self._wakeup = threading.Event()
+
+        self._initialized = True
+        logger.info("CRP打包状态监控器初始化完成")
+
+    @classmethod
+    def classify(cls, state: str) -> str:
+        """
+        将 CRP 的 BuildState 归类
+
+        Returns:
+            success/failed/building
+        """
+        state = str(state or '').upper()
+        if state in cls.SUCCESS_STATES:
+            return 'success'
+        if state in cls.FAILED_STATES or 'FAIL' in state:
+            return 'failed'
+        return 'building'
+
+    def register(self, topic_id: int, token: str) -> int:
+        """
+        登记一个需要监控的主题
+
+        Returns:
+            主题ID，用于后续获取状态和注销
+        """
+        topic_id = int(topic_id)
+        with self._cond:
+            self._watchers[topic_id] = self._watchers.get(topic_id, 0) + 1
+            self._token = token
+            topic = self._topics.setdefault(
+                topic_id, {'releases': None, 'cycle': 0, 'interval': self.POLL_INTERVAL, 'next_poll': 0}
+            )
+            # 新任务加入时恢复正常轮询频率并尽快查询
+            topic['interval'] = self.POLL_INTERVAL
+            topic['next_poll'] = 0
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll_loop, name='crp-build-watcher')
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+        logger.info(f"登记CRP主题监控: topic_id={topic_id}")
+        return topic_id
+
+    def set_token(self, token: str):
+        """更新查询使用的CRP Token（长时间监控时由等待中的任务定期刷新）"""
+        if token:
+            with self._cond:
+                self._token = token
+
+    def unregister(self, topic_id: int):
+        """注销主题监控"""
+        with self._cond:
+            count = self._watchers.get(topic_id, 0) - 1
+            if count > 0:
+                self._watchers[topic_id] = count
+            else:
+                self._watchers.pop(topic_id, None)
+                self._topics.pop(topic_id, None)
+        logger.info(f"注销CRP主题监控: topic_id={topic_id}")
+
+    def get_cycle(self, topic_id: int) -> int:
+        """获取主题已完成的轮询周期数"""
+        with self._cond:
+            topic = self._topics.get(topic_id)
+            return topic['cycle'] if topic else 0
+
+    def wait_for_update(self, topic_id: int, last_cycle: int, timeout: float,
+                        stop_event: threading.Event = None) -> Tuple[Optional[List[Dict]], int]:
+        """
+        等待主题的下一个轮询周期完成并返回 releases
+
+        Args:
+            topic_id: 主题ID
+            last_cycle: 调用方已经处理过的周期数
+            timeout: 最长等待时间（秒）
+            stop_event: 停止标志，被设置时立即返回
+
+        Returns:
+            (releases列表或None, 当前周期数)
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                topic = self._topics.get(topic_id)
+                if topic is None or topic['cycle'] > last_cycle:
+                    break
+                if stop_event is not None and stop_event.is_set():
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                # 每秒醒来一次检查停止标志
+                self._cond.wait(min(remaining, 1))
+            if topic is None:
+                return None, last_cycle
+            return topic['releases'], topic['cycle']
+
+    @staticmethod
+    def find_release(releases: List[Dict], release_id=None, project_name: str = None,
+                     branch: str = None, tag: str = None) -> Optional[Dict]:
+        """
+        从 releases 中找到任务对应的包
+
+        优先按 release ID 匹配，其次按项目名（前缀匹配）+ 分支 + 版本匹配
+        """
+        if release_id:
+            for release in releases:
+                if str(release.get('id')) == str(release_id):
+                    return release
+        if project_name:
+            for release in releases:
+                if (release.get('project_name', '').startswith(project_name)
+                        and (not branch or release.get('branch') == branch)
+                        and (not tag or release.get('tag') == tag)):
+                    return release
+        return None
+
+    def _poll_topic(self, topic_id: int, token: str):
+        """查询一个主题并更新缓存，按状态调整该主题的轮询间隔"""
+        start = time.time()
+        releases = CRPService.list_topic_releases(token, topic_id)
+
+        with self._cond:
+            topic = self._topics.get(topic_id)
+            if topic is None:
+                return
+
+            # 查询失败时保留上次结果，不推进周期，按基础间隔重试
+            if releases is None:
+                logger.warning(f"CRP主题状态查询失败，稍后重试: topic_id={topic_id}")
+                topic['next_poll'] = time.time() + self.POLL_INTERVAL
+                return
+            logger.info(f"CRP主题状态查询完成: topic_id={topic_id}, {len(releases)}个包, 耗时{time.time() - start:.2f}秒")
+
+            previous = {r.get('id'): r.get('build_state') for r in topic['releases'] or []}
+            current = {r.get('id'): r.get('build_state') for r in releases}
+            changed = previous != current
+
+            topic['releases'] = releases
+
+            # 包状态没有变化（长时间打包中）：指数退避；有变化时恢复基础间隔
+            if not changed:
+                topic['interval'] = min(topic['interval'] * 2, self.MAX_INTERVAL)
+            else:
+                topic['interval'] = self.POLL_INTERVAL
+            topic['next_poll'] = time.time() + topic['interval']
+            topic['cycle'] += 1
+            self._cond.notify_all()
+
+    def _poll_loop(self):
+        """后台轮询线程"""
+        logger.info("CRP打包状态监控线程启动")
+        while True:
+            with self._cond:
+                now = time.time()
+                next_poll = min((t['next_poll'] for t in self._topics.values()), default=now + self.POLL_INTERVAL)
+            # 等待最近一个主题到期（新登记的主题会提前唤醒，稍作延迟以合并同时登记的任务）
+            if self._wakeup.wait(max(0, next_poll - now)):
+                self._wakeup.clear()
+                time.sleep(self.REGISTER_DELAY)
+
+            with self._cond:
+                if not self._watchers:
+                    self._thread = None
+                    logger.info("没有需要监控的CRP主题，监控线程退出")
+                    return
+                now = time.time()
+                due = [topic_id for topic_id, t in self._topics.items() if t['next_poll'] <= now]
+                token = self._token
+
+            for topic_id in due:
+                try:
+                    self._poll_topic(topic_id, token)
+                except Exception as e:
+                    logger.warning(f"CRP主题状态查询异常: topic_id={topic_id}, {e}")
+                    with self._cond:
+                        topic = self._topics.get(topic_id)
+                        if topic:
+                            topic['next_poll'] = time.time() + topic['interval']
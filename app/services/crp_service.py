@@ -7,8 +7,12 @@ import requests
 import logging
 import rsa
 import base64
-from typing import List, Dict, Optional
-from app.models import GlobalConfig
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Iterator
+from app.models import CRPProjectMapping
+from app.services.config_service import ConfigService
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +29,91 @@ fe9YvvT0lqy2BtBpaQIDAQAB
 -----END PUBLIC KEY-----"""
     
     BASE_URL = "https://crp.uniontech.com/api"
+    SHUTTLE_URL = "https://shuttle.uniontech.com/api/shuttle"
+    
+    # 所有CRP/Shuttle请求共用的连接池
+    _session = None
+    _session_lock = threading.Lock()
+    
+    # 浏览器端展示数据的缓存（按主题），多个页面/用户共享
+    _cache = {}
+    _cache_lock = threading.Lock()
+    _cache_ttl = 30  # 缓存30秒
+    TOPIC_CACHE_TTL = 300  # 主题元数据缓存5分钟
+    TOKEN_CACHE_TTL = 20 * 60  # Token缓存20分钟
+    
+    @staticmethod
+    def get_session() -> requests.Session:
+        """获取共用的HTTP会话（复用连接）"""
+        if CRPService._session is None:
+            with CRPService._session_lock:
+                if CRPService._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.hooks['response'].append(CRPService._check_unauthorized)
+                    CRPService._session = session
+        return CRPService._session
+    
+    @staticmethod
+    def _check_unauthorized(response: requests.Response, *args, **kwargs):
+        """响应钩子：CRP返回401时Token已失效，清除缓存，下次获取时重新登录"""
+        if response.status_code != 401:
+            return
+        authorization = response.request.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            CRPService.invalidate_token(authorization[len('Bearer '):])
+    
+    @staticmethod
+    def invalidate_token(token: str):
+        """清除已失效的Token缓存（以及按Token缓存的用户名）"""
+        with CRPService._cache_lock:
+            keys = [k for k, v in CRPService._cache.items()
+                    if (k[0] == 'token' and v['data'] == token) or k == ('user', token)]
+            for k in keys:
+                del CRPService._cache[k]
+        if keys:
+            logger.warning("CRP Token已失效，已清除缓存，下次请求时重新登录")
+    
+    @staticmethod
+    def _get_cached(key, loader, refresh: bool = False, ttl: Optional[int] = None):
+        """
+        读取缓存，过期或不存在时调用loader加载
+        
+        Args:
+            key: 缓存键
+            loader: 加载函数，返回None表示加载失败（不缓存）
+            refresh: 是否跳过缓存强制刷新
+            ttl: 缓存时间（秒），默认 _cache_ttl
+        """
+        if not refresh:
+            data = CRPService._peek_cached(key)
+            if data is not None:
+                return data
+        
+        data = loader()
+        if data is not None:
+            CRPService._set_cached(key, data, ttl)
+        return data
+    
+    @staticmethod
+    def _peek_cached(key):
+        """读取未过期的缓存，不存在返回None"""
+        with CRPService._cache_lock:
+            entry = CRPService._cache.get(key)
+            if entry and time.time() < entry['expires']:
+                return entry['data']
+        return None
+    
+    @staticmethod
+    def _set_cached(key, data, ttl: Optional[int] = None):
+        """写入缓存，并顺带清理过期条目"""
+        current_time = time.time()
+        with CRPService._cache_lock:
+            CRPService._cache[key] = {'data': data, 'expires': current_time + (ttl or CRPService._cache_ttl)}
+            for k in [k for k, v in CRPService._cache.items() if current_time >= v['expires']]:
+                del CRPService._cache[k]
     
     @staticmethod
     def encrypt_password(password: str) -> str:
@@ -67,7 +156,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
                 "password": password
             }
             
-            response = requests.post(
+            response = CRPService.get_session().post(
                 url,
                 headers=headers,
                 json=data,
@@ -100,16 +189,18 @@ fe9YvvT0lqy2BtBpaQIDAQAB
         Returns:
             Token字符串，失败返回None
         """
-        config = GlobalConfig.get_config()
+        config = ConfigService.get()
         if not config.ldap_username or not config.ldap_password:
             logger.error("LDAP账号密码未配置")
             return None
         
-        # 加密密码
-        encrypted_pwd = CRPService.encrypt_password(config.ldap_password)
+        # 账号密码不变时复用已登录的Token（修改配置后缓存键变化，自动重新登录）
+        def login():
+            encrypted_pwd = CRPService.encrypt_password(config.ldap_password)
+            return CRPService.fetch_token(config.ldap_username, encrypted_pwd)
         
-        # 获取token
-        return CRPService.fetch_token(config.ldap_username, encrypted_pwd)
+        key = ('token', config.ldap_username, hash(config.ldap_password))
+        return CRPService._get_cached(key, login, ttl=CRPService.TOKEN_CACHE_TTL)
     
     @staticmethod
     def fetch_user(token: str) -> Optional[str]:
@@ -126,7 +217,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             url = f"{CRPService.BASE_URL}/user"
             headers = {"Authorization": f"Bearer {token}"}
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = CRPService.get_session().get(url, headers=headers, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -162,7 +253,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
                 "BranchID": branch_id
             }
             
-            response = requests.post(
+            response = CRPService.get_session().post(
                 url,
                 headers=headers,
                 json=data,
@@ -182,7 +273,95 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             return []
     
     @staticmethod
-    def list_topic_releases(token: str, topic_id: int) -> List[Dict]:
+    def normalize_topic(topic: Dict) -> Dict:
+        """标准化主题字段名（API返回的字段名可能是大写ID或小写id）"""
+        return {
+            'id': topic.get('ID') or topic.get('id'),
+            'name': topic.get('Name') or topic.get('name', ''),
+            'description': topic.get('Description') or topic.get('description', ''),
+            'create_time': topic.get('CreateTime') or topic.get('create_time', ''),
+            'creator_name': topic.get('CreatorName') or topic.get('creator_name', '')
+        }
+    
+    @staticmethod
+    def get_topics(token: str, username: str, branch_id: int, topic_type: str = "test",
+                   refresh: bool = False) -> List[Dict]:
+        """
+        获取主题列表（带缓存），同时按主题ID缓存每个主题的元数据
+        
+        列表页和详情页在缓存有效期内共用同一份主题列表
+        """
+        def load():
+            topics = CRPService.list_topics(token, username, branch_id, topic_type)
+            return topics if topics else None
+        
+        topics = CRPService._get_cached(('topics', username, branch_id, topic_type), load, refresh,
+                                        ttl=CRPService.TOPIC_CACHE_TTL) or []
+        for topic in topics:
+            normalized = CRPService.normalize_topic(topic)
+            if normalized['id']:
+                CRPService._set_cached(('topic', int(normalized['id'])), normalized, CRPService.TOPIC_CACHE_TTL)
+        return topics
+    
+    @staticmethod
+    def fetch_topic(token: str, topic_id: int) -> Optional[Dict]:
+        """
+        直接获取单个主题信息
+        
+        Returns:
+            标准化后的主题字典，失败返回None
+        """
+        try:
+            url = f"{CRPService.BASE_URL}/topics/{topic_id}"
+            headers = {"Authorization": f"Bearer {token}"}
+            
+            response = CRPService.get_session().get(url, headers=headers, timeout=30)
+            response.raise_for_status()
+            
+            result = response.json()
+            if not isinstance(result, dict):
+                return None
+            topic = CRPService.normalize_topic(result)
+            return topic if topic['id'] else None
+            
+        except Exception as e:
+            logger.warning(f"直接获取主题失败: topic_id={topic_id}, {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_topic(token: str, topic_id: int, branch_id: int = None, topic_type: str = "test") -> Optional[Dict]:
+        """
+        按主题ID获取主题元数据
+        
+        依次尝试：主题缓存 → 直接获取单个主题 → 查询主题列表（填充缓存）
+        
+        Returns:
+            标准化后的主题字典，未找到返回None
+        """
+        key = ('topic', int(topic_id))
+        topic = CRPService._peek_cached(key)
+        if topic is not None:
+            return topic
+        
+        topic = CRPService.fetch_topic(token, topic_id)
+        if topic is not None:
+            CRPService._set_cached(key, topic, CRPService.TOPIC_CACHE_TTL)
+            return topic
+        
+        if branch_id:
+            username = CRPService.get_username(token)
+            CRPService.get_topics(token, username, branch_id, topic_type)
+            return CRPService._peek_cached(key)
+        return None
+    
+    @staticmethod
+    def get_username(token: str) -> Optional[str]:
+        """获取当前登录用户名（按Token缓存）"""
+        return CRPService._get_cached(('user', token), lambda: CRPService.fetch_user(token) or None,
+                                      ttl=CRPService.TOKEN_CACHE_TTL)
+    
+    @staticmethod
+    def list_topic_releases(token: str, topic_id: int) -> Optional[List[Dict]]:
         """
         获取主题下的所有包（releases）
         
@@ -191,13 +370,13 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             topic_id: 主题ID
             
         Returns:
-            包列表
+            包列表，查询失败返回 None（与主题下没有包区分开）
         """
         try:
             url = f"{CRPService.BASE_URL}/topics/{topic_id}/releases"
             headers = {"Authorization": f"Bearer {token}"}
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = CRPService.get_session().get(url, headers=headers, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -225,10 +404,10 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             logger.error(f"获取主题包列表失败: {str(e)}")
             if hasattr(e, 'response') and e.response:
                 logger.error(f"响应内容: {e.response.text}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"获取主题包列表异常: {str(e)}")
-            return []
+            return None
     
     @staticmethod
     def list_projects(token: str, project_name: str, branch_id: int) -> List[Dict]:
@@ -263,7 +442,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             logger.debug(f"请求URL: {url}")
             logger.debug(f"请求数据: {data}")
             
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = CRPService.get_session().post(url, headers=headers, json=data, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -302,7 +481,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             url = f"{CRPService.BASE_URL}/topic_releases/{release_id}"
             headers = {"Authorization": f"Bearer {token}"}
             
-            response = requests.delete(url, headers=headers, timeout=30)
+            response = CRPService.get_session().delete(url, headers=headers, timeout=30)
             response.raise_for_status()
             
             logger.info(f"成功删除release: {release_id}")
@@ -333,7 +512,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             url = f"{CRPService.BASE_URL}/topic_releases/{release_id}/retry"
             headers = {"Authorization": f"Bearer {token}"}
             
-            response = requests.post(url, headers=headers, timeout=30)
+            response = CRPService.get_session().post(url, headers=headers, timeout=30)
             response.raise_for_status()
             
             logger.info(f"成功触发重试构建: {release_id}")
@@ -348,6 +527,68 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             logger.error(f"重试构建异常: {str(e)}")
             return False
     
+    @staticmethod
+    def resolve_project_id(token: str, project_name: str, branch: str, branch_id: int,
+                           releases: Optional[List[Dict]] = None) -> int:
+        """
+        解析CRP ProjectID（优先读取持久化映射，首次解析后写入映射，映射由调用方随自己的事务提交）
+        
+        Args:
+            token: CRP Token
+            project_name: 项目名称
+            branch: 分支名称
+            branch_id: CRP分支ID
+            releases: 主题下已有的releases（可选，已查询过时传入以复用）
+            
+        Returns:
+            ProjectID，无法解析返回0
+        """
+        project_id = CRPProjectMapping.lookup(project_name, branch, branch_id)
+        if project_id:
+            logger.info(f"使用缓存的ProjectID: {project_id} ({project_name}@{branch}, branch_id={branch_id})")
+            return project_id
+        
+        logger.info(f"========== 开始自动解析ProjectID ==========")
+        logger.info(f"请求参数: project_name={project_name}, branch={branch}, branch_id={branch_id}")
+        
+        # 方法1: 先尝试从主题的已有release中找到项目ID
+        project_id = 0
+        for release in releases or []:
+            if release.get('project_name') == project_name and release.get('branch') == branch:
+                project_id = release.get('project_id', 0)
+                logger.info(f"✓ 从主题releases中找到ProjectID: {project_id}")
+                break
+        
+        # 方法2: 如果还是0，通过项目列表API查询
+        if not project_id:
+            logger.info(f"从releases中未找到，尝试通过项目列表API查询...")
+            projects = CRPService.list_projects(token, project_name, branch_id)
+            for proj in projects:
+                logger.info(f"  项目: ID={proj.get('ID')}, Name={proj.get('Name')}, Branch={proj.get('Branch')}")
+            if projects:
+                project_id = projects[0].get('ID', 0)
+                logger.info(f"✓ 从项目列表中找到ProjectID: {project_id}")
+        
+        if project_id:
+            try:
+                CRPProjectMapping.save(project_name, branch, branch_id, project_id)
+            except Exception as e:
+                logger.warning(f"保存ProjectID映射失败: {e}")
+        else:
+            logger.warning(f"✗ 无法自动解析ProjectID，将使用0（可能导致CRP返回500错误）")
+            logger.warning(f"   请检查: 1) 项目名称是否正确 2) 分支ID是否正确 3) CRP中是否存在此项目")
+        logger.info(f"==========================================")
+        return project_id
+    
+    @staticmethod
+    def invalidate_project_id(project_name: str, branch: str, branch_id: int):
+        """清除缓存的ProjectID映射"""
+        try:
+            CRPProjectMapping.invalidate(project_name, branch, branch_id)
+            logger.info(f"已清除ProjectID映射: {project_name}@{branch}, branch_id={branch_id}")
+        except Exception as e:
+            logger.warning(f"清除ProjectID映射失败: {e}")
+    
     @staticmethod
     def submit_build(token: str, topic_id: int, project_id: int, project_name: str,
                     branch: str, commit: str, tag: str, arches: str,
@@ -358,7 +599,7 @@ fe9YvvT0lqy2BtBpaQIDAQAB
         Args:
             token: CRP Token
             topic_id: 主题ID
-            project_id: 项目ID
+            project_id: 项目ID（为0时自动解析，解析结果持久化缓存）
             project_name: 项目名称
             branch: 分支名称
             commit: commit hash
@@ -371,75 +612,18 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             成功返回包含build_id的字典，失败返回None
         """
         try:
-            # 如果project_id为0，尝试自动解析
-            resolved_project_id = project_id
-            if project_id == 0:
-                logger.info(f"========== 开始自动解析ProjectID ==========")
-                logger.info(f"请求参数: project_name={project_name}, branch={branch}, branch_id={branch_id}")
-                
-                # 方法1: 先尝试从主题的已有release中找到项目ID
-                releases = CRPService.list_topic_releases(token, topic_id)
-                logger.info(f"从主题{topic_id}获取到{len(releases)}个release")
-                for release in releases:
-                    logger.debug(f"  Release: ProjectName={release.get('ProjectName')}, Branch={release.get('Branch')}, ProjectID={release.get('ProjectID')}")
-                    if release.get('ProjectName') == project_name and release.get('Branch') == branch:
-                        resolved_project_id = release.get('ProjectID', 0)
-                        logger.info(f"✓ 从主题releases中找到ProjectID: {resolved_project_id}")
-                        break
-                
-                # 方法2: 如果还是0，通过项目列表API查询
-                if resolved_project_id == 0:
-                    logger.info(f"从releases中未找到，尝试通过项目列表API查询...")
-                    logger.info(f"查询参数: name={project_name}, branch_id={branch_id}")
-                    projects = CRPService.list_projects(token, project_name, branch_id)
-                    logger.info(f"项目列表API返回: {len(projects) if projects else 0}个项目")
-                    if projects:
-                        for proj in projects:
-                            logger.info(f"  项目: ID={proj.get('ID')}, Name={proj.get('Name')}, Branch={proj.get('Branch')}")
-                    if projects and len(projects) > 0:
-                        resolved_project_id = projects[0].get('ID', 0)
-                        logger.info(f"✓ 从项目列表中找到ProjectID: {resolved_project_id}")
-                
-                if resolved_project_id == 0:
-                    logger.warning(f"✗ 无法自动解析ProjectID，将使用0（可能导致CRP返回500错误）")
-                    logger.warning(f"   请检查: 1) 项目名称是否正确 2) 分支ID是否正确 3) CRP中是否存在此项目")
-                logger.info(f"==========================================")
+            # 主题下已有的releases只查询一次，ProjectID解析和删除旧release共用
+            existing_releases = CRPService.list_topic_releases(token, topic_id) or []
             
-            url = f"{CRPService.BASE_URL}/topics/{topic_id}/new_release"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            # 确保changelog是字符串，并放在列表中
-            changelog_list = [changelog] if changelog else [""]
-            
-            data = {
-                "Arches": arches,
-                "BaseTag": None,
-                "Branch": branch,
-                "BuildID": 0,
-                "BuildState": None,
-                "Changelog": changelog_list,
-                "Commit": commit,
-                "History": None,
-                "ID": 0,
-                "ProjectID": resolved_project_id,
-                "ProjectName": project_name,
-                "ProjectRepoUrl": None,
-                "SlaveNode": None,
-                "Tag": tag,
-                "TagSuffix": None,
-                "TopicID": topic_id,
-                "TopicType": "test",
-                "ChangeLogMode": True,
-                "RepoType": "deb",
-                "Custom": True,
-                "BranchID": str(branch_id)
-            }
+            auto_resolve = project_id == 0
+            resolved_project_id = project_id
+            if auto_resolve:
+                resolved_project_id = CRPService.resolve_project_id(
+                    token, project_name, branch, branch_id, releases=existing_releases
+                )
             
             # 检查topic中是否已存在相同project和branch的release，如果存在则先删除
             # 使用模糊匹配，因为CRP中的项目名可能有后缀（如 dtk6log vs dtk6log-v25）
-            existing_releases = CRPService.list_topic_releases(token, topic_id)
             for release in existing_releases:
                 release_project = release.get('project_name', '')
                 release_branch = release.get('branch', '')
@@ -455,42 +639,32 @@ fe9YvvT0lqy2BtBpaQIDAQAB
                         logger.warning(f"删除旧release失败: {release_id}，继续尝试创建新release")
                     break
             
-            logger.info(f"准备提交CRP打包: ProjectID={resolved_project_id}, TopicID={topic_id}")
-            logger.debug(f"请求数据: {data}")
-            
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=30
+            response = CRPService._post_new_release(
+                token, topic_id, resolved_project_id, project_name,
+                branch, commit, tag, arches, branch_id, changelog
             )
             
+            # 缓存的ProjectID已失效（项目被删除或重建）：清除映射，重新解析后重试一次
+            if response.status_code not in [200, 201] and 'not found' in response.text.lower():
+                if auto_resolve:
+                    logger.warning(f"CRP返回项目不存在，ProjectID={resolved_project_id}可能已失效，重新解析")
+                    CRPService.invalidate_project_id(project_name, branch, branch_id)
+                    new_project_id = CRPService.resolve_project_id(token, project_name, branch, branch_id)
+                    if new_project_id and new_project_id != resolved_project_id:
+                        resolved_project_id = new_project_id
+                        response = CRPService._post_new_release(
+                            token, topic_id, resolved_project_id, project_name,
+                            branch, commit, tag, arches, branch_id, changelog
+                        )
+            
             # CRP成功时返回201 Created，响应内容是整数ID或JSON对象
             if response.status_code not in [200, 201]:
                 logger.error(f"CRP API返回错误状态码: {response.status_code}")
                 logger.error(f"响应内容: {response.text}")
                 response.raise_for_status()
             
-            # 解析响应 - 可能是整数ID或JSON对象
-            try:
-                result = response.json()
-                # 如果响应是整数，直接作为build_id
-                if isinstance(result, int):
-                    build_id = result
-                    logger.info(f"CRP打包任务提交成功: build_id={build_id}")
-                else:
-                    # 如果是JSON对象，从中提取ID
-                    build_id = result.get('ID', 0)
-                    logger.info(f"CRP打包任务提交成功: project={project_name}, commit={commit[:8]}")
-                    logger.debug(f"CRP响应: {result}")
-            except:
-                # 如果JSON解析失败，尝试作为文本解析为整数
-                try:
-                    build_id = int(response.text.strip())
-                    logger.info(f"CRP打包任务提交成功: build_id={build_id}")
-                except:
-                    logger.error(f"无法解析CRP响应: {response.text}")
-                    build_id = 0
+            build_id = CRPService._parse_build_id(response)
+            logger.info(f"CRP打包任务提交成功: project={project_name}, commit={commit[:8]}, build_id={build_id}")
             
             # 构建返回结果
             return {
@@ -509,6 +683,286 @@ fe9YvvT0lqy2BtBpaQIDAQAB
             logger.error(f"提交CRP打包任务异常: {str(e)}")
             return None
     
+    @staticmethod
+    def _parse_build_id(response: requests.Response) -> int:
+        """解析new_release接口的响应 - 可能是整数ID或JSON对象"""
+        try:
+            result = response.json()
+            if isinstance(result, int):
+                return result
+            logger.debug(f"CRP响应: {result}")
+            return result.get('ID', 0)
+        except Exception:
+            # 如果JSON解析失败，尝试作为文本解析为整数
+            try:
+                return int(response.text.strip())
+            except Exception:
+                logger.error(f"无法解析CRP响应: {response.text}")
+                return 0
+    
+    @staticmethod
+    def iter_submit_batch(token: str, topic_id: int, items: List[Dict], branch_id: int,
+                          max_workers: int = 8) -> Iterator[Dict]:
+        """
+        批量提交CRP打包任务（同一主题下的多个项目），逐步产出进度事件
+        
+        主题releases只查询一次；被替换的旧release并行删除；新release通过有界线程池并发提交
+        
+        Args:
+            token: CRP Token
+            topic_id: 主题ID
+            items: 提交项列表，每项包含 project_name, branch, commit, tag, arches,
+                   可选 changelog, project_id（为0或缺省时自动解析）
+            branch_id: CRP分支ID
+            max_workers: 最大并发数
+            
+        Yields:
+            进度事件字典，type 为 start/deleted/item_complete/complete；
+            complete 事件的 results 为按输入顺序排列的逐项结果
+        """
+        total = len(items)
+        results = [None] * total
+        yield {'type': 'start', 'total': total}
+        
+        existing_releases = CRPService.list_topic_releases(token, topic_id) or []
+        
+        # ProjectID 解析涉及数据库（映射缓存），在当前线程中顺序完成
+        project_ids = []
+        for item in items:
+            project_id = item.get('project_id') or 0
+            if not project_id:
+                project_id = CRPService.resolve_project_id(
+                    token, item['project_name'], item['branch'], branch_id, releases=existing_releases
+                )
+            project_ids.append(project_id)
+        
+        # 找出被替换的旧release（匹配规则与 submit_build 相同），并行删除
+        superseded = {}
+        for item in items:
+            for release in existing_releases:
+                if (release.get('project_name', '').startswith(item['project_name'])
+                        and release.get('branch') == item['branch']):
+                    superseded[release.get('id')] = release.get('project_name')
+                    break
+        
+        workers = max(1, min(max_workers, total))
+        if superseded:
+            with ThreadPoolExecutor(max_workers=min(workers, len(superseded))) as executor:
+                future_to_release = {
+                    executor.submit(CRPService.delete_release, token, release_id): release_id
+                    for release_id in superseded
+                }
+                for future in as_completed(future_to_release):
+                    release_id = future_to_release[future]
+                    deleted = future.result()
+                    if not deleted:
+                        logger.warning(f"删除旧release失败: {release_id}，继续尝试创建新release")
+                    yield {'type': 'deleted', 'release_id': release_id,
+                           'project_name': superseded[release_id], 'success': deleted}
+        
+        def submit_one(index):
+            item = items[index]
+            response = CRPService._post_new_release(
+                token, topic_id, project_ids[index], item['project_name'], item['branch'],
+                item['commit'], item['tag'], item['arches'], branch_id, item.get('changelog', '')
+            )
+            return index, response
+        
+        def make_result(index, response=None, error=None):
+            item = items[index]
+            result = {
+                'index': index,
+                'project_name': item['project_name'],
+                'project_id': project_ids[index],
+                'success': False,
+                'build_id': None,
+                'message': ''
+            }
+            if error is not None:
+                result['message'] = str(error)
+            elif response.status_code in [200, 201]:
+                result['success'] = True
+                result['build_id'] = CRPService._parse_build_id(response)
+                result['message'] = '打包任务已提交'
+            else:
+                result['message'] = f"HTTP {response.status_code}: {response.text[:200]}"
+            return result
+        
+        not_found = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(submit_one, i): i for i in range(total)}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    _, response = future.result()
+                except Exception as e:
+                    logger.error(f"提交CRP打包任务失败: {items[index]['project_name']}, {e}")
+                    results[index] = make_result(index, error=e)
+                else:
+                    if (response.status_code not in [200, 201] and 'not found' in response.text.lower()
+                            and not items[index].get('project_id')):
+                        # ProjectID 可能已失效，稍后在当前线程中重新解析后重试
+                        not_found.append(index)
+                        continue
+                    results[index] = make_result(index, response)
+                done += 1
+                yield {'type': 'item_complete', 'current': done, 'total': total, **results[index]}
+        
+        for index in not_found:
+            item = items[index]
+            logger.warning(f"CRP返回项目不存在，ProjectID={project_ids[index]}可能已失效，重新解析: {item['project_name']}")
+            CRPService.invalidate_project_id(item['project_name'], item['branch'], branch_id)
+            project_ids[index] = CRPService.resolve_project_id(token, item['project_name'], item['branch'], branch_id)
+            try:
+                _, response = submit_one(index)
+                results[index] = make_result(index, response)
+            except Exception as e:
+                results[index] = make_result(index, error=e)
+            done += 1
+            yield {'type': 'item_complete', 'current': done, 'total': total, **results[index]}
+        
+        success_count = sum(1 for r in results if r['success'])
+        logger.info(f"CRP批量提交完成: topic_id={topic_id}, 成功={success_count}, 失败={total - success_count}")
+        yield {
+            'type': 'complete',
+            'success_count': success_count,
+            'failed_count': total - success_count,
+            'results': results
+        }
+    
+    @staticmethod
+    def submit_batch(token: str, topic_id: int, items: List[Dict], branch_id: int,
+                     max_workers: int = 8) -> List[Dict]:
+        """
+        批量提交CRP打包任务（参数见 iter_submit_batch）
+        
+        Returns:
+            按输入顺序排列的逐项结果列表
+        """
+        results = []
+        for event in CRPService.iter_submit_batch(token, topic_id, items, branch_id, max_workers):
+            if event['type'] == 'complete':
+                results = event['results']
+        return results
+    
+    @staticmethod
+    def _post_new_release(token: str, topic_id: int, project_id: int, project_name: str,
+                          branch: str, commit: str, tag: str, arches: str,
+                          branch_id: int, changelog: str = "") -> requests.Response:
+        """调用CRP new_release接口，返回原始响应"""
+        url = f"{CRPService.BASE_URL}/topics/{topic_id}/new_release"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        # 确保changelog是字符串，并放在列表中
+        changelog_list = [changelog] if changelog else [""]
+        
+        data = {
+            "Arches": arches,
+            "BaseTag": None,
+            "Branch": branch,
+            "BuildID": 0,
+            "BuildState": None,
+            "Changelog": changelog_list,
+            "Commit": commit,
+            "History": None,
+            "ID": 0,
+            "ProjectID": project_id,
+            "ProjectName": project_name,
+            "ProjectRepoUrl": None,
+            "SlaveNode": None,
+            "Tag": tag,
+            "TagSuffix": None,
+            "TopicID": topic_id,
+            "TopicType": "test",
+            "ChangeLogMode": True,
+            "RepoType": "deb",
+            "Custom": True,
+            "BranchID": str(branch_id)
+        }
+        
+        logger.info(f"准备提交CRP打包: ProjectID={project_id}, TopicID={topic_id}")
+        logger.debug(f"请求数据: {data}")
+        
+        return CRPService.get_session().post(url, headers=headers, json=data, timeout=30)
+    
+    @staticmethod
+    def get_topic_urls(topic_id: int, branch_id: int, refresh: bool = False) -> Optional[List[str]]:
+        """
+        获取主题的仓库地址（按主题缓存）
+        
+        Args:
+            topic_id: 主题ID
+            branch_id: CRP分支ID
+            refresh: 是否跳过缓存
+            
+        Returns:
+            仓库地址列表，失败返回None
+        """
+        def load():
+            try:
+                response = CRPService.get_session().post(
+                    f"{CRPService.BASE_URL}/topic_urls",
+                    json={"branchID": branch_id, "topicID": topic_id},
+                    timeout=30
+                )
+                response.raise_for_status()
+                return response.json().get('RepoUrls') or []
+            except Exception as e:
+                logger.error(f"获取主题仓库地址失败: topic_id={topic_id}, {str(e)}")
+                return None
+        
+        return CRPService._get_cached(('topic_urls', topic_id, branch_id), load, refresh)
+    
+    @staticmethod
+    def get_shuttle_jobs(topic_id: int, build_id: int, refresh: bool = False) -> Optional[List[Dict]]:
+        """
+        获取Shuttle构建任务的各架构job状态（按主题缓存）
+        
+        Args:
+            topic_id: 主题ID（缓存命名空间）
+            build_id: Shuttle任务ID（即release的build_id）
+            refresh: 是否跳过缓存
+            
+        Returns:
+            job列表（包含id、arch、status），失败返回None
+        """
+        def load():
+            try:
+                response = CRPService.get_session().post(
+                    f"{CRPService.SHUTTLE_URL}/task/list",
+                    json={"params": {"taskid": str(build_id)}, "pageSize": 20, "current": 1},
+                    timeout=30
+                )
+                response.raise_for_status()
+                tasks = response.json().get('tasks') or []
+                jobs = (tasks[0].get('jobs') if tasks else None) or []
+                return [{'id': job.get('id'), 'arch': job.get('arch'), 'status': job.get('status') or 'UNKNOWN'}
+                        for job in jobs]
+            except Exception as e:
+                logger.error(f"获取Shuttle任务状态失败: build_id={build_id}, {str(e)}")
+                return None
+        
+        return CRPService._get_cached(('shuttle_jobs', topic_id, build_id), load, refresh)
+    
+    @staticmethod
+    def get_topic_arch_status(topic_id: int, build_ids: List[int], refresh: bool = False,
+                              max_workers: int = 8) -> Dict[int, Optional[List[Dict]]]:
+        """
+        并行获取主题下多个构建任务的架构状态
+        
+        Returns:
+            build_id -> job列表（失败为None）
+        """
+        build_ids = [b for b in dict.fromkeys(build_ids) if b]
+        if not build_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(build_ids))) as executor:
+            futures = {executor.submit(CRPService.get_shuttle_jobs, topic_id, b, refresh): b for b in build_ids}
+            return {futures[f]: f.result() for f in as_completed(futures)}
+    
     @staticmethod
     def get_build_state_info(state: str) -> Dict[str, str]:
         """
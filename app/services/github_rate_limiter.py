@@ -0,0 +1,205 @@
+"""
+GitHub API 全局限流调度器
+所有GitHub请求（PR监控、commit查询、创建PR）共享同一个令牌桶，
+根据响应头中的 X-RateLimit-* 动态调整发送速率和轮询间隔
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubRateLimiter:
+    """GitHub API 限流调度器（单例）
+
+    每种资源（core/graphql）一个令牌桶。桶的补充速率 = 剩余额度 / 距离重置的秒数，
+    保证在重置前不会耗尽额度；额度不足时 scale_interval() 会按比例拉长轮询间隔。
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    DEFAULT_LIMIT = 5000  # 认证用户每小时的默认额度
+    BURST = 10  # 令牌桶容量（允许的突发请求数）
+    RESERVE = 50  # 保留额度，留给创建PR等关键请求
+    MAX_INTERVAL_FACTOR = 10  # 轮询间隔最多拉长的倍数
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._cond = threading.Condition()
+        self._buckets = {}  # resource -> 桶状态
+        self.session = requests.Session()  # 所有GitHub请求共用连接池
+        self.session.headers.update({'User-Agent': 'deepin-autopack'})
+
+        self._initialized = True
+        logger.info("GitHub限流调度器初始化完成")
+
+    def _bucket(self, resource: str) -> Dict:
+        """获取（必要时创建）资源对应的令牌桶，调用方需持有锁"""
+        bucket = self._buckets.get(resource)
+        if bucket is None:
+            bucket = {
+                'tokens': float(self.BURST),
+                'updated': time.time(),
+                'limit': self.DEFAULT_LIMIT,
+                'remaining': self.DEFAULT_LIMIT,
+                'reset': time.time() + 3600,
+                'used': 0,
+                'throttled': 0,
+            }
+            self._buckets[resource] = bucket
+        return bucket
+
+    def _refill_rate(self, bucket: Dict, critical: bool = False) -> float:
+        """计算令牌补充速率（每秒）"""
+        seconds_to_reset = max(bucket['reset'] - time.time(), 1)
+        budget = bucket['remaining'] if critical else bucket['remaining'] - self.RESERVE
+        return max(budget, 0) / seconds_to_reset
+
+    def acquire(self, resource: str = 'core', critical: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        获取一次请求的配额，额度不足时阻塞等待
+
+        Args:
+            resource: 资源类型（core/graphql）
+            critical: 是否为关键请求（可以使用保留额度）
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            是否成功获取配额
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            bucket = self._bucket(resource)
+            waited = False
+            while True:
+                now = time.time()
+                # 额度已重置
+                if now >= bucket['reset']:
+                    bucket['remaining'] = bucket['limit']
+                    bucket['reset'] = now + 3600
+
+                rate = self._refill_rate(bucket, critical)
+                bucket['tokens'] = min(self.BURST, bucket['tokens'] + (now - bucket['updated']) * rate)
+                bucket['updated'] = now
+
+                if bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    bucket['used'] += 1
+                    # 本地先行扣减，收到响应后以响应头为准
+                    bucket['remaining'] = max(bucket['remaining'] - 1, 0)
+                    return True
+
+                if not waited:
+                    bucket['throttled'] += 1
+                    waited = True
+
+                # 计算下一个令牌到达的时间
+                wait = (1 - bucket['tokens']) / rate if rate > 0 else bucket['reset'] - now
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wait = min(wait, deadline - now)
+                self._cond.wait(max(min(wait, 60), 0.1))
+
+    def update_from_headers(self, headers, resource: Optional[str] = None):
+        """根据响应头更新剩余额度"""
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is None:
+            return
+        resource = headers.get('X-RateLimit-Resource') or resource or 'core'
+        with self._cond:
+            bucket = self._bucket(resource)
+            try:
+                bucket['remaining'] = int(remaining)
+                if headers.get('X-RateLimit-Limit'):
+                    bucket['limit'] = int(headers['X-RateLimit-Limit'])
+                if headers.get('X-RateLimit-Reset'):
+                    bucket['reset'] = float(headers['X-RateLimit-Reset'])
+            except (TypeError, ValueError):
+                return
+            self._cond.notify_all()
+
+    def request(self, method: str, url: str, token: Optional[str] = None, resource: str = 'core',
+                critical: bool = False, **kwargs) -> requests.Response:
+        """
+        通过限流调度器发送GitHub请求
+
+        Args:
+            method: 请求方法
+            url: 请求地址
+            token: GitHub Token
+            resource: 资源类型（core/graphql）
+            critical: 是否为关键请求
+            **kwargs: 传递给requests的其他参数
+
+        Returns:
+            requests.Response
+        """
+        headers = kwargs.pop('headers', {}) or {}
+        if token and 'Authorization' not in headers:
+            headers['Authorization'] = f'token {token}'
+        kwargs.setdefault('timeout', 30)
+        if 'proxies' not in kwargs:
+            from app.services.network_policy import NetworkPolicy
+            kwargs['proxies'] = NetworkPolicy.requests_proxies(url)
+
+        self.acquire(resource, critical=critical)
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        self.update_from_headers(response.headers, resource)
+
+        if response.status_code in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0':
+            logger.warning(f"GitHub API额度已耗尽（{resource}），重置时间: "
+                           f"{time.strftime('%H:%M:%S', time.localtime(self.get_reset(resource)))}")
+        return response
+
+    def get_reset(self, resource: str = 'core') -> float:
+        """获取额度重置时间戳"""
+        with self._cond:
+            return self._bucket(resource)['reset']
+
+    def scale_interval(self, base_interval: float, resource: str = 'core') -> float:
+        """
+        根据剩余额度拉长轮询间隔
+
+        剩余额度高于一半时保持原间隔，低于一半时按比例拉长，最多拉长 MAX_INTERVAL_FACTOR 倍
+        """
+        with self._cond:
+            bucket = self._bucket(resource)
+            limit = max(bucket['limit'], 1)
+            ratio = bucket['remaining'] / limit
+        if ratio >= 0.5:
+            return base_interval
+        factor = min(0.5 / max(ratio, 0.05), self.MAX_INTERVAL_FACTOR)
+        return base_interval * factor
+
+    def get_metrics(self) -> Dict:
+        """获取各资源的额度使用情况"""
+        metrics = {}
+        with self._cond:
+            for resource, bucket in self._buckets.items():
+                metrics[resource] = {
+                    'limit': bucket['limit'],
+                    'remaining': bucket['remaining'],
+                    'reset_at': int(bucket['reset']),
+                    'reset_in': max(int(bucket['reset'] - time.time()), 0),
+                    'requests_sent': bucket['used'],
+                    'throttled': bucket['throttled'],
+                }
+        for resource, item in metrics.items():
+            item['poll_interval_factor'] = round(self.scale_interval(1.0, resource), 2)
+        return metrics
@@ -1,43 +1,126 @@
-from flask import current_app
-import requests
+from flask import current_app, has_app_context
+import logging
+from app.services.github_rate_limiter import GitHubRateLimiter
+
+logger = logging.getLogger(__name__)
+
 
 class GitHubService:
-    def __init__(self, repo_owner, repo_name, access_token):
+    API_BASE = "https://api.github.com"
+
+    def __init__(self, repo_owner, repo_name, access_token, api_base=None):
         self.repo_owner = repo_owner
         self.repo_name = repo_name
         self.access_token = access_token
-        self.base_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}"
+        if api_base is None:
+            api_base = current_app.config.get('GITHUB_API_URL', self.API_BASE) if has_app_context() else self.API_BASE
+        self.base_url = f"{api_base.rstrip('/')}/repos/{repo_owner}/{repo_name}"
+        # 所有请求通过全局限流调度器发送（共用连接池和额度）
+        self.limiter = GitHubRateLimiter()
+
+    def _request(self, method, url, critical=False, **kwargs):
+        headers = kwargs.pop('headers', {})
+        headers.setdefault('Accept', 'application/vnd.github.v3+json')
+        return self.limiter.request(method, url, token=self.access_token, critical=critical,
+                                    headers=headers, **kwargs)
+
+    def find_pull_request(self, head, base=None, state='open'):
+        """
+        按源分支查找PR（一次查询）
+
+        Args:
+            head: 源分支，格式 user:branch
+            base: 目标分支（可选）
+            state: PR状态 open/closed/all
+
+        Returns:
+            PR数据字典，不存在返回None
+        """
+        params = {'head': head, 'state': state}
+        if base:
+            params['base'] = base
+        response = self._request('GET', f"{self.base_url}/pulls", params=params)
+        if response.status_code != 200:
+            logger.warning(f"查询PR失败: HTTP {response.status_code}, {response.text[:200]}")
+            return None
+        pulls = response.json()
+        return pulls[0] if pulls else None
 
     def create_pull_request(self, title, head, base, body=""):
+        """
+        创建PR，如果该源分支已有打开的PR则直接返回已有PR
+
+        Args:
+            title: PR标题
+            head: 源分支，格式 user:branch
+            base: 目标分支
+            body: PR描述
+
+        Returns:
+            {'success': bool, 'number': int, 'url': str, 'existed': bool, 'message': str}
+        """
         url = f"{self.base_url}/pulls"
-        headers = {
-            "Authorization": f"token {self.access_token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
         data = {
             "title": title,
             "head": head,
             "base": base,
             "body": body
         }
-        response = requests.post(url, json=data, headers=headers)
-        return response.json()
+        response = self._request('POST', url, critical=True, json=data)
+
+        if response.status_code == 201:
+            pr = response.json()
+            return {
+                'success': True,
+                'number': pr['number'],
+                'url': pr['html_url'],
+                'existed': False,
+                'message': 'PR创建成功'
+            }
+
+        try:
+            error = response.json()
+        except ValueError:
+            error = {'message': response.text}
+        error_msg = error.get('message', '')
+        details = '; '.join(e.get('message', '') for e in error.get('errors', []) if isinstance(e, dict))
+        if details:
+            error_msg = f"{error_msg}: {details}"
+
+        # 422: 该分支已有PR，按源分支查出已有PR
+        if response.status_code == 422 and 'already exists' in error_msg:
+            pr = self.find_pull_request(head, base)
+            if pr:
+                return {
+                    'success': True,
+                    'number': pr['number'],
+                    'url': pr['html_url'],
+                    'existed': True,
+                    'message': 'PR已存在'
+                }
+
+        if response.status_code == 401:
+            error_msg = 'GitHub Token无效或已过期'
+
+        return {
+            'success': False,
+            'number': None,
+            'url': None,
+            'existed': False,
+            'message': f"HTTP {response.status_code}: {error_msg}"
+        }
 
     def get_commits(self, branch):
-        url = f"{self.base_url}/commits?sha={branch}"
-        response = requests.get(url)
+        url = f"{self.base_url}/commits"
+        response = self._request('GET', url, params={'sha': branch})
         return response.json()
 
     def get_pull_requests(self):
         url = f"{self.base_url}/pulls"
-        response = requests.get(url)
+        response = self._request('GET', url)
         return response.json()
 
     def merge_pull_request(self, pull_number):
         url = f"{self.base_url}/pulls/{pull_number}/merge"
-        headers = {
-            "Authorization": f"token {self.access_token}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        response = requests.put(url, headers=headers)
-        return response.json()
\ No newline at end of file
+        response = self._request('PUT', url)
+        return response.json()
@@ -0,0 +1,97 @@
+"""
+网络策略服务
+按远程主机决定走代理还是直连，只通过单次 git/HTTP 调用的环境变量或参数生效，
+不再修改仓库的 .git/config
+"""
+
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from app.services.ssh_service import SSHConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class NetworkPolicy:
+    """网络策略：GitHub 走代理，Gerrit/CRP 等内网服务直连"""
+
+    # 需要走代理的主机（包含子域名）
+    PROXY_HOSTS = ('github.com', 'githubusercontent.com')
+
+    @staticmethod
+    def get_host(url: str) -> Optional[str]:
+        """从 URL（包括 scp 风格的 SSH 地址）中解析主机名"""
+        if not url:
+            return None
+        if '://' in url:
+            return urlparse(url).hostname
+        ssh = SSHConnectionPool.parse_ssh_url(url)
+        return ssh[1] if ssh else None
+
+    @classmethod
+    def needs_proxy(cls, url: str) -> bool:
+        """判断访问该地址是否需要走代理"""
+        host = (cls.get_host(url) or '').lower()
+        return any(host == h or host.endswith('.' + h) for h in cls.PROXY_HOSTS)
+
+    @staticmethod
+    def get_proxy() -> Optional[str]:
+        """获取全局配置中的代理地址"""
+        try:
+            from app.services.config_service import ConfigService
+            config = ConfigService.get()
+            return config.https_proxy if config and config.https_proxy else None
+        except Exception as e:
+            logger.warning(f"读取代理配置失败: {e}")
+            return None
+
+    @classmethod
+    def git_env(cls, remote_url: str, proxy: Optional[str] = None) -> Dict[str, str]:
+        """
+        获取访问指定远程仓库的 git 命令环境变量
+
+        - HTTP(S) 地址：通过 GIT_CONFIG_* 覆盖 http.proxy（优先级高于 .git/config 中遗留的代理设置），
+          需要代理的主机设置为代理地址，其余主机设置为空（直连）
+        - SSH 地址：复用 ControlMaster 连接
+
+        Args:
+            remote_url: 远程仓库地址
+            proxy: 代理地址（不传则读取全局配置）
+
+        Returns:
+            环境变量字典
+        """
+        if not remote_url:
+            return {}
+
+        if SSHConnectionPool.parse_ssh_url(remote_url):
+            return SSHConnectionPool().git_env(remote_url)
+
+        if cls.needs_proxy(remote_url):
+            if proxy is None:
+                proxy = cls.get_proxy()
+        else:
+            proxy = None
+
+        return {
+            'GIT_CONFIG_COUNT': '1',
+            'GIT_CONFIG_KEY_0': 'http.proxy',
+            'GIT_CONFIG_VALUE_0': proxy or '',
+        }
+
+    @classmethod
+    def requests_proxies(cls, url: str, proxy: Optional[str] = None) -> Dict[str, str]:
+        """
+        获取 requests 调用使用的代理参数
+
+        Returns:
+            proxies 字典，直连时返回空字典
+        """
+        if not cls.needs_proxy(url):
+            return {}
+        if proxy is None:
+            proxy = cls.get_proxy()
+        if not proxy:
+            return {}
+        return {'http': proxy, 'https': proxy}
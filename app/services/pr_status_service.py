@@ -0,0 +1,286 @@
+"""
+GitHub PR状态聚合服务
+将所有等待中任务的PR状态查询合并为一次GraphQL请求，再分发给各个任务
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from app.services.github_rate_limiter import GitHubRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+# 单个PR需要查询的字段
+PR_FIELDS = """
+    number
+    state
+    merged
+    mergedAt
+    mergedBy { login }
+    mergeCommit { oid messageHeadline }
+    reviewDecision
+    mergeable
+    reviews(last: 50) { nodes { state author { login } } }
+"""
+
+
+class PRStatusAggregator:
+    """PR状态聚合器（单例）
+
+    等待中的任务通过 register() 登记自己的PR，后台线程每个周期用一次
+    GraphQL请求查询所有已登记PR的状态，任务通过 wait_for_status() 获取结果。
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    GRAPHQL_URL = "https://api.github.com/graphql"
+    POLL_INTERVAL = 30  # 轮询间隔（秒）
+    REGISTER_DELAY = 2  # 新登记PR后延迟多久触发查询（合并同时登记的PR）
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._cond = threading.Condition()
+        self._watchers = {}  # (owner, repo, number) -> 登记次数
+        self._statuses = {}  # (owner, repo, number) -> 状态字典
+        self._cycle = 0  # 已完成的轮询周期数
+        self._token = None
+        self._thread = None
+        self._wakeup = threading.Event()
+
+        # 保存Flask应用实例用于在线程中创建上下文（代理等配置从数据库读取）
+        from flask import current_app
+        self.app = current_app._get_current_object()
+
+        self._initialized = True
+        logger.info("PR状态聚合器初始化完成")
+
+    @staticmethod
+    def make_key(owner: str, repo: str, number: int) -> Tuple[str, str, int]:
+        """生成PR的唯一键"""
+        return (owner, repo, int(number))
+
+    def register(self, owner: str, repo: str, number: int, token: str) -> Tuple[str, str, int]:
+        """
+        登记一个需要监控的PR
+
+        Returns:
+            PR的唯一键，用于后续获取状态和注销
+        """
+        key = self.make_key(owner, repo, number)
+        with self._cond:
+            self._watchers[key] = self._watchers.get(key, 0) + 1
+            self._token = token
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll_loop, name='pr-status-aggregator')
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+        logger.info(f"登记PR监控: {owner}/{repo}#{number}")
+        return key
+
+    def unregister(self, key: Tuple[str, str, int]):
+        """注销PR监控"""
+        with self._cond:
+            count = self._watchers.get(key, 0) - 1
+            if count > 0:
+                self._watchers[key] = count
+            else:
+                self._watchers.pop(key, None)
+        logger.info(f"注销PR监控: {key[0]}/{key[1]}#{key[2]}")
+
+    def get_cycle(self) -> int:
+        """获取当前已完成的轮询周期数"""
+        with self._cond:
+            return self._cycle
+
+    def get_status(self, key: Tuple[str, str, int]) -> Optional[Dict]:
+        """获取缓存的PR状态（未查询过返回None）"""
+        with self._cond:
+            return self._statuses.get(key)
+
+    def wait_for_status(self, key: Tuple[str, str, int], last_cycle: int,
+                        timeout: float, stop_event: threading.Event = None) -> Tuple[Optional[Dict], int]:
+        """
+        等待下一个轮询周期完成并返回PR状态
+
+        Args:
+            key: PR唯一键
+            last_cycle: 调用方已经处理过的周期数
+            timeout: 最长等待时间（秒）
+            stop_event: 停止标志，被设置时立即返回
+
+        Returns:
+            (状态字典或None, 当前周期数)
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._cycle <= last_cycle:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                # 每秒醒来一次检查停止标志
+                self._cond.wait(min(remaining, 1))
+            return self._statuses.get(key), self._cycle
+
+    def fetch_statuses(self, keys: List[Tuple[str, str, int]], token: str) -> Dict[Tuple[str, str, int], Dict]:
+        """
+        用一次GraphQL请求查询多个PR的状态
+
+        Args:
+            keys: PR唯一键列表
+            token: GitHub Token
+
+        Returns:
+            PR唯一键 -> 状态字典（PR不存在或Token无效时包含error字段；临时失败的PR不在结果中，下个周期重试）
+        """
+        if not keys:
+            return {}
+
+        query, aliases = self._build_query(keys)
+        headers = {'Authorization': f'bearer {token}'}
+
+        try:
+            response = GitHubRateLimiter().request(
+                'POST', self.GRAPHQL_URL, resource='graphql', json={'query': query}, headers=headers
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"GitHub GraphQL请求异常: {e}")
+            return {}
+
+        if response.status_code == 401:
+            fetched_at = time.time()
+            return {key: {'error': 'unauthorized', 'message': 'GitHub Token无效或已过期', 'fetched_at': fetched_at}
+                    for key in keys}
+        if response.status_code != 200:
+            logger.warning(f"GitHub GraphQL请求失败: HTTP {response.status_code}, {response.text[:200]}")
+            return {}
+
+        try:
+            payload = response.json()
+        except ValueError:
+            logger.warning(f"GitHub GraphQL响应格式错误: {response.text[:200]}")
+            return {}
+
+        errors = payload.get('errors') or []
+        data = payload.get('data')
+        if not data:
+            # 限流（RATE_LIMITED）等错误时 HTTP 200 且 data 为 null，按临时失败处理，下个周期重试
+            logger.warning(f"GitHub GraphQL未返回数据: {errors}")
+            return {}
+        if errors:
+            logger.debug(f"GitHub GraphQL返回错误: {errors}")
+
+        # 只有明确返回 NOT_FOUND 的仓库/PR 才判定为不存在，其余空节点按临时失败处理
+        not_found = {tuple(error.get('path') or ()) for error in errors if error.get('type') == 'NOT_FOUND'}
+
+        results = {}
+        for key, (repo_alias, pr_alias) in aliases.items():
+            repo_data = data.get(repo_alias)
+            pr_data = repo_data.get(pr_alias) if repo_data else None
+            if pr_data is not None:
+                results[key] = self._normalize(pr_data)
+            elif (repo_alias,) in not_found or (repo_alias, pr_alias) in not_found:
+                results[key] = {
+                    'error': 'not_found',
+                    'message': f"PR不存在: {key[0]}/{key[1]}#{key[2]}",
+                    'fetched_at': time.time()
+                }
+        return results
+
+    def _build_query(self, keys: List[Tuple[str, str, int]]):
+        """按仓库分组构建GraphQL查询，返回查询语句和别名映射"""
+        repos = {}
+        for key in keys:
+            repos.setdefault((key[0], key[1]), []).append(key)
+
+        parts = []
+        aliases = {}
+        for repo_index, ((owner, name), repo_keys) in enumerate(repos.items()):
+            repo_alias = f"r{repo_index}"
+            pr_parts = []
+            for key in repo_keys:
+                pr_alias = f"pr{key[2]}"
+                aliases[key] = (repo_alias, pr_alias)
+                pr_parts.append(f"{pr_alias}: pullRequest(number: {key[2]}) {{{PR_FIELDS}}}")
+            parts.append(
+                f"{repo_alias}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{\n"
+                + "\n".join(pr_parts)
+                + "\n}"
+            )
+
+        query = "query {\n" + "\n".join(parts) + "\n}"
+        return query, aliases
+
+    @staticmethod
+    def _normalize(pr_data: Dict) -> Dict:
+        """将GraphQL返回的PR数据转换为统一格式"""
+        merge_commit = pr_data.get('mergeCommit') or {}
+        merged_by = pr_data.get('mergedBy') or {}
+        reviews = []
+        for node in (pr_data.get('reviews') or {}).get('nodes') or []:
+            author = node.get('author') or {}
+            reviews.append({'user': author.get('login', 'unknown'), 'state': node.get('state', '')})
+
+        return {
+            'state': (pr_data.get('state') or '').lower(),  # open/closed/merged
+            'merged': bool(pr_data.get('merged')),
+            'merged_at': pr_data.get('mergedAt') or '',
+            'merged_by': merged_by.get('login', 'unknown'),
+            'merge_commit_sha': merge_commit.get('oid', ''),
+            'merge_commit_subject': merge_commit.get('messageHeadline', ''),
+            'review_decision': pr_data.get('reviewDecision'),
+            'mergeable': pr_data.get('mergeable', 'UNKNOWN'),
+            'reviews': reviews,
+            'fetched_at': time.time()
+        }
+
+    def _poll_loop(self):
+        """后台轮询线程"""
+        logger.info("PR状态聚合线程启动")
+        while True:
+            # 等待下一个周期（新登记的PR会提前唤醒，稍作延迟以合并同时登记的PR）
+            # GitHub额度不足时自动拉长轮询间隔
+            interval = GitHubRateLimiter().scale_interval(self.POLL_INTERVAL, 'graphql')
+            if self._wakeup.wait(interval):
+                self._wakeup.clear()
+                time.sleep(self.REGISTER_DELAY)
+
+            with self._cond:
+                keys = list(self._watchers.keys())
+                token = self._token
+                if not keys:
+                    self._thread = None
+                    logger.info("没有需要监控的PR，PR状态聚合线程退出")
+                    return
+
+            start = time.time()
+            with self.app.app_context():
+                results = self.fetch_statuses(keys, token)
+            logger.info(f"PR状态批量查询完成: {len(keys)}个PR, 成功{len(results)}个, 耗时{time.time() - start:.2f}秒")
+
+            with self._cond:
+                self._statuses.update(results)
+                # 清理已注销PR的缓存（保留最近结果供同步步骤读取合并信息）
+                for key in list(self._statuses.keys()):
+                    if key not in self._watchers and time.time() - self._statuses[key].get('fetched_at', 0) > 3600:
+                        del self._statuses[key]
+                self._cycle += 1
+                self._cond.notify_all()
@@ -0,0 +1,242 @@
+"""
+外部命令看门狗
+代理挂起、SSH 会话卡住时 git / dch 等外部命令可能永远不返回，一直占用任务线程。
+在看门狗范围内启动的外部命令都运行在独立的进程组中并登记到看门狗，
+超过时限后整个进程组被强制终止，调用方以明确的超时原因失败。
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+import git.cmd
+from git import Git, Repo
+
+logger = logging.getLogger(__name__)
+
+
+class CommandTimeoutError(Exception):
+    """外部命令超时，已被看门狗终止"""
+
+
+class ProcessWatchdog:
+    """外部命令看门狗（单例）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    CHECK_INTERVAL = 1  # 检查超时的间隔（秒）
+    RECENT_SIZE = 20  # 保留的最近超时记录数
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._local = threading.local()
+        self._procs = {}  # pid -> 登记信息
+        self._procs_lock = threading.Lock()
+        self._thread = None
+        self._hung_total = 0
+        self._hung_by_scope = {}
+        self._recent = deque(maxlen=self.RECENT_SIZE)
+
+        self._initialized = True
+        logger.info("外部命令看门狗初始化完成")
+
+    @contextmanager
+    def guard(self, scope: str, timeout: float, context: Optional[str] = None):
+        """
+        看门狗范围：范围内启动的每条外部命令最多执行 timeout 秒
+
+        范围内的命令被终止后，抛出的异常替换为 CommandTimeoutError（原异常作为 __cause__）
+
+        Args:
+            scope: 范围名称（步骤类型等，用于统计）
+            timeout: 单条命令的时限（秒）
+            context: 附加说明（任务ID、项目名等，用于日志）
+        """
+        state = {'scope': scope, 'timeout': timeout, 'context': context, 'killed': []}
+        previous = getattr(self._local, 'state', None)
+        self._local.state = state
+        try:
+            yield state
+        except Exception as e:
+            if state['killed']:
+                raise CommandTimeoutError(
+                    f"命令 {state['killed'][0]} 超过 {int(timeout)} 秒未完成，已强制终止"
+                ) from e
+            raise
+        finally:
+            self._local.state = previous
+
+    def current_timeout(self) -> Optional[float]:
+        """当前线程所在看门狗范围的命令时限（不在范围内时返回 None）"""
+        state = getattr(self._local, 'state', None)
+        return state['timeout'] if state else None
+
+    def watch(self, proc: subprocess.Popen, command):
+        """登记已启动的进程（进程须以 start_new_session=True 启动，进程组ID即进程ID）"""
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            return
+        with self._procs_lock:
+            self._procs[proc.pid] = {
+                'proc': proc,
+                'command': self._format_command(command),
+                'state': state,
+                'started_at': datetime.utcnow(),
+                'deadline': time.monotonic() + state['timeout'],
+            }
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._watch_loop, name='process-watchdog')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def unwatch(self, proc: subprocess.Popen):
+        """取消登记"""
+        with self._procs_lock:
+            self._procs.pop(proc.pid, None)
+
+    def run(self, args, check: bool = False, **kwargs) -> subprocess.CompletedProcess:
+        """
+        在独立进程组中运行命令（用法同 subprocess.run，默认捕获输出）
+
+        在看门狗范围内运行时，超时后整个进程组被终止
+        """
+        kwargs.setdefault('stdout', subprocess.PIPE)
+        kwargs.setdefault('stderr', subprocess.PIPE)
+        if kwargs.pop('capture_output', False):
+            kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+
+        with subprocess.Popen(args, start_new_session=True, **kwargs) as proc:
+            self.watch(proc, args)
+            try:
+                stdout, stderr = proc.communicate()
+            finally:
+                self.unwatch(proc)
+
+        if check and proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, args, stdout, stderr)
+        return subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+
+    def record_hung(self, command, state: Optional[Dict] = None):
+        """记录一次超时终止（更新统计并通知所在范围）"""
+        state = state or getattr(self._local, 'state', None) or {'scope': 'unknown', 'context': None, 'killed': []}
+        command = self._format_command(command)
+        state['killed'].append(command)
+        with self._procs_lock:
+            self._hung_total += 1
+            self._hung_by_scope[state['scope']] = self._hung_by_scope.get(state['scope'], 0) + 1
+            self._recent.append({
+                'scope': state['scope'],
+                'context': state['context'],
+                'command': command,
+                'timeout': state.get('timeout'),
+                'killed_at': datetime.utcnow().isoformat(),
+            })
+        logger.error(
+            f"外部命令超时，已终止: scope={state['scope']}, context={state['context']}, "
+            f"timeout={state.get('timeout')}s, command={command}"
+        )
+
+    def get_stats(self) -> Dict:
+        """获取看门狗状态（监控接口使用）"""
+        now = time.monotonic()
+        with self._procs_lock:
+            running = [
+                {
+                    'scope': entry['state']['scope'],
+                    'context': entry['state']['context'],
+                    'command': entry['command'],
+                    'started_at': entry['started_at'].isoformat(),
+                    'remaining': max(0, int(entry['deadline'] - now)),
+                }
+                for entry in self._procs.values()
+            ]
+            return {
+                'running': len(running),
+                'commands': running,
+                'hung_total': self._hung_total,
+                'hung_by_scope': dict(self._hung_by_scope),
+                'recent_hung': list(self._recent),
+            }
+
+    def _watch_loop(self):
+        """看门狗线程：清理已结束的进程，终止超时的进程组"""
+        logger.info("外部命令看门狗线程启动")
+        while True:
+            time.sleep(self.CHECK_INTERVAL)
+            now = time.monotonic()
+            expired = []
+            with self._procs_lock:
+                for pid, entry in list(self._procs.items()):
+                    if entry['proc'].poll() is not None:
+                        del self._procs[pid]
+                    elif now >= entry['deadline']:
+                        del self._procs[pid]
+                        expired.append(entry)
+
+            for entry in expired:
+                try:
+                    os.killpg(entry['proc'].pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    # 刚好在超时的同时结束
+                    continue
+                except OSError as e:
+                    logger.warning(f"终止进程组失败: pid={entry['proc'].pid}, {e}")
+                    continue
+                self.record_hung(entry['command'], entry['state'])
+
+    @staticmethod
+    def _format_command(command) -> str:
+        if isinstance(command, (list, tuple)):
+            return ' '.join(str(part) for part in command[:3])
+        return str(command)
+
+
+class WatchedGit(Git):
+    """在看门狗范围内以独立进程组启动 git 命令"""
+
+    def execute(self, command, *args, **kwargs):
+        if ProcessWatchdog().current_timeout() is None:
+            return super().execute(command, *args, **kwargs)
+
+        # 同步执行和以进程方式返回（fetch / pull / push / clone）的命令都在独立进程组中启动，
+        # 由 _watched_popen 登记到看门狗线程计时，超时后终止整个进程组（包括 ssh 等孙进程）。
+        # 不使用 GitPython 自带的 kill_after_timeout：它只终止 git 及其直接子进程，
+        # 孙进程仍持有输出管道时调用方会一直阻塞
+        kwargs['start_new_session'] = True
+        return super().execute(command, *args, **kwargs)
+
+
+_safer_popen = git.cmd.safer_popen
+
+
+def _watched_popen(command, *args, **kwargs):
+    """GitPython 启动 git 进程的入口：WatchedGit 在看门狗范围内启动的进程登记到看门狗"""
+    proc = _safer_popen(command, *args, **kwargs)
+    if kwargs.get('start_new_session'):
+        ProcessWatchdog().watch(proc, command)
+    return proc
+
+
+git.cmd.safer_popen = _watched_popen
+
+
+class WatchedRepo(Repo):
+    """git 命令受看门狗监控的仓库对象"""
+    GitCommandWrapperType = WatchedGit
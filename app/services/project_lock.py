@@ -0,0 +1,134 @@
+"""
+项目级互斥锁服务
+同一项目的任务共用一个本地仓库（checkout / reset 会互相破坏），必须串行执行。
+进程内由任务调度器保证同一项目同时只启动一个任务；多进程部署（MySQL）时
+再通过 GET_LOCK 建立跨进程的咨询锁。
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectLock:
+    """项目级咨询锁（MySQL GET_LOCK，其他数据库只依赖进程内调度）
+
+    锁连接不从应用连接池获取：任务可能持续数小时，长期占用会耗尽连接池。
+    持有期间定期发送保活查询，避免空闲连接被 MySQL wait_timeout 断开而静默释放锁
+    """
+
+    POLL_INTERVAL = 5  # 锁被其他进程持有时的重试间隔（秒）
+    KEEPALIVE_INTERVAL = 300  # 持有锁期间的保活间隔（秒），须小于 MySQL wait_timeout
+
+    _engine = None
+    _engine_lock = threading.Lock()
+    _held = set()  # 持有锁的 ProjectLock
+    _keepalive_thread = None
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.name = f'deepin-autopack:project:{project_id}'
+        self._connection = None
+
+    @staticmethod
+    def is_supported() -> bool:
+        """当前数据库是否支持跨进程咨询锁"""
+        return db.engine.dialect.name == 'mysql'
+
+    @classmethod
+    def _get_engine(cls):
+        """锁连接专用的引擎（不使用连接池，每个锁一条独立连接）"""
+        with cls._engine_lock:
+            if cls._engine is None:
+                cls._engine = create_engine(db.engine.url, poolclass=NullPool)
+            return cls._engine
+
+    def acquire(self, stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        获取项目锁（阻塞直到获得锁或被停止）
+
+        锁绑定在一条单独的数据库连接上，任务执行期间一直持有，连接断开时数据库自动释放
+
+        Args:
+            stop_event: 停止标志，被设置时放弃等待
+
+        Returns:
+            是否获得锁
+        """
+        if not self.is_supported():
+            return True
+
+        connection = self._get_engine().connect()
+        try:
+            waited = False
+            while True:
+                acquired = connection.exec_driver_sql(
+                    'SELECT GET_LOCK(%s, %s)', (self.name, self.POLL_INTERVAL)
+                ).scalar()
+                if acquired == 1:
+                    self._connection = connection
+                    self._start_keepalive()
+                    if waited:
+                        logger.info(f"已获得项目锁: project_id={self.project_id}")
+                    return True
+                if not waited:
+                    logger.info(f"项目正在其他进程中执行任务，等待项目锁: project_id={self.project_id}")
+                    waited = True
+                if stop_event is not None and stop_event.is_set():
+                    connection.close()
+                    return False
+        except Exception:
+            connection.close()
+            raise
+
+    def release(self):
+        """释放项目锁"""
+        with ProjectLock._engine_lock:
+            ProjectLock._held.discard(self)
+            connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            connection.exec_driver_sql('SELECT RELEASE_LOCK(%s)', (self.name,))
+        except Exception as e:
+            logger.warning(f"释放项目锁失败（连接关闭时自动释放）: project_id={self.project_id}, {e}")
+        finally:
+            connection.close()
+
+    def _start_keepalive(self):
+        """登记持有的锁，按需启动保活线程"""
+        with ProjectLock._engine_lock:
+            ProjectLock._held.add(self)
+            thread = ProjectLock._keepalive_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=ProjectLock._keepalive_loop, name='project-lock-keepalive')
+                thread.daemon = True
+                thread.start()
+                ProjectLock._keepalive_thread = thread
+
+    @classmethod
+    def _keepalive_loop(cls):
+        """保活线程：定期在每条锁连接上执行查询，保持连接活跃"""
+        logger.info("项目锁保活线程启动")
+        while True:
+            time.sleep(cls.KEEPALIVE_INTERVAL)
+            with cls._engine_lock:
+                held = list(cls._held)
+            for lock in held:
+                # 与 release 互斥，避免在连接关闭的同时使用连接
+                with cls._engine_lock:
+                    connection = lock._connection
+                    if connection is None:
+                        continue
+                    try:
+                        connection.exec_driver_sql('SELECT 1').scalar()
+                    except Exception as e:
+                        logger.error(f"项目锁连接已断开，锁可能已被释放: project_id={lock.project_id}, {e}")
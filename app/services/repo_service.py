@@ -5,10 +5,12 @@
 
 import os
 import subprocess
-import threading
 from git import Repo, GitCommandError
 from app import db
-from app.models import Project, GlobalConfig
+from app.models import Project
+from app.services.config_service import ConfigService
+from app.services.network_policy import NetworkPolicy
+from app.services.process_watchdog import ProcessWatchdog, WatchedRepo
 import logging
 from typing import List, Dict, Optional, Tuple
 
@@ -18,117 +20,117 @@ logger = logging.getLogger(__name__)
 class RepoService:
     """仓库管理服务"""
     
+    CLONE_TIMEOUT = 30 * 60  # 克隆的最长时间（秒），超时后看门狗终止 git 进程组
+    
     @staticmethod
-    def clone_project_repo(project_id: int):
+    def clone_project_repo(project_id: int) -> bool:
         """
-        异步克隆项目仓库
+        异步克隆项目仓库（在后台作业线程池中排队执行）
         
         Args:
             project_id: 项目ID
+            
+        Returns:
+            是否已提交（False 表示该项目的克隆已在排队或执行中）
         """
-        def _clone():
-            # 需要在新线程中创建新的 app context
-            from app import create_app
-            app = create_app()
-            
-            with app.app_context():
-                try:
-                    project = Project.query.get(project_id)
-                    if not project:
-                        logger.error(f"项目 {project_id} 不存在")
-                        return
-                    
-                    # 更新状态为克隆中
-                    project.repo_status = 'cloning'
-                    db.session.commit()
-                    
-                    logger.info(f"开始克隆项目 {project.name} 的仓库...")
-                    
-                    # 获取全局配置
-                    config = GlobalConfig.get_config()
-                    repos_dir = config.local_repos_dir if config and config.local_repos_dir else '/tmp/deepin-autopack-repos'
-                    
-                    # 创建目录
-                    os.makedirs(repos_dir, exist_ok=True)
-                    
-                    # 确定本地路径
-                    local_path = os.path.join(repos_dir, project.name)
-                    
-                    # 如果目录已存在，先删除
-                    if os.path.exists(local_path):
-                        import shutil
-                        shutil.rmtree(local_path)
-                    
-                    # 确定克隆URL和仓库类型
-                    # 优先级：github_url > gerrit_repo_url（GitHub 优先）
-                    # 根据 URL 内容判断是否为 GitHub 仓库
-                    clone_url = None
-                    is_github = False
-                    
-                    if project.github_url:
-                        clone_url = project.github_url
-                        is_github = True
-                        logger.info(f"使用 GitHub 仓库: {clone_url}")
-                    elif project.gerrit_repo_url:
-                        clone_url = project.gerrit_repo_url
-                        # 仍然检查是否为 GitHub URL
-                        if 'github.com' in clone_url.lower():
-                            is_github = True
-                            logger.info(f"使用 GitHub 仓库: {clone_url}")
-                        else:
-                            logger.info(f"使用 Gerrit 仓库: {clone_url}")
-                    else:
-                        raise Exception("未配置仓库地址")
-                    
-                    # 配置代理（只在克隆 GitHub 仓库时使用）
-                    env = os.environ.copy()
-                    if is_github and config and config.https_proxy:
-                        env['https_proxy'] = config.https_proxy
-                        env['http_proxy'] = config.https_proxy
-                        logger.info(f"GitHub 仓库使用代理: {config.https_proxy}")
-                    elif not is_github:
-                        logger.info("Gerrit 仓库不使用代理")
-                    
-                    # 确定分支
-                    branch = project.github_branch if is_github else project.gerrit_branch
-                    
-                    # 克隆仓库
-                    logger.info(f"克隆到: {local_path}，分支: {branch}")
-                    repo = Repo.clone_from(
-                        clone_url,
-                        local_path,
-                        branch=branch,
-                        env=env
-                    )
-                    
-                    # 更新项目信息
-                    project.local_repo_path = local_path
-                    project.repo_status = 'ready'
-                    project.repo_error = None
-                    db.session.commit()
-                    
-                    logger.info(f"✓ 项目 {project.name} 仓库克隆成功")
-                    
-                except GitCommandError as e:
-                    logger.error(f"Git 克隆失败: {str(e)}")
-                    project = Project.query.get(project_id)
-                    if project:
-                        project.repo_status = 'error'
-                        project.repo_error = f"Git克隆失败: {str(e)}"
-                        db.session.commit()
-                        
-                except Exception as e:
-                    logger.error(f"克隆仓库异常: {str(e)}", exc_info=True)
-                    project = Project.query.get(project_id)
-                    if project:
-                        project.repo_status = 'error'
-                        project.repo_error = str(e)
-                        db.session.commit()
-        
-        # 启动后台线程
-        thread = threading.Thread(target=_clone)
-        thread.daemon = True
-        thread.start()
+        from app.services.background_jobs import BackgroundJobs
+        return BackgroundJobs().submit('clone', project_id, RepoService._clone_repo, project_id)
+    
+    @staticmethod
+    def _clone_repo(project_id: int):
+        """克隆项目仓库（后台作业，在应用上下文中执行）"""
+        try:
+            project = Project.query.get(project_id)
+            if not project:
+                logger.error(f"项目 {project_id} 不存在")
+                return
+            
+            # 更新状态为克隆中
+            project.repo_status = 'cloning'
+            db.session.commit()
+            
+            logger.info(f"开始克隆项目 {project.name} 的仓库...")
+            
+            # 获取全局配置
+            config = ConfigService.get()
+            repos_dir = config.local_repos_dir if config and config.local_repos_dir else '/tmp/deepin-autopack-repos'
+            
+            # 创建目录
+            os.makedirs(repos_dir, exist_ok=True)
+            
+            # 确定本地路径
+            local_path = os.path.join(repos_dir, project.name)
+            
+            # 如果目录已存在，先删除
+            if os.path.exists(local_path):
+                import shutil
+                shutil.rmtree(local_path)
+            
+            # 确定克隆URL和仓库类型
+            # 优先级：github_url > gerrit_repo_url（GitHub 优先）
+            # 根据 URL 内容判断是否为 GitHub 仓库
+            clone_url = None
+            is_github = False
+            
+            if project.github_url:
+                clone_url = project.github_url
+                is_github = True
+                logger.info(f"使用 GitHub 仓库: {clone_url}")
+            elif project.gerrit_repo_url:
+                clone_url = project.gerrit_repo_url
+                # 仍然检查是否为 GitHub URL
+                if 'github.com' in clone_url.lower():
+                    is_github = True
+                    logger.info(f"使用 GitHub 仓库: {clone_url}")
+                else:
+                    logger.info(f"使用 Gerrit 仓库: {clone_url}")
+            else:
+                raise Exception("未配置仓库地址")
+            
+            # 按网络策略配置代理（GitHub 走代理，Gerrit 直连并复用SSH连接）
+            env = os.environ.copy()
+            env.update(NetworkPolicy.git_env(clone_url, proxy=config.https_proxy if config else None))
+            if NetworkPolicy.needs_proxy(clone_url) and config and config.https_proxy:
+                logger.info(f"GitHub 仓库使用代理: {config.https_proxy}")
+            
+            # 确定分支
+            branch = project.github_branch if is_github else project.gerrit_branch
+            
+            # 克隆仓库
+            logger.info(f"克隆到: {local_path}，分支: {branch}")
+            with ProcessWatchdog().guard('clone', RepoService.CLONE_TIMEOUT, context=project.name):
+                repo = WatchedRepo.clone_from(
+                    clone_url,
+                    local_path,
+                    branch=branch,
+                    env=env
+                )
+            
+            # 更新项目信息
+            project.local_repo_path = local_path
+            project.repo_status = 'ready'
+            project.repo_error = None
+            db.session.commit()
+            
+            logger.info(f"✓ 项目 {project.name} 仓库克隆成功")
+            
+        except GitCommandError as e:
+            logger.error(f"Git 克隆失败: {str(e)}")
+            db.session.rollback()
+            project = Project.query.get(project_id)
+            if project:
+                project.repo_status = 'error'
+                project.repo_error = f"Git克隆失败: {str(e)}"
+                db.session.commit()
+                
+        except Exception as e:
+            logger.error(f"克隆仓库异常: {str(e)}", exc_info=True)
+            db.session.rollback()
+            project = Project.query.get(project_id)
+            if project:
+                project.repo_status = 'error'
+                project.repo_error = str(e)
+                db.session.commit()
     
     @staticmethod
     def get_commit_message(project: Project, commit_hash: str) -> str:
@@ -178,21 +180,18 @@ class RepoService:
             if 'github.com' in remote_url.lower():
                 is_github = True
             
-            # 配置代理（只在 GitHub 仓库时使用）
-            config = GlobalConfig.get_config()
-            if is_github and config and config.https_proxy:
-                with repo.config_writer() as git_config:
-                    git_config.set_value('http', 'proxy', config.https_proxy)
-                logger.info(f"GitHub 仓库使用代理更新")
-            
-            # 拉取最新代码
-            origin = repo.remotes.origin
-            origin.fetch()
+            # 按网络策略决定代理/直连，只作用于本次git调用，不修改.git/config
+            git_env = NetworkPolicy.git_env(remote_url)
             
-            # 切换到指定分支并拉取
-            branch = project.github_branch if is_github else project.gerrit_branch
-            repo.git.checkout(branch)
-            origin.pull()
+            with repo.git.custom_environment(**git_env):
+                # 拉取最新代码
+                origin = repo.remotes.origin
+                origin.fetch()
+                
+                # 切换到指定分支并拉取
+                branch = project.github_branch if is_github else project.gerrit_branch
+                repo.git.checkout(branch)
+                origin.pull()
             
             logger.info(f"✓ 项目 {project.name} 仓库更新成功")
             return True
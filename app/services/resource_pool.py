@@ -0,0 +1,123 @@
+"""
+任务资源池服务
+按资源类型限制同时执行的步骤数（git 操作 / 外部接口 / 长时间等待），
+槽位按任务优先级分配，高优先级任务（如紧急修复）优先获得空闲槽位
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResourcePool:
+    """按优先级分配的并发槽位"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiters = []  # 等待队列（堆）: (-priority, seq)
+        self._seq = itertools.count()
+
+    def set_limit(self, limit: int):
+        """调整并发上限（调大时立即唤醒等待者）"""
+        with self._cond:
+            limit = max(1, limit)
+            if limit != self.limit:
+                logger.info(f"资源池并发上限调整: {self.name} {self.limit} -> {limit}")
+                self.limit = limit
+                self._cond.notify_all()
+
+    def acquire(self, priority: int = 0, stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        获取一个槽位（阻塞直到获得槽位或被停止）
+
+        同时等待时优先级高的先获得，优先级相同时先来先得
+
+        Args:
+            priority: 任务优先级（越大越优先）
+            stop_event: 停止标志，被设置时放弃等待
+
+        Returns:
+            是否获得槽位
+        """
+        with self._cond:
+            waiter = (-priority, next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+            try:
+                while self._active >= self.limit or self._waiters[0] != waiter:
+                    if stop_event is not None and stop_event.is_set():
+                        return False
+                    # 每秒醒来一次检查停止标志
+                    self._cond.wait(1)
+                self._active += 1
+                return True
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                # 队首变化，唤醒其他等待者重新判断
+                self._cond.notify_all()
+
+    def release(self):
+        """释放槽位"""
+        with self._cond:
+            self._active = max(0, self._active - 1)
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict:
+        """获取资源池状态"""
+        with self._cond:
+            return {'limit': self.limit, 'active': self._active, 'waiting': len(self._waiters)}
+
+
+class ResourcePools:
+    """各类资源池（单例），并发上限来自全局配置"""
+    _instance = None
+    _lock = threading.Lock()
+
+    # 资源类型 -> (全局配置字段, 默认并发上限, 说明)
+    RESOURCES = {
+        'git': ('git_concurrency', 4, 'git 克隆/拉取/推送'),
+        'api': ('api_concurrency', 6, '外部接口调用（GitHub PR、CRP 提交）'),
+        'wait': ('wait_concurrency', 30, '长时间等待（PR 合并、同步、CRP 打包）'),
+    }
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._pools = {
+            name: ResourcePool(name, default)
+            for name, (_, default, _) in self.RESOURCES.items()
+        }
+
+        self._initialized = True
+        logger.info("任务资源池初始化完成")
+
+    def get(self, name: str) -> ResourcePool:
+        """获取资源池（按全局配置刷新并发上限）"""
+        pool = self._pools[name]
+        field, default, _ = self.RESOURCES[name]
+        try:
+            from app.services.config_service import ConfigService
+            pool.set_limit(getattr(ConfigService.get(), field) or default)
+        except Exception as e:
+            logger.debug(f"读取资源池配置失败，使用当前上限: {e}")
+        return pool
+
+    def get_stats(self) -> Dict:
+        """获取所有资源池状态"""
+        return {name: pool.get_stats() for name, pool in self._pools.items()}
@@ -0,0 +1,183 @@
+"""
+SSH 连接复用服务
+为每个 Gerrit 主机维护一个 SSH ControlMaster 连接，git 命令通过 GIT_SSH_COMMAND 复用该连接，
+避免每次 fetch/pull/push 都重新握手
+"""
+
+import atexit
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class SSHConnectionPool:
+    """SSH ControlMaster 连接池（单例，按主机复用，随进程退出关闭）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    HEALTH_CHECK_INTERVAL = 60  # 健康检查间隔（秒）
+    CONNECT_TIMEOUT = 15  # SSH 连接超时（秒）
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        # ControlPath 长度受 unix socket 限制（约104字节），使用短目录
+        self.control_dir = os.path.join(tempfile.gettempdir(), f'dap-ssh-{os.getpid()}')
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+        self._hosts = {}  # (user, host, port) -> {'path': str, 'checked_at': float, 'reconnects': int}
+        self._hosts_lock = threading.Lock()
+        atexit.register(self.close_all)
+
+        self._initialized = True
+        logger.info(f"SSH连接池初始化完成: {self.control_dir}")
+
+    @staticmethod
+    def parse_ssh_url(url: str) -> Optional[Tuple[Optional[str], str, int]]:
+        """
+        解析 SSH 地址
+
+        支持 ssh://user@host:29418/project 和 user@host:project 两种格式
+
+        Returns:
+            (user, host, port)，非 SSH 地址返回 None
+        """
+        if not url:
+            return None
+        if url.startswith('ssh://'):
+            parsed = urlparse(url)
+            if not parsed.hostname:
+                return None
+            return parsed.username, parsed.hostname, parsed.port or 22
+        if '://' not in url and ':' in url.split('/')[0]:
+            # scp 风格: user@host:path
+            user_host = url.split(':', 1)[0]
+            if '@' in user_host:
+                user, host = user_host.split('@', 1)
+            else:
+                user, host = None, user_host
+            return user, host, 22
+        return None
+
+    def _control_path(self, key: Tuple[Optional[str], str, int]) -> str:
+        user, host, port = key
+        return os.path.join(self.control_dir, f"{user or ''}@{host}:{port}")
+
+    def _ssh_base(self, control_path: str) -> list:
+        return [
+            'ssh',
+            '-o', 'ControlMaster=auto',
+            '-o', f'ControlPath={control_path}',
+            '-o', 'ControlPersist=yes',
+            '-o', f'ConnectTimeout={self.CONNECT_TIMEOUT}',
+            '-o', 'ServerAliveInterval=30',
+        ]
+
+    def _is_alive(self, key: Tuple[Optional[str], str, int], control_path: str) -> bool:
+        """检查 ControlMaster 是否存活"""
+        user, host, port = key
+        target = f'{user}@{host}' if user else host
+        try:
+            result = subprocess.run(
+                ['ssh', '-O', 'check', '-o', f'ControlPath={control_path}', '-p', str(port), target],
+                capture_output=True, text=True, timeout=10
+            )
+            return result.returncode == 0
+        except (subprocess.TimeoutExpired, OSError):
+            return False
+
+    def _health_check(self, key: Tuple[Optional[str], str, int], control_path: str):
+        """健康检查，清理失效的 socket（下次 git 调用会自动重建连接；不持有 _hosts_lock 调用）"""
+        if not os.path.exists(control_path):
+            return
+        if not self._is_alive(key, control_path):
+            logger.warning(f"SSH复用连接已失效，将自动重连: {key[1]}:{key[2]}")
+            try:
+                os.unlink(control_path)
+            except OSError:
+                pass
+            with self._hosts_lock:
+                self._hosts[key]['reconnects'] += 1
+
+    def get_ssh_command(self, remote_url: str) -> Optional[str]:
+        """
+        获取复用连接的 ssh 命令（用于 GIT_SSH_COMMAND）
+
+        Returns:
+            ssh 命令字符串，非 SSH 地址返回 None
+        """
+        key = self.parse_ssh_url(remote_url)
+        if not key:
+            return None
+
+        now = time.time()
+        with self._hosts_lock:
+            entry = self._hosts.get(key)
+            if entry is None:
+                entry = {'path': self._control_path(key), 'checked_at': 0, 'reconnects': 0}
+                self._hosts[key] = entry
+            control_path = entry['path']
+            # 到期时由当前调用方负责检查，其他调用方不重复检查
+            check_due = now - entry['checked_at'] >= self.HEALTH_CHECK_INTERVAL
+            if check_due:
+                entry['checked_at'] = now
+
+        # ssh -O check 在锁外执行：控制 socket 挂起时不阻塞其他主机的 git 命令
+        if check_due:
+            self._health_check(key, control_path)
+
+        return ' '.join(self._ssh_base(control_path))
+
+    def git_env(self, remote_url: str) -> Dict[str, str]:
+        """
+        获取 git 命令需要的环境变量
+
+        Returns:
+            环境变量字典（非 SSH 地址返回空字典）
+        """
+        ssh_command = self.get_ssh_command(remote_url)
+        if not ssh_command:
+            return {}
+        return {'GIT_SSH_COMMAND': ssh_command}
+
+    def get_stats(self) -> Dict:
+        """获取连接池状态"""
+        with self._hosts_lock:
+            return {
+                f"{key[1]}:{key[2]}": {
+                    'connected': os.path.exists(entry['path']),
+                    'reconnects': entry['reconnects']
+                }
+                for key, entry in self._hosts.items()
+            }
+
+    def close_all(self):
+        """关闭所有 ControlMaster 连接"""
+        with self._hosts_lock:
+            items = list(self._hosts.items())
+        for (user, host, port), entry in items:
+            if not os.path.exists(entry['path']):
+                continue
+            target = f'{user}@{host}' if user else host
+            try:
+                subprocess.run(
+                    ['ssh', '-O', 'exit', '-o', f"ControlPath={entry['path']}", '-p', str(port), target],
+                    capture_output=True, timeout=10
+                )
+            except (subprocess.TimeoutExpired, OSError):
+                pass
@@ -0,0 +1,156 @@
+"""
+任务状态推送服务
+进程内发布/订阅：任务或步骤提交到数据库后发布变更通知，转发线程合并通知后执行一次增量查询，
+把结果分发给所有 SSE 订阅者。转发线程同时定期执行增量查询，用于接收其他工作进程写入的变更。
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEventBus:
+    """任务变更事件总线（单例）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    RELAY_INTERVAL = 5  # 没有本进程通知时的增量查询间隔（接收其他进程的变更）
+    DEBOUNCE = 0.3  # 收到通知后稍作延迟，合并同一时间的多次提交
+    QUEUE_SIZE = 100  # 每个订阅者的事件队列长度
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._app = None
+        self._cursor = None
+
+        self._initialized = True
+        logger.info("任务事件总线初始化完成")
+
+    def publish(self, task_id=None):
+        """发布任务变更通知（只唤醒转发线程，具体变更由增量查询得到）"""
+        self._wakeup.set()
+
+    def subscribe(self, app) -> queue.Queue:
+        """
+        订阅任务变更
+
+        Args:
+            app: Flask 应用（转发线程执行数据库查询时使用）
+
+        Returns:
+            事件队列，调用方用完后必须 unsubscribe
+        """
+        from datetime import datetime, timedelta
+        from app.services.build_task_service import DELTA_CURSOR_OVERLAP
+
+        q = queue.Queue(maxsize=self.QUEUE_SIZE)
+        with self._subscribers_lock:
+            self._subscribers.add(q)
+            self._app = app
+            if self._thread is None or not self._thread.is_alive():
+                # 游标在订阅者获取完整列表之前建立，保证之后的变更不会遗漏
+                self._cursor = (datetime.utcnow() - timedelta(seconds=DELTA_CURSOR_OVERLAP)).isoformat()
+                self._thread = threading.Thread(target=self._relay_loop, name='task-event-relay')
+                self._thread.daemon = True
+                self._thread.start()
+        logger.info(f"新增任务事件订阅，当前订阅数: {len(self._subscribers)}")
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        """取消订阅"""
+        with self._subscribers_lock:
+            self._subscribers.discard(q)
+        logger.info(f"取消任务事件订阅，当前订阅数: {len(self._subscribers)}")
+
+    def _broadcast(self, message: Dict):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # 订阅者处理不过来：清空队列，通知其重新获取完整列表
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait({'type': 'resync'})
+
+    def _relay_loop(self):
+        """转发线程：合并通知，执行一次增量查询后分发给所有订阅者"""
+        from datetime import datetime
+        from app.services.build_task_service import BuildTaskService
+
+        logger.info("任务事件转发线程启动")
+        last_queue = None
+        while True:
+            if self._wakeup.wait(self.RELAY_INTERVAL):
+                time.sleep(self.DEBOUNCE)
+                self._wakeup.clear()
+
+            with self._subscribers_lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._cursor = None
+                    logger.info("没有任务事件订阅者，转发线程退出")
+                    return
+                app = self._app
+
+            try:
+                with app.app_context():
+                    changes = BuildTaskService.get_task_changes(datetime.fromisoformat(self._cursor))
+                self._cursor = changes['cursor']
+                if changes['full']:
+                    self._broadcast({'type': 'resync'})
+                elif changes['tasks'] or changes['deleted'] or changes['queue'] != last_queue:
+                    # 排队位置变化不会更新任务时间戳，单独比较
+                    self._broadcast({
+                        'type': 'changes',
+                        'data': changes['tasks'],
+                        'deleted': changes['deleted'],
+                        'queue': changes['queue'],
+                        'cursor': changes['cursor']
+                    })
+                last_queue = changes['queue']
+            except Exception as e:
+                logger.warning(f"任务增量查询失败: {e}")
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    """任务或步骤提交后通知订阅者（BuildExecutor 每次提交进度都会触发）"""
+    if session.info.pop('task_changed', False):
+        TaskEventBus().publish()
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_task_changed(session, flush_context):
+    from app.models.build_task import BuildTask, BuildTaskStep
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (BuildTask, BuildTaskStep)):
+            session.info['task_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_task_changed(session):
+    session.info.pop('task_changed', None)
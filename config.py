@@ -13,8 +13,20 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 连接池：每个运行中的任务都会占用连接，按任务并发上限（max_running_tasks 默认 40）
+    # 加上 Web 请求和后台线程的余量配置；项目锁使用单独的连接，不占用连接池
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 50)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_recycle': 3600,
+        'pool_pre_ping': True,
+    } if SQLALCHEMY_DATABASE_URI.startswith('mysql') else {}
+    
     # 安全配置
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     
+    # GitHub API地址（可指向本地替身服务用于测试）
+    GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+    
     # JSON配置
     JSON_AS_ASCII = False  # 支持中文
\ No newline at end of file
@@ -1,4 +1,5 @@
 from app import create_app
+from app.services.build_task_service import TaskQueue
 import logging
 import os
 
@@ -23,5 +24,10 @@ logging.getLogger('git').setLevel(logging.WARNING)
 
 app = create_app()
 
+# 接管执行进程已退出的任务（调试模式下只在实际处理请求的子进程中启动）
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    with app.app_context():
+        TaskQueue().enable_recovery()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
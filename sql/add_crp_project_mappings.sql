@@ -0,0 +1,11 @@
+-- 添加 crp_project_mappings 表（缓存CRP项目ID，避免每次提交打包都查询项目列表）
+
+CREATE TABLE IF NOT EXISTS crp_project_mappings (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    crp_project_name VARCHAR(100) NOT NULL COMMENT 'CRP项目名称',
+    branch VARCHAR(100) NOT NULL COMMENT '分支名称',
+    branch_id INT NOT NULL COMMENT 'CRP分支ID',
+    project_id INT NOT NULL COMMENT 'CRP ProjectID',
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_crp_project_mapping (crp_project_name, branch, branch_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
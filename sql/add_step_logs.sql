@@ -0,0 +1,15 @@
+-- 步骤进度日志：只追加的日志行表，前端按 seq 增量读取
+
+ALTER TABLE build_task_steps ADD COLUMN log_lines INT DEFAULT 0 COMMENT '进度日志行数（最后一行的seq）';
+
+CREATE TABLE IF NOT EXISTS build_task_step_logs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    task_id INT NOT NULL COMMENT '任务ID',
+    step_id INT NOT NULL COMMENT '步骤ID',
+    seq INT NOT NULL COMMENT '步骤内的行号（从1开始）',
+    content TEXT NOT NULL COMMENT '日志内容',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_build_task_step_log_seq (step_id, seq),
+    INDEX ix_build_task_step_logs_task_id (task_id),
+    FOREIGN KEY (step_id) REFERENCES build_task_steps(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,5 @@
+-- 批量创建任务：build_tasks 添加批次ID
+
+ALTER TABLE build_tasks
+ADD COLUMN batch_id VARCHAR(32) COMMENT '批量创建的批次ID（单个创建为空）' AFTER start_commit_hash,
+ADD INDEX ix_build_tasks_batch_id (batch_id);
@@ -0,0 +1,7 @@
+-- 打包任务复合索引
+-- build_tasks: 按状态筛选 + 按创建时间排序（任务列表、任务恢复、清理）；按项目查询任务
+-- build_task_steps: 按任务读取步骤并按顺序排序（同时替代外键自动创建的 task_id 单列索引）
+
+CREATE INDEX ix_build_tasks_status_created_at ON build_tasks (status, created_at);
+CREATE INDEX ix_build_tasks_project_created_at ON build_tasks (project_id, created_at);
+CREATE INDEX ix_build_task_steps_task_order ON build_task_steps (task_id, step_order);
@@ -0,0 +1,10 @@
+-- 任务列表增量查询：build_tasks.updated_at 索引 + 已删除任务记录表
+
+CREATE INDEX ix_build_tasks_updated_at ON build_tasks (updated_at);
+
+CREATE TABLE IF NOT EXISTS build_task_tombstones (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    task_id INT NOT NULL COMMENT '已删除的任务ID',
+    deleted_at DATETIME NOT NULL COMMENT '删除时间',
+    INDEX ix_build_task_tombstones_deleted_at (deleted_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,4 @@
+-- 运行中任务的心跳（恢复时只接管心跳过期的任务）
+
+ALTER TABLE build_tasks
+ADD COLUMN heartbeat_at DATETIME NULL COMMENT '执行进程的心跳时间（超时未更新说明执行进程已退出）' AFTER completed_at;
@@ -0,0 +1,10 @@
+-- 任务优先级 + 按资源类型的并发上限
+
+ALTER TABLE build_tasks
+ADD COLUMN priority INT NOT NULL DEFAULT 0 COMMENT '优先级（越大越优先，紧急任务插队）' AFTER batch_id;
+
+ALTER TABLE global_config
+ADD COLUMN max_running_tasks INT DEFAULT 40 COMMENT '同时执行的任务数上限',
+ADD COLUMN git_concurrency INT DEFAULT 4 COMMENT '同时执行git克隆/拉取/推送的步骤数上限',
+ADD COLUMN api_concurrency INT DEFAULT 6 COMMENT '同时调用外部接口的步骤数上限',
+ADD COLUMN wait_concurrency INT DEFAULT 30 COMMENT '同时等待（PR合并/同步/打包）的步骤数上限';
@@ -0,0 +1,19 @@
+-- 任务清理：保留策略配置 + 已清理任务的归档表
+
+ALTER TABLE global_config
+ADD COLUMN task_retention_days INT COMMENT '已完成任务保留天数（为空不自动清理）',
+ADD COLUMN task_retention_keep INT COMMENT '每个项目至少保留最近的任务数',
+ADD COLUMN task_archive_enabled TINYINT(1) DEFAULT 0 COMMENT '清理任务前是否归档';
+
+CREATE TABLE IF NOT EXISTS build_tasks_archive (
+    id INT PRIMARY KEY COMMENT '原任务ID',
+    project_id INT NOT NULL,
+    project_name VARCHAR(255) NOT NULL,
+    version VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    created_at DATETIME,
+    completed_at DATETIME,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    data MEDIUMBLOB NOT NULL COMMENT 'zlib压缩的任务JSON（含步骤和进度日志）',
+    INDEX ix_build_tasks_archive_project_id (project_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
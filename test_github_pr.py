@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""测试 GitHubService 创建PR（使用本地替身服务，不访问真实GitHub）"""
+
+import json
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.github_service import GitHubService
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    """模拟GitHub的 /repos/{owner}/{repo}/pulls 接口"""
+    pulls = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-RateLimit-Remaining', '4999')
+        self.send_header('X-RateLimit-Limit', '5000')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if any(p['head'] == data['head'] for p in self.pulls):
+            self._send(422, {
+                'message': 'Validation Failed',
+                'errors': [{'message': f"A pull request already exists for {data['head']}."}]
+            })
+            return
+        number = len(self.pulls) + 1
+        pr = {'number': number, 'html_url': f'https://github.com/o/r/pull/{number}', 'head': data['head']}
+        self.pulls.append(pr)
+        self._send(201, pr)
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        head = query.get('head', [''])[0]
+        self._send(200, [p for p in self.pulls if p['head'] == head])
+
+
+def test_create_pull_request():
+    """首次创建返回新PR，重复创建返回已有PR"""
+    server = HTTPServer(('127.0.0.1', 0), FakeGitHubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        github = GitHubService('o', 'r', 'fake-token', api_base=f'http://127.0.0.1:{server.server_port}')
+
+        result = github.create_pull_request('title', 'user:dev-changelog-1.0', 'master', 'body')
+        print(f"首次创建: {result}")
+        assert result['success'] and not result['existed']
+        assert result['number'] == 1
+        assert result['url'] == 'https://github.com/o/r/pull/1'
+
+        result = github.create_pull_request('title', 'user:dev-changelog-1.0', 'master', 'body')
+        print(f"重复创建: {result}")
+        assert result['success'] and result['existed']
+        assert result['number'] == 1
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_create_pull_request()
+    print("✓ 测试通过")